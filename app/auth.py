@@ -1,3 +1,9 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
 from fastapi import HTTPException, Depends
 from fastapi.security import OAuth2PasswordBearer, HTTPBearer
 from passlib.context import CryptContext
@@ -7,17 +13,26 @@ from starlette.requests import Request
 from app.config import settings
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
+from redis.exceptions import RedisError
 
+from app.service.redis_service import get_redis
 from app.user.models import Role
 from app.utils.constants import local_tz
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__time_cost=settings.ARGON2_TIME_COST,
+    argon2__memory_cost=settings.ARGON2_MEMORY_COST,
+    argon2__parallelism=settings.ARGON2_PARALLELISM,
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/user/login")
 bearer_scheme = HTTPBearer(auto_error=False)
 
 SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = settings.JWT_ALGORITHM
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.JWT_EXPIRE
+TOKEN_VERSIONS_KEY = "auth:token_versions"
 
 credentials_exception = HTTPException(
     status_code=status.HTTP_401_UNAUTHORIZED,
@@ -38,22 +53,162 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
 
 
 def decode_access_token(token: str):
+    return decode_access_claims(token)["sub"]
+
+
+def decode_access_claims(token: str) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
+        if payload.get("sub") is None:
             raise credentials_exception
-        return user_id
+        return payload
     except JWTError:
         raise credentials_exception
 
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """
+    Authenticated user built from token claims, without a database lookup.
+    """
+    id: int
+    username: str
+    role: Role
+
+    @classmethod
+    def from_claims(cls, claims: dict) -> "Principal | None":
+        if "role" not in claims or "ver" not in claims:
+            return None
+        return cls(id=int(claims["sub"]), username=claims.get("username", ""), role=Role(claims["role"]))
+
 
+logger = logging.getLogger("app")
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+_token_versions: dict[int, tuple[int, float]] = {}
+
+
+async def get_token_version(user_id: int) -> int:
+    """
+    Current token version of a user.
+
+    Versions live in a Redis hash and are cached in-process for
+    ``AUTH_VERSION_CACHE_TTL`` seconds, so a revocation takes at most that
+    long to reach every worker.
+
+    If Redis can't be reached, an expired cached version is used; with no
+    cached version the request fails with 503 rather than skipping the
+    revocation check.
+    """
+    now = time.monotonic()
+    cached = _token_versions.get(user_id)
+    if cached and cached[1] > now:
+        return cached[0]
+
+    try:
+        redis = await get_redis()
+        version = int(await redis.hget(TOKEN_VERSIONS_KEY, str(user_id)) or 0)
+    except RedisError:
+        if cached:
+            logger.warning("Token version lookup failed, using cached version for user %s", user_id)
+            return cached[0]
+        logger.exception("Token version lookup failed")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication temporarily unavailable",
+            headers={"Retry-After": "1"},
+        )
+
+    if len(_token_versions) >= settings.AUTH_VERSION_CACHE_SIZE:
+        _token_versions.clear()
+    _token_versions[user_id] = (version, now + settings.AUTH_VERSION_CACHE_TTL)
+    return version
+
+
+async def revoke_user_tokens(user_id: int) -> int:
+    """
+    Invalidate every token issued to a user so far.
+
+    Must be called whenever the user's role changes, since the role is
+    carried in the token.
+    """
+    redis = await get_redis()
+    version = await redis.hincrby(TOKEN_VERSIONS_KEY, str(user_id), 1)
+    _token_versions.pop(user_id, None)
+    return version
+
+
+async def create_user_token(user) -> str:
+    redis = await get_redis()
+    version = int(await redis.hget(TOKEN_VERSIONS_KEY, str(user.id)) or 0)
+    return create_access_token({
+        "sub": str(user.id),
+        "username": user.username,
+        "role": str(user.role),
+        "ver": version,
+    })
+
+
+class PasswordHasher:
+    """
+    Runs Argon2 in a dedicated thread pool so it never blocks the event loop.
+
+    At most ``workers`` hashes run at once and at most ``queue_limit`` more
+    may wait; anything beyond that is rejected with 503 instead of queueing
+    without bound.
+    """
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.pending = 0
+        self.rejected = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="argon2")
+
+    async def run(self, func, *args):
+        if self.pending >= self.workers + self.queue_limit:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many concurrent authentication requests.",
+                headers={"Retry-After": "1"},
+            )
+
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "running": min(self.pending, self.workers),
+            "queued": max(self.pending - self.workers, 0),
+            "queue_limit": self.queue_limit,
+            "rejected": self.rejected,
+        }
+
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_QUEUE_LIMIT)
+
+
+async def get_password_hash(password):
+    return await password_hasher.run(pwd_context.hash, password)
+
+
+async def verify_password(plain_password, hashed_password):
+    return await password_hasher.run(pwd_context.verify, plain_password, hashed_password)
+
+
+async def verify_and_update_password(plain_password, hashed_password) -> tuple[bool, str | None]:
+    """
+    Verify a password and return a fresh hash if the stored one was made
+    with outdated Argon2 parameters.
+    """
+    return await password_hasher.run(pwd_context.verify_and_update, plain_password, hashed_password)
 
 
 async def get_current_user(request: Request, token: str = Depends(bearer_scheme)):
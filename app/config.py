@@ -1,4 +1,5 @@
 import os
+from typing import Literal, Optional
 from pydantic import PostgresDsn, computed_field, RedisDsn
 from pydantic_core import MultiHostUrl
 from pydantic_settings import BaseSettings
@@ -12,21 +13,129 @@ class Settings(BaseSettings):
     REDIS_HOST: str
     REDIS_PORT: int
     REDIS_DB: str
+    REDIS_POOL_SIZE: int = 50
+    REDIS_POOL_TIMEOUT: int = 5
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30
 
     SECRET_KEY: str
     JWT_ALGORITHM: str
     JWT_EXPIRE: int
+    # "claims" trusts role/version claims in the token, "db" loads the user on every request.
+    AUTH_MODE: str = "claims"
+    AUTH_VERSION_CACHE_TTL: float = 5.0
+    AUTH_VERSION_CACHE_SIZE: int = 10000
+
+    ARGON2_TIME_COST: int = 3
+    ARGON2_MEMORY_COST: int = 65536
+    ARGON2_PARALLELISM: int = 4
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE_LIMIT: int = 32
+
+    AUDIT_QUEUE_SIZE: int = 10000
+    AUDIT_BATCH_SIZE: int = 500
+    AUDIT_FLUSH_INTERVAL: float = 1.0
+    AUDIT_HASH_INLINE_LIMIT: int = 64 * 1024
+    # Bodies without a Content-Length or larger than this are hashed as they
+    # stream through instead of being buffered.
+    AUDIT_BUFFER_LIMIT: int = 1024 * 1024
+
+    CACHE_L1_MAX_ITEMS: int = 1024
+    CACHE_L1_TTL: float = 5.0
+    CACHE_EARLY_REFRESH_BETA: float = 1.0
+    # Cached bodies at least this large are zlib-compressed in Redis; 0 disables.
+    CACHE_COMPRESS_MIN_BYTES: int = 4096
+
+    PRICING_BATCH_MAX_ROWS: int = 100_000
+    # Lead imports are validated and COPYed this many rows at a time; only
+    # the first LEAD_IMPORT_MAX_ERRORS row errors are reported.
+    LEAD_IMPORT_CHUNK_ROWS: int = 5000
+    LEAD_IMPORT_MAX_ERRORS: int = 1000
+    # Processes validating import chunks; 0 validates in a thread.
+    LEAD_IMPORT_WORKERS: int = 2
+    # Rows per server-side cursor fetch when exporting.
+    EXPORT_FETCH_SIZE: int = 5000
+    EXPORT_GZIP_LEVEL: int = 1
+
+    REPRICE_STREAM: str = "reprice:tasks"
+    REPRICE_DEAD_LETTER_STREAM: str = "reprice:dead"
+    REPRICE_GROUP: str = "reprice-workers"
+    REPRICE_STREAM_MAXLEN: int = 1_000_000
+    # Batches a worker process prices and writes at the same time.
+    REPRICE_CONCURRENCY: int = 4
+    REPRICE_BATCH_SIZE: int = 200
+    REPRICE_BLOCK_MS: int = 5000
+    REPRICE_MAX_ATTEMPTS: int = 5
+    # Pending entries idle this long are taken over from a dead consumer.
+    REPRICE_CLAIM_IDLE_MS: int = 60_000
+    TASK_STATUS_TTL: int = 86400
+    TASK_WAIT_MAX: int = 60
+
+    WEBHOOK_URL: str = "https://example.com/webhook"
+    WEBHOOK_TIMEOUT: float = 10
+    WEBHOOK_MAX_ATTEMPTS: int = 8
+    # Deliveries in flight per process; also the keep-alive pool size.
+    WEBHOOK_CONCURRENCY: int = 16
+    WEBHOOK_BATCH_SIZE: int = 100
+    WEBHOOK_POLL_INTERVAL: float = 1.0
+    WEBHOOK_BACKOFF_BASE: float = 1.0
+    WEBHOOK_BACKOFF_MAX: float = 300
+    # Consecutive failures that open an endpoint's breaker, and how long it stays open.
+    WEBHOOK_BREAKER_THRESHOLD: int = 5
+    WEBHOOK_BREAKER_COOLDOWN: float = 30
+    # Claimed rows are retried after this long if the dispatcher dies. Rows
+    # still waiting for a slot once less than WEBHOOK_TIMEOUT + 5s of it is
+    # left are handed back unsent, so keep it well above WEBHOOK_TIMEOUT.
+    WEBHOOK_LEASE_SECONDS: int = 60
+
+    # Requests a process may admit per key without asking Redis, while the
+    # key is well under its limit, and how long such a local lease lasts.
+    RATE_LIMIT_LOCAL_LEASE: int = 10
+    RATE_LIMIT_LOCAL_TTL: float = 1.0
+    RATE_LIMIT_LOCAL_MAX_KEYS: int = 10000
+
+    # Stored responses live IDEMPOTENCY_TTL seconds; larger bodies aren't
+    # stored. A claim is dropped after IDEMPOTENCY_LOCK_TTL if its request
+    # never finishes, and duplicates wait up to IDEMPOTENCY_WAIT for it.
+    IDEMPOTENCY_TTL: int = 300
+    IDEMPOTENCY_MAX_BODY: int = 1024 * 1024
+    IDEMPOTENCY_LOCK_TTL: int = 60
+    IDEMPOTENCY_WAIT: float = 10
+
+    # Request pipeline, outermost stage first.
+    MIDDLEWARE_PIPELINE: list[str] = ["auth", "idempotency", "audit", "rate_limit"]
 
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str
     POSTGRES_HOST: str
     POSTGRES_DB: str
 
+    ATTACHMENT_MAX_SIZE: int = 5 * 1024 * 1024
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+
+    # "local" keeps objects under STORAGE_LOCAL_ROOT (default app/uploads),
+    # "s3" in MINIO_BUCKET.
+    STORAGE_BACKEND: Literal["local", "s3"] = "local"
+    STORAGE_LOCAL_ROOT: Optional[str] = None
+    # Files above this go up as multipart uploads. Kept between the S3
+    # minimum (5 MiB) and ATTACHMENT_MAX_SIZE, so with the default limit
+    # every attachment is a single PUT.
+    STORAGE_PART_SIZE: int = 5 * 1024 * 1024
+    STORAGE_PARALLEL_PARTS: int = 4
+    STORAGE_PRESIGN_EXPIRES: int = 900
+    # Direct uploads never confirmed are deleted by
+    # ``python -m app.logistics.sweep_uploads`` once this old; confirming
+    # is refused after half of it, so the sweep never races a confirm.
+    STORAGE_UNCONFIRMED_TTL: int = 86400
+    DOWNLOAD_CHUNK_SIZE: int = 1024 * 1024
+
     MINIO_ENDPOINT: str = "localhost:9000"
     MINIO_ACCESS_KEY: str = "minioadmin"
     MINIO_SECRET_KEY: str = "minioadmin"
     MINIO_BUCKET: str = "attachments"
     MINIO_USE_SSL: bool = False
+    MINIO_REGION: str = "us-east-1"
+    # Host clients reach the bucket on, when it differs from MINIO_ENDPOINT.
+    MINIO_PUBLIC_ENDPOINT: Optional[str] = None
 
     @computed_field
     @property
@@ -1,8 +1,16 @@
 # from inspect import getmembers
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from tortoise.contrib.fastapi import register_tortoise
+from .auth import password_hasher
 from .database import TORTOISE_ORM
+from .logistics.imports import row_validator
+from .service.audit_service import audit_sink
+from .service.pricing_service import pricing_rules_watcher
+from .service.redis_service import init_redis, close_redis
+from .service.storage_service import storage
+from .service.webhook_service import webhook_dispatcher
 
 
 def init_db(app: FastAPI):
@@ -17,4 +25,30 @@ def init_db(app: FastAPI):
         config=TORTOISE_ORM,
         generate_schemas=True,
         add_exception_handlers=True,
-    )
\ No newline at end of file
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Start and stop process-wide services.
+
+    ``register_tortoise`` wraps this lifespan, so the ORM is already up when
+    it starts and still up while it shuts down.
+    :param app:
+    :return:
+    """
+    await init_redis()
+    await storage.start()
+    await audit_sink.start()
+    await pricing_rules_watcher.start()
+    await webhook_dispatcher.start()
+    try:
+        yield
+    finally:
+        await webhook_dispatcher.stop()
+        await pricing_rules_watcher.stop()
+        await audit_sink.stop()
+        await close_redis()
+        password_hasher.shutdown()
+        row_validator.shutdown()
@@ -0,0 +1,70 @@
+"""
+Bulk lead import from a file.
+
+    python -m app.logistics.import_leads FILE --user-id N [--format csv|ndjson] [--errors PATH]
+
+The format defaults to the file extension. One audit entry is written for
+the whole import.
+"""
+import argparse
+import asyncio
+import hashlib
+import logging
+import sys
+from typing import AsyncIterator
+
+import orjson
+from tortoise import Tortoise
+
+from app.config import settings
+from app.database import TORTOISE_ORM
+from app.logistics.models import AuditLog
+from app.logistics.services import LeadService
+from app.service.redis_service import init_redis, close_redis
+
+logger = logging.getLogger("app")
+
+
+async def read_file(path: str, digest, chunk_size: int = settings.UPLOAD_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        while chunk := await asyncio.to_thread(f.read, chunk_size):
+            digest.update(chunk)
+            yield chunk
+
+
+async def main(args: argparse.Namespace) -> int:
+    fmt = args.format or ("ndjson" if args.file.endswith((".ndjson", ".jsonl")) else "csv")
+
+    await Tortoise.init(config=TORTOISE_ORM)
+    await init_redis()
+    try:
+        digest = hashlib.sha256()
+        result = await LeadService.bulk_import(read_file(args.file, digest), fmt, args.user_id)
+        await AuditLog.create(
+            user_id=args.user_id,
+            endpoint=f"CLI import_leads {fmt}",
+            payload_hash=digest.hexdigest(),
+        )
+    finally:
+        await close_redis()
+        await Tortoise.close_connections()
+
+    logger.info(
+        "Imported %s leads, %s failed, in %.1fs (%.0f rows/s)",
+        result.imported, result.failed, result.elapsed, result.rows_per_second,
+    )
+    if args.errors and result.errors:
+        with open(args.errors, "wb") as f:
+            for error in result.errors:
+                f.write(orjson.dumps(error.model_dump()) + b"\n")
+    return 1 if result.failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-import leads from CSV or NDJSON.")
+    parser.add_argument("file")
+    parser.add_argument("--user-id", type=int, required=True, help="Owner of the imported leads")
+    parser.add_argument("--format", choices=["csv", "ndjson"])
+    parser.add_argument("--errors", help="Write row errors here as NDJSON")
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(main(parser.parse_args())))
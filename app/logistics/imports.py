@@ -0,0 +1,253 @@
+"""
+Bulk lead import.
+
+CSV (with a header row) or NDJSON is read as a stream, validated against
+``LeadCreate`` a chunk at a time and loaded with ``COPY``. Validation is
+CPU-bound (mostly ``EmailStr``), so chunks are validated in a process pool
+while earlier chunks are being copied. Bad rows are reported and skipped;
+each chunk is committed as it is loaded. A chunk the database rejects is
+split in halves and copied again, down to single rows, so only the rows
+it refuses are skipped.
+"""
+import asyncio
+import codecs
+import csv
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+import orjson
+from asyncpg import PostgresError
+from pydantic import ValidationError
+from tortoise import connections
+
+from app.config import settings
+from app.logistics.schemas import ImportFormatLiteral, LeadCreate, LeadImportResult, LeadImportRowError
+from app.utils.constants import local_tz
+
+LEAD_COPY_COLUMNS = (
+    "name", "phone", "email", "origin_zip", "dest_zip", "vehicle_type", "operable",
+    "created_by_id", "created_at", "updated_at",
+)
+
+# A parsed row: its 1-based number and either the field dict or a
+# ready-made error list when the line itself couldn't be parsed.
+Row = tuple[int, dict | list[dict]]
+
+
+def _parse_error(kind: str, msg: str) -> list[dict]:
+    return [{"type": kind, "loc": [], "msg": msg}]
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[list[str]]:
+    """
+    Decode a byte stream and yield the complete lines of each chunk.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        lines = pending.split("\n")
+        pending = lines.pop()
+        if lines:
+            yield lines
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield [pending]
+
+
+class NDJSONRows:
+    def __init__(self):
+        self.count = 0
+
+    def feed(self, lines: list[str]) -> list[Row]:
+        rows = []
+        for line in lines:
+            if not line.strip():
+                continue
+            self.count += 1
+            try:
+                row = orjson.loads(line)
+            except orjson.JSONDecodeError as e:
+                rows.append((self.count, _parse_error("json_invalid", str(e))))
+                continue
+            if not isinstance(row, dict):
+                row = _parse_error("model_type", "Each line must be a JSON object")
+            rows.append((self.count, row))
+        return rows
+
+    def finish(self) -> list[Row]:
+        return []
+
+
+class CSVRows:
+    """
+    CSV records from lines; a record continues onto the next line while a
+    quoted field is open. Empty cells count as missing.
+    """
+
+    def __init__(self):
+        self.header: Optional[list[str]] = None
+        self.pending: list[str] = []
+        self.quotes = 0
+        self.count = 0
+
+    def feed(self, lines: list[str]) -> list[Row]:
+        rows = []
+        for line in lines:
+            self.pending.append(line)
+            self.quotes += line.count('"')
+            if self.quotes % 2:
+                continue
+            record = "\n".join(self.pending)
+            self.pending, self.quotes = [], 0
+            row = self._record(record)
+            if row is not None:
+                rows.append(row)
+        return rows
+
+    def finish(self) -> list[Row]:
+        if not self.pending:
+            return []
+        record, self.pending = "\n".join(self.pending), []
+        row = self._record(record)
+        return [row] if row is not None else []
+
+    def _record(self, record: str) -> Optional[Row]:
+        if not record.strip():
+            return None
+        values = next(csv.reader([record.rstrip("\r")]))
+        if self.header is None:
+            self.header = [name.strip() for name in values]
+            return None
+        self.count += 1
+        if len(values) != len(self.header):
+            return self.count, _parse_error("csv_columns", f"Expected {len(self.header)} columns, got {len(values)}")
+        return self.count, {name: value for name, value in zip(self.header, values) if value != ""}
+
+
+def _validate(rows: list[Row], user_id: Optional[int], now: datetime) -> tuple[list[tuple], list[int], list[LeadImportRowError]]:
+    records, numbers, errors = [], [], []
+    for number, row in rows:
+        if isinstance(row, list):
+            errors.append(LeadImportRowError(row=number, errors=row))
+            continue
+        try:
+            lead = LeadCreate.model_validate(row)
+        except ValidationError as e:
+            errors.append(LeadImportRowError(
+                row=number,
+                errors=e.errors(include_url=False, include_context=False, include_input=False),
+            ))
+            continue
+        records.append((
+            lead.name, lead.phone, lead.email, lead.origin_zip, lead.dest_zip, lead.vehicle_type, lead.operable,
+            user_id, now, now,
+        ))
+        numbers.append(number)
+    return records, numbers, errors
+
+
+class RowValidator:
+    """
+    Runs ``_validate`` in a process pool, started on first use. With no
+    workers it runs in a thread instead.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor: ProcessPoolExecutor | None = None
+
+    async def run(self, rows: list[Row], user_id: Optional[int], now: datetime):
+        if not self.workers:
+            return await asyncio.to_thread(_validate, rows, user_id, now)
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, _validate, rows, user_id, now)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+row_validator = RowValidator(settings.LEAD_IMPORT_WORKERS)
+
+
+async def copy_rows(conn, records: list[tuple], numbers: list[int]) -> list[LeadImportRowError]:
+    """
+    COPY ``records`` into leads and return an error for each row the
+    database refused. A failed COPY loads nothing, so on failure the rows
+    are bisected until each refused row is copied, and fails, on its own.
+    """
+    try:
+        await conn.copy_records_to_table("leads", records=records, columns=LEAD_COPY_COLUMNS)
+        return []
+    except PostgresError as e:
+        if len(records) == 1:
+            return [LeadImportRowError(row=numbers[0], errors=_parse_error("database", str(e)))]
+    middle = len(records) // 2
+    return (
+        await copy_rows(conn, records[:middle], numbers[:middle])
+        + await copy_rows(conn, records[middle:], numbers[middle:])
+    )
+
+
+async def import_leads(
+    chunks: AsyncIterator[bytes],
+    fmt: ImportFormatLiteral,
+    user_id: Optional[int],
+    chunk_rows: int = settings.LEAD_IMPORT_CHUNK_ROWS,
+    max_errors: int = settings.LEAD_IMPORT_MAX_ERRORS,
+) -> LeadImportResult:
+    started = time.perf_counter()
+    now = datetime.now(tz=local_tz)
+    parser = CSVRows() if fmt == "csv" else NDJSONRows()
+    imported = failed = 0
+    errors: list[LeadImportRowError] = []
+    # Chunks being validated, copied in submission order.
+    validating: deque[asyncio.Future] = deque()
+
+    async def copy_validated(conn, keep: int) -> None:
+        nonlocal imported, failed
+        while len(validating) > keep:
+            records, numbers, row_errors = await validating.popleft()
+            if records:
+                refused = await copy_rows(conn, records, numbers)
+                imported += len(records) - len(refused)
+                row_errors = sorted(row_errors + refused, key=lambda error: error.row)
+            failed += len(row_errors)
+            errors.extend(row_errors[:max_errors - len(errors)])
+
+    def submit(rows: list[Row]) -> None:
+        validating.append(asyncio.ensure_future(row_validator.run(rows, user_id, now)))
+
+    in_flight = max(row_validator.workers, 1)
+    try:
+        async with connections.get("default").acquire_connection() as conn:
+            batch: list[Row] = []
+            async for lines in iter_lines(chunks):
+                batch += parser.feed(lines)
+                while len(batch) >= chunk_rows:
+                    submit(batch[:chunk_rows])
+                    batch = batch[chunk_rows:]
+                    await copy_validated(conn, in_flight)
+            batch += parser.finish()
+            if batch:
+                submit(batch)
+            await copy_validated(conn, 0)
+    finally:
+        for future in validating:
+            future.cancel()
+
+    elapsed = time.perf_counter() - started
+    return LeadImportResult(
+        imported=imported,
+        failed=failed,
+        elapsed=round(elapsed, 3),
+        rows_per_second=round((imported + failed) / elapsed, 1) if elapsed else 0.0,
+        errors=errors,
+        errors_truncated=failed > len(errors),
+    )
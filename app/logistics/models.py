@@ -10,6 +10,12 @@ class VehicleType(StrEnum):
     TRUCK = "truck"
 
 
+class WebhookStatus(StrEnum):
+    PENDING = "pending"
+    DELIVERED = "delivered"
+    FAILED = "failed"
+
+
 class OrderStatus(StrEnum):
     DRAFT = "draft"
     QUOTED = "quoted"
@@ -44,7 +50,7 @@ class Lead(Model):
         table = "leads"
         indexes = (
             ("origin_zip", "dest_zip"),
-            ("created_by",),
+            ("created_by", "created_at", "id"),
         )
         ordering = ["-created_at"]
 
@@ -73,8 +79,9 @@ class Order(Model):
         table = "orders"
         indexes = (
             ("lead", "status"),
-            ("status",),
-            ("created_at",),
+            ("lead", "created_at", "id"),
+            ("status", "created_at", "id"),
+            ("created_at", "id"),
         )
         ordering = ["-created_at"]
 
@@ -88,4 +95,36 @@ class AuditLog(Model):
 
     class Meta:
         table = "audit_logs"
-        indexes = (("user_id", "created_at"),)
\ No newline at end of file
+        indexes = (("user_id", "created_at"),)
+
+class PricingRuleSet(Model):
+    version = fields.IntField(unique=True)
+    rules = fields.JSONField()
+    created_by: fields.ForeignKeyRelation[User] = fields.ForeignKeyField(
+        "models.User", related_name="pricing_rule_sets", on_delete=fields.SET_NULL, null=True
+    )
+    created_at = fields.DatetimeField(auto_now_add=True)
+
+    class Meta:
+        table = "pricing_rule_sets"
+        ordering = ["-version"]
+
+
+class WebhookOutbox(Model):
+    id = fields.BigIntField(pk=True)
+    endpoint = fields.CharField(max_length=512)
+    payload = fields.JSONField()
+    status = fields.CharEnumField(
+        WebhookStatus,
+        default=WebhookStatus.PENDING,
+        description="pending | delivered | failed",
+    )
+    attempts = fields.IntField(default=0)
+    next_attempt_at = fields.DatetimeField(auto_now_add=True)
+    last_error = fields.TextField(null=True)
+    created_at = fields.DatetimeField(auto_now_add=True)
+    delivered_at = fields.DatetimeField(null=True)
+
+    class Meta:
+        table = "webhook_outbox"
+        indexes = (("status", "next_attempt_at"),)
@@ -0,0 +1,324 @@
+from dataclasses import dataclass
+from decimal import Decimal
+from types import MappingProxyType
+from typing import Any, Iterator, Mapping
+
+import numpy as np
+import orjson
+from pydantic import ValidationError
+
+from app.logistics.models import VehicleType
+from app.logistics.schemas import QuoteCalcRequest
+
+BATCH_COLUMNS = ("base_price", "distance_km", "vehicle_type", "operable", "season")
+# Filled in for fields a batch leaves out, as ``QuoteCalcRequest`` does.
+BATCH_DEFAULTS = {
+    name: field.default for name, field in QuoteCalcRequest.model_fields.items()
+    if name in BATCH_COLUMNS and not field.is_required()
+}
+
+# Values are kept as float64 cents; integers below this bound are exact and
+# leave enough headroom for the sum.
+_MAX_CENTS = 1e13
+
+ZERO = Decimal("0")
+CENT = Decimal("0.01")
+
+# Built-in rule set, used until one is published to ``pricing_rule_sets``.
+DEFAULT_RULES = {
+    "distance_coeff": "1.5",
+    "vehicle_type_bonus": {"sedan": "0", "suv": "200", "truck": "400"},
+    "season_bonus": {"winter": "300", "summer": "150", "normal": "0"},
+    "operable_adjustment": "-100",
+    "inoperable_adjustment": "200",
+}
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledRules:
+    """
+    Immutable, precomputed form of a pricing rule set.
+
+    The Decimal tables serve ``calculate_price``; the ``*_cents`` fields are
+    the same values scaled for the vectorized batch path. A new rule set is
+    compiled once and swapped in whole, so readers always see one version.
+    """
+    version: int
+    distance_coeff: Decimal
+    vehicle_type_bonus: Mapping[str, Decimal]
+    season_bonus: Mapping[str, Decimal]
+    operable_adjustment: Mapping[bool, Decimal]
+
+    vectorizable: bool
+    distance_coeff_cents: float
+    vehicle_type_cents: tuple[tuple[str, float], ...]
+    season_cents: tuple[tuple[str, float], ...]
+    operable_cents: tuple[float, float]
+    # Distances that are multiples of 1 / tie_scale give exact products, so
+    # half-cent ties among them can be rounded with ``rint``; 0 disables it.
+    tie_scale: float
+
+    def as_dict(self) -> dict:
+        return {
+            "distance_coeff": self.distance_coeff,
+            "vehicle_type_bonus": dict(self.vehicle_type_bonus),
+            "season_bonus": dict(self.season_bonus),
+            "operable_adjustment": self.operable_adjustment[True],
+            "inoperable_adjustment": self.operable_adjustment[False],
+        }
+
+
+def _is_cents(value: Decimal) -> bool:
+    return abs(value) < Decimal(_MAX_CENTS) / 100 and value == value.quantize(CENT)
+
+
+def compile_rules(raw: dict, version: int = 0) -> CompiledRules:
+    """
+    Validate and compile a rule set; raises ``ValueError`` on bad input.
+    """
+    try:
+        coeff = Decimal(str(raw["distance_coeff"]))
+        vehicle_type_bonus = {str(k): Decimal(str(v)) for k, v in raw["vehicle_type_bonus"].items()}
+        season_bonus = {str(k): Decimal(str(v)) for k, v in raw["season_bonus"].items()}
+        operable_adjustment = {
+            True: Decimal(str(raw["operable_adjustment"])),
+            False: Decimal(str(raw["inoperable_adjustment"])),
+        }
+    except (KeyError, AttributeError, TypeError, ArithmeticError) as e:
+        raise ValueError(f"Invalid pricing rules: {e!r}")
+
+    amounts = [*vehicle_type_bonus.values(), *season_bonus.values(), *operable_adjustment.values()]
+    if not all(value.is_finite() for value in [coeff, *amounts]):
+        raise ValueError("Invalid pricing rules: values must be finite")
+
+    # Bonuses must be whole cents to be exact in float64. The coefficient
+    # may be anything; only the tie shortcut needs it in whole cents.
+    coeff_cents = coeff * 100
+    tie_scale = 0.0
+    if coeff_cents == coeff_cents.to_integral_value() and coeff_cents:
+        twos = 0
+        whole = abs(int(coeff_cents))
+        while whole % 2 == 0:
+            whole //= 2
+            twos += 1
+        tie_scale = float(2 ** (twos + 1)) if twos < 8 else 0.0
+
+    return CompiledRules(
+        version=version,
+        distance_coeff=coeff,
+        vehicle_type_bonus=MappingProxyType(vehicle_type_bonus),
+        season_bonus=MappingProxyType(season_bonus),
+        operable_adjustment=MappingProxyType(operable_adjustment),
+        vectorizable=all(_is_cents(value) for value in amounts) and abs(coeff) < 1e6,
+        distance_coeff_cents=float(coeff_cents),
+        vehicle_type_cents=tuple((k, float(v * 100)) for k, v in vehicle_type_bonus.items()),
+        season_cents=tuple((k, float(v * 100)) for k, v in season_bonus.items()),
+        operable_cents=(float(operable_adjustment[True] * 100), float(operable_adjustment[False] * 100)),
+        tie_scale=tie_scale,
+    )
+
+
+def current_rules() -> CompiledRules:
+    return _active
+
+
+def activate(rules: CompiledRules) -> bool:
+    """
+    Swap in ``rules`` unless an equal or newer version is already active.
+    """
+    global _active
+    if _active is not None and rules.version <= _active.version:
+        return False
+    _active = rules
+    return True
+
+
+_active = compile_rules(DEFAULT_RULES)
+
+
+def parse_batch(body: bytes, ndjson: bool) -> dict[str, list]:
+    """
+    Turn an NDJSON body (one ``QuoteCalcRequest`` per line) or a columnar
+    JSON object (one array per field) into columns.
+    """
+    if ndjson:
+        rows = [orjson.loads(line) for line in body.splitlines() if line.strip()]
+        if not all(isinstance(row, dict) for row in rows):
+            raise ValueError("Every line must be a JSON object")
+        return {name: [row.get(name, BATCH_DEFAULTS.get(name)) for row in rows] for name in BATCH_COLUMNS}
+
+    columns = orjson.loads(body)
+    if not isinstance(columns, dict):
+        raise ValueError("Expected an object of columns")
+    size = len(columns.get("base_price") or [])
+    for name in BATCH_COLUMNS:
+        column = columns.get(name)
+        if column is None and name in BATCH_DEFAULTS:
+            columns[name] = [BATCH_DEFAULTS[name]] * size
+        elif not isinstance(column, list) or len(column) != size:
+            raise ValueError(f"Column '{name}' must be an array of {size} values")
+    return {name: columns[name] for name in BATCH_COLUMNS}
+
+
+def _lookup_cents(values: np.ndarray, table: tuple[tuple[str, float], ...]) -> np.ndarray:
+    return np.select([values == key for key, _ in table], [cents for _, cents in table], default=0.0)
+
+
+def _type_mask(values: list, types: set) -> np.ndarray:
+    """
+    Which values are exactly one of ``types``; uniform columns are checked
+    with a single pass over their types.
+    """
+    kinds = set(map(type, values))
+    if kinds <= types:
+        return np.ones(len(values), dtype=bool)
+    if not kinds & types:
+        return np.zeros(len(values), dtype=bool)
+    return np.fromiter((type(v) in types for v in values), dtype=bool, count=len(values))
+
+
+def _floats(values: list, mask: np.ndarray) -> np.ndarray:
+    if mask.all():
+        try:
+            return np.array(values, dtype=np.float64)
+        except OverflowError:
+            pass
+    return np.array(
+        [float(v) if ok and -1e300 < v < 1e300 else np.nan for v, ok in zip(values, mask.tolist())],
+        dtype=np.float64,
+    )
+
+
+def _base_cents(values: list) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Base prices as float64 cents plus a mask of the rows that are exactly
+    representable; the rest go through the Decimal path.
+    """
+    numeric = _type_mask(values, {int, float})
+    with np.errstate(invalid="ignore", over="ignore"):
+        floats = _floats(values, numeric)
+        cents = np.rint(floats * 100)
+        # For |cents| < 1e13 a float equal to cents/100 parses (via its
+        # shortest repr, as pydantic does) to exactly that decimal.
+        exact = numeric & (cents / 100 == floats) & (np.abs(cents) < _MAX_CENTS)
+    cents[~exact] = 0
+
+    for i in np.flatnonzero(~numeric):
+        value = values[i]
+        if not isinstance(value, str):
+            continue
+        try:
+            price = Decimal(value)
+        except ArithmeticError:
+            continue
+        if price.is_finite() and _is_cents(price):
+            cents[i] = float(price * 100)
+            exact[i] = True
+    return cents, exact
+
+
+def price_batch(
+    columns: dict[str, list], scalar, rules: CompiledRules | None = None
+) -> tuple[np.ndarray, dict[int, Decimal], dict[int, Any]]:
+    """
+    Price a batch with NumPy on fixed-point cents.
+
+    Returns integer cents for the vectorized rows, the prices of rows that
+    went through ``scalar(row, rules)`` and per-row errors. Rows the fast
+    path can't price exactly (inputs that need coercion or validation,
+    non-cent base prices, huge values, totals within float error of a
+    half-cent tie) are handed to ``scalar`` -- the Decimal implementation --
+    so the output is identical to pricing each row on its own.
+    """
+    rules = rules or current_rules()
+    prices: dict[int, Decimal] = {}
+    errors: dict[int, Any] = {}
+
+    vehicle_type = np.array([v if type(v) is str else None for v in columns["vehicle_type"]], dtype=object)
+    season = np.array([v if type(v) is str else None for v in columns["season"]], dtype=object)
+    operable_mask = _type_mask(columns["operable"], {bool})
+    operable = operable_mask & np.array([v is True for v in columns["operable"]], dtype=bool)
+    distance_mask = _type_mask(columns["distance_km"], {int, float})
+    distance = _floats(columns["distance_km"], distance_mask)
+
+    # ``season`` is Optional and None prices like any unknown season.
+    eligible = (
+        np.isin(vehicle_type, [t.value for t in VehicleType])
+        & operable_mask
+        & distance_mask
+        & _type_mask(columns["season"], {str, type(None)})
+    )
+    if not rules.vectorizable:
+        eligible[:] = False
+
+    base, exact = _base_cents(columns["base_price"])
+
+    extra = (
+        _lookup_cents(vehicle_type, rules.vehicle_type_cents)
+        + _lookup_cents(season, rules.season_cents)
+        + np.where(operable, *rules.operable_cents)
+    )
+
+    with np.errstate(invalid="ignore", over="ignore"):
+        distance_cost = distance * rules.distance_coeff_cents
+        total = base + extra + distance_cost
+        frac = total - np.floor(total)
+        # Exact half-cent ties only come from distances that are multiples
+        # of 1 / tie_scale; those totals are exact in float64 and ``rint``
+        # rounds them half-even like ``quantize``. Anything else close to a
+        # tie may be off by float error and is left to Decimal.
+        if rules.tie_scale:
+            exact_tie = np.floor(distance * rules.tie_scale) == distance * rules.tie_scale
+        else:
+            exact_tie = np.zeros(len(distance), dtype=bool)
+        magnitude = np.abs(base) + np.abs(extra) + np.abs(distance_cost)
+        fast = (
+            eligible & exact
+            & (np.abs(distance_cost) < _MAX_CENTS)
+            & (exact_tie | (np.abs(frac - 0.5) > magnitude * 1e-15 + 1e-9))
+            # Sub-cent totals can quantize to "-0.00" on the Decimal path.
+            & (np.abs(total) >= 1)
+        )
+        cents = np.where(fast, np.rint(total), 0).astype(np.int64)
+
+    for i in np.flatnonzero(~fast):
+        try:
+            prices[int(i)] = scalar({name: columns[name][i] for name in BATCH_COLUMNS}, rules)
+        except ValidationError as e:
+            errors[int(i)] = e.errors(include_url=False, include_context=False, include_input=False)
+        except ArithmeticError as e:
+            errors[int(i)] = type(e).__name__
+
+    return cents, prices, errors
+
+
+def stream_results(
+    cents: np.ndarray, prices: dict[int, Decimal], errors: dict[int, Any], chunk_size: int = 1000
+) -> Iterator[bytes]:
+    """
+    NDJSON lines in input order: ``{"i": .., "final_price": ".."}`` or
+    ``{"i": .., "error": ..}``. Prices are rendered like ``str()`` of the
+    quantized Decimal, which is how the scalar endpoint serializes
+    ``final_price``.
+    """
+    whole = (np.abs(cents) // 100).tolist()
+    part = (np.abs(cents) % 100).tolist()
+    sign = np.where(cents < 0, b"-", b"").tolist()
+
+    def line(i: int) -> bytes:
+        if i in errors:
+            return orjson.dumps({"i": i, "error": errors[i]})
+        if i in prices:
+            return orjson.dumps({"i": i, "final_price": str(prices[i])})
+        return b'{"i":%d,"final_price":"%s%d.%02d"}' % (i, sign[i], whole[i], part[i])
+
+    for start in range(0, len(whole), chunk_size):
+        indexes = range(start, min(start + chunk_size, len(whole)))
+        if prices or errors:
+            lines = [line(i) for i in indexes]
+        else:
+            lines = [
+                b'{"i":%d,"final_price":"%s%d.%02d"}' % (i, sign[i], whole[i], part[i])
+                for i in indexes
+            ]
+        yield b"\n".join(lines) + b"\n"
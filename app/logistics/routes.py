@@ -1,23 +1,35 @@
 # app/logistics/routes.py
 import asyncio
 
-from fastapi import APIRouter, HTTPException, Depends, status, Query, UploadFile, File
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, status, Query
+from typing import List, Literal, Optional, Union
 
 from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
 
 from app.auth import get_admin
-from app.logistics.models import OrderStatus, Lead
-from app.logistics.services import LeadService, OrderService, send_webhook
+from app.config import settings
+from app.logistics.models import Lead
+from app.logistics.pricing import current_rules, parse_batch
+from app.logistics.services import LeadService, OrderService, lead_list_tags, order_list_tags
 from app.logistics.schemas import (
-    LeadCreate, LeadOut, LeadUpdate,
-    OrderCreate, OrderOut, OrderUpdate, QuoteCalcResponse, QuoteCalcRequest, RepriceResponse,
+    ZipMatchLiteral, ImportFormatLiteral,
+    AttachmentConfirmRequest, AttachmentOut, AttachmentPresignRequest, AttachmentPresignResponse,
+    LeadCreate, LeadImportResult, LeadOut, LeadPage, LeadUpdate,
+    OrderBulkResult, OrderBulkUpdate,
+    OrderCreate, OrderOut, OrderPage, OrderUpdate, QuoteCalcResponse, QuoteCalcRequest, RepriceResponse,
+    PricingRules, PricingRulesOut, TaskBulkRequest, TaskBulkResponse, TaskStatus,
 )
-from app.logistics.tasks import enqueue_reprice
+from app.logistics.tasks import enqueue_reprice, get_task_status, get_task_statuses
+from app.response import FastJSONResponse
+from app.service.pricing_service import publish_pricing_rules
 from app.user.models import User
 from app.utils.cache import redis_cache
+from app.utils.export import ExportFormat, accepts_gzip, export_response
+from app.utils.upload import MULTIPART_OPENAPI
 
-router = APIRouter(prefix="/logistics", tags=["logistics"])
+
+router = APIRouter(prefix="/logistics", tags=["logistics"], default_response_class=FastJSONResponse)
 
 
 @router.post("/leads", response_model=LeadOut, status_code=status.HTTP_201_CREATED)
@@ -28,6 +40,56 @@ async def create_lead(
     return await LeadService.create(payload, user_id=user.id)
 
 
+@router.post("/leads/import", response_model=LeadImportResult)
+async def import_leads(
+    request: Request,
+    import_format: Optional[ImportFormatLiteral] = Query(None, alias="format"),
+    user: User = Depends(get_admin),
+):
+    """
+    Bulk-create leads from a CSV (header row first) or NDJSON body. The body
+    is streamed; invalid rows are reported and skipped.
+    """
+    if import_format is None:
+        content_type = request.headers.get("content-type", "")
+        if content_type.startswith("text/csv"):
+            import_format = "csv"
+        elif content_type.startswith(("application/x-ndjson", "application/jsonl")):
+            import_format = "ndjson"
+        else:
+            raise HTTPException(400, "Send text/csv or application/x-ndjson, or pass ?format=")
+    return await LeadService.bulk_import(request.stream(), import_format, user.id)
+
+
+@router.get("/leads/export", response_class=StreamingResponse)
+async def export_leads(
+    request: Request,
+    export_format: ExportFormat = Query("ndjson", alias="format"),
+    user: User = Depends(get_admin),
+    origin_zip: Optional[str] = Query(None, max_length=20),
+    dest_zip: Optional[str] = Query(None, max_length=20),
+    vehicle_type: Optional[str] = Query(None, regex="^(sedan|suv|truck)$"),
+    operable: Optional[bool] = Query(None),
+    zip_match: ZipMatchLiteral = Query("contains"),
+):
+    """
+    All matching leads as NDJSON or CSV, newest first, streamed from a
+    database cursor. Gzipped when the client accepts it.
+    """
+    gzip = accepts_gzip(request.headers.get("accept-encoding"))
+    chunks = LeadService.export(
+        user.id,
+        export_format,
+        gzip=gzip,
+        origin_zip=origin_zip,
+        dest_zip=dest_zip,
+        vehicle_type=vehicle_type,
+        operable=operable,
+        zip_match=zip_match,
+    )
+    return export_response(chunks, "leads", export_format, gzip)
+
+
 @router.get("/leads/{lead_id}", response_model=LeadOut)
 async def read_lead(lead_id: int, user: User = Depends(get_admin),):
     lead = await LeadService.get(lead_id)
@@ -35,8 +97,8 @@ async def read_lead(lead_id: int, user: User = Depends(get_admin),):
         raise HTTPException(404, "Lead not found")
     return lead
 
-@router.get("/leads", response_model=List[LeadOut])
-@redis_cache(ttl=60)
+@router.get("/leads", response_model=Union[List[LeadOut], LeadPage])
+@redis_cache(ttl=300, tags=lambda kwargs: lead_list_tags(kwargs["user"].id))
 async def list_leads(
     request: Request,
     user: User = Depends(get_admin),
@@ -44,15 +106,30 @@ async def list_leads(
     dest_zip: Optional[str] = Query(None, max_length=20),
     vehicle_type: Optional[str] = Query(None, regex="^(sedan|suv|truck)$"),
     operable: Optional[bool] = Query(None),
+    zip_match: ZipMatchLiteral = Query("contains"),
     limit: int = Query(20, ge=1, le=100),
     offset: int = Query(0, ge=0),
+    pagination: Literal["offset", "cursor"] = Query("offset"),
+    cursor: Optional[str] = Query(None, max_length=128),
 ):
+    if pagination == "cursor" or cursor:
+        return await LeadService.list_page(
+            user_id=user.id,
+            origin_zip=origin_zip,
+            dest_zip=dest_zip,
+            vehicle_type=vehicle_type,
+            operable=operable,
+            zip_match=zip_match,
+            limit=limit,
+            cursor=cursor,
+        )
     return await LeadService.list(
         user_id=user.id,
         origin_zip=origin_zip,
         dest_zip=dest_zip,
         vehicle_type=vehicle_type,
         operable=operable,
+        zip_match=zip_match,
         limit=limit,
         offset=offset,
     )
@@ -60,23 +137,54 @@ async def list_leads(
 
 @router.patch("/leads/{lead_id}", response_model=LeadOut)
 async def update_lead(lead_id: int, payload: LeadUpdate, user: User = Depends(get_admin)):
-    if not await LeadService.get(lead_id):
+    lead = await LeadService.update(lead_id, payload)
+    if not lead:
         raise HTTPException(404, "Lead not found")
-    return await LeadService.update(lead_id, payload)
+    return lead
 
 
 @router.delete("/leads/{lead_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_lead(lead_id: int, user: User = Depends(get_admin)):
+    if not await LeadService.delete(lead_id):
+        raise HTTPException(404, "Lead not found")
+
+
+@router.post("/leads/{lead_id}/attachments", response_model=AttachmentOut, openapi_extra=MULTIPART_OPENAPI)
+async def upload_lead_attachment(lead_id: int, request: Request, user: User = Depends(get_admin)):
+    """
+    Upload an image or PDF as the ``file`` field of a multipart form. The
+    body is streamed to disk, so it isn't read until the lead is found.
+    """
     if not await LeadService.get(lead_id):
         raise HTTPException(404, "Lead not found")
-    await LeadService.delete(lead_id)
+    return await LeadService.upload_attachment(lead_id, request)
+
 
+@router.get("/leads/{lead_id}/attachment", response_class=Response)
+async def download_lead_attachment(lead_id: int, request: Request, user: User = Depends(get_admin)):
+    """
+    Download the lead's attachment. Supports ``Range`` and conditional
+    requests; attachments in object storage redirect to a presigned URL.
+    """
+    return await LeadService.attachment_response(lead_id, request)
 
-@router.post("/leads/{lead_id}/attachments", response_model=dict)
-async def upload_lead_attachment(lead_id: int, file: UploadFile = File(...), user: User = Depends(get_admin)):
+
+@router.post("/leads/{lead_id}/attachments/presign", response_model=AttachmentPresignResponse)
+async def presign_lead_attachment(lead_id: int, payload: AttachmentPresignRequest, user: User = Depends(get_admin)):
+    """
+    Get a URL to upload the attachment straight to object storage; then
+    call ``/attachments/confirm`` with the returned key.
+    """
     if not await LeadService.get(lead_id):
         raise HTTPException(404, "Lead not found")
-    return await LeadService.upload_attachment(lead_id, file)
+    return LeadService.presign_attachment(lead_id, payload)
+
+
+@router.post("/leads/{lead_id}/attachments/confirm", response_model=AttachmentOut)
+async def confirm_lead_attachment(lead_id: int, payload: AttachmentConfirmRequest, user: User = Depends(get_admin)):
+    if not await LeadService.get(lead_id):
+        raise HTTPException(404, "Lead not found")
+    return await LeadService.confirm_attachment(lead_id, payload)
 
 
 
@@ -85,6 +193,23 @@ async def create_order(payload: OrderCreate, user: User = Depends(get_admin)):
     return await OrderService.create(payload)
 
 
+@router.get("/orders/export", response_class=StreamingResponse)
+async def export_orders(
+    request: Request,
+    export_format: ExportFormat = Query("ndjson", alias="format"),
+    lead_id: Optional[int] = Query(None),
+    order_status: Optional[str] = Query(None, regex="^(draft|quoted|booked|delivered)$"),
+    user: User = Depends(get_admin),
+):
+    """
+    All matching orders as NDJSON or CSV, newest first, streamed from a
+    database cursor. Gzipped when the client accepts it.
+    """
+    gzip = accepts_gzip(request.headers.get("accept-encoding"))
+    chunks = OrderService.export(export_format, gzip=gzip, lead_id=lead_id, status=order_status)
+    return export_response(chunks, "orders", export_format, gzip)
+
+
 @router.get("/orders/{order_id}", response_model=OrderOut)
 async def read_order(order_id: int, user: User = Depends(get_admin)):
     order = await OrderService.get(order_id)
@@ -93,16 +218,25 @@ async def read_order(order_id: int, user: User = Depends(get_admin)):
     return order
 
 
-@router.get("/orders", response_model=List[OrderOut])
-@redis_cache(ttl=60)
+@router.get("/orders", response_model=Union[List[OrderOut], OrderPage])
+@redis_cache(ttl=300, tags=lambda kwargs: order_list_tags(kwargs["lead_id"]))
 async def list_orders(
     request: Request,
     lead_id: Optional[int] = Query(None),
     order_status: Optional[str] = Query(None, regex="^(draft|quoted|booked|delivered)$"),
     limit: int = Query(20, ge=1, le=100),
     offset: int = Query(0, ge=0),
+    pagination: Literal["offset", "cursor"] = Query("offset"),
+    cursor: Optional[str] = Query(None, max_length=128),
     user: User = Depends(get_admin),
 ):
+    if pagination == "cursor" or cursor:
+        return await OrderService.list_page(
+            lead_id=lead_id,
+            status=order_status,
+            limit=limit,
+            cursor=cursor,
+        )
     return await OrderService.list(
         lead_id=lead_id,
         status=order_status,
@@ -111,29 +245,27 @@ async def list_orders(
     )
 
 
+@router.patch("/orders/bulk", response_model=OrderBulkResult)
+async def bulk_update_orders(payload: OrderBulkUpdate, user: User = Depends(get_admin)):
+    """
+    Apply one update to a list of orders or to all orders matching a
+    filter, in one statement, with a per-order outcome.
+    """
+    return await OrderService.bulk_update(payload)
+
+
 @router.patch("/orders/{order_id}", response_model=OrderOut)
 async def update_order(order_id: int, payload: OrderUpdate, user: User = Depends(get_admin)):
-    order = await OrderService.get(order_id)
+    order = await OrderService.update(order_id, payload)
     if not order:
         raise HTTPException(404, "Order not found")
-
-    updated_order = await OrderService.update(order_id, payload)
-
-    if updated_order.status in {OrderStatus.QUOTED, OrderStatus.BOOKED}:
-        webhook_payload = {
-            "order_id": updated_order.id,
-            "final_price": float(updated_order.final_price or 0),
-        }
-        asyncio.create_task(send_webhook(webhook_payload))
-
-    return updated_order
+    return order
 
 
 @router.delete("/orders/{order_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_order(order_id: int, user: User = Depends(get_admin)):
-    if not await OrderService.get(order_id):
+    if not await OrderService.delete(order_id):
         raise HTTPException(404, "Order not found")
-    await OrderService.delete(order_id)
 
 
 @router.post("/calc", response_model=QuoteCalcResponse)
@@ -142,7 +274,55 @@ async def calc_quote(data: QuoteCalcRequest):
     return OrderService.calculate_price(data)
 
 
+@router.post("/calc/batch", response_class=StreamingResponse)
+async def calc_quote_batch(request: Request):
+    """
+    Price many quotes in one call. Accepts a columnar JSON object
+    (``{"base_price": [...], "distance_km": [...], ...}``) or NDJSON with one
+    ``QuoteCalcRequest`` per line, and streams back NDJSON results.
+    """
+    ndjson = request.headers.get("content-type", "").startswith(("application/x-ndjson", "application/jsonl"))
+    try:
+        columns = parse_batch(await request.body(), ndjson)
+    except ValueError as e:
+        raise HTTPException(400, f"Invalid batch: {e}")
+    if len(columns["base_price"]) > settings.PRICING_BATCH_MAX_ROWS:
+        raise HTTPException(413, f"Batch exceeds {settings.PRICING_BATCH_MAX_ROWS} rows")
+
+    results = await asyncio.to_thread(OrderService.calculate_price_batch, columns)
+    return StreamingResponse(results, media_type="application/x-ndjson")
+
+
+@router.get("/pricing/rules", response_model=PricingRulesOut)
+async def read_pricing_rules(user: User = Depends(get_admin)):
+    rules = current_rules()
+    return PricingRulesOut(version=rules.version, **rules.as_dict())
+
+
+@router.put("/pricing/rules", response_model=PricingRulesOut)
+async def update_pricing_rules(payload: PricingRules, user: User = Depends(get_admin)):
+    rules = await publish_pricing_rules(payload.model_dump(mode="json"), user_id=user.id)
+    return PricingRulesOut(version=rules.version, **rules.as_dict())
+
+
 @router.post("/orders/{order_id}/reprice", response_model=RepriceResponse)
 async def reprice_order(order_id: int, data: QuoteCalcRequest):
-    task_id = await enqueue_reprice(order_id, data.dict())
-    return RepriceResponse(task_id=task_id)
\ No newline at end of file
+    task_id = await enqueue_reprice(order_id, data.model_dump(mode="json"))
+    return RepriceResponse(task_id=task_id)
+
+
+@router.post("/tasks/bulk", response_model=TaskBulkResponse)
+async def read_tasks(payload: TaskBulkRequest):
+    return TaskBulkResponse(items=await get_task_statuses(payload.task_ids))
+
+
+@router.get("/tasks/{task_id}", response_model=TaskStatus)
+async def read_task(task_id: str, wait: float = Query(0, ge=0, le=settings.TASK_WAIT_MAX)):
+    """
+    Status of a queued reprice. With ``wait`` the request is held until the
+    task finishes or ``wait`` seconds pass.
+    """
+    status = await get_task_status(task_id, wait)
+    if status is None:
+        raise HTTPException(404, "Task not found")
+    return status
\ No newline at end of file
@@ -1,14 +1,19 @@
 from datetime import datetime
 from decimal import Decimal
-from typing import Literal, Optional
+from typing import Dict, List, Literal, Optional
 
-from pydantic import BaseModel, ConfigDict, EmailStr, Field
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, field_validator, model_validator
 
 from app.logistics.models import OrderStatus, VehicleType
 
 
 VehicleTypeLiteral = Literal["sedan", "suv", "truck"]
 OrderStatusLiteral = Literal["draft", "quoted", "booked", "delivered"]
+ZipMatchLiteral = Literal["exact", "prefix", "contains"]
+
+
+def normalize_zip(value: Optional[str]) -> Optional[str]:
+    return value.strip().upper() if value is not None else None
 
 
 class LeadBase(BaseModel):
@@ -24,11 +29,30 @@ class LeadBase(BaseModel):
 
     model_config = ConfigDict(use_enum_values=True)
 
+    _normalize_zip = field_validator("origin_zip", "dest_zip")(normalize_zip)
+
 
 class LeadCreate(LeadBase):
     pass
 
 
+ImportFormatLiteral = Literal["csv", "ndjson"]
+
+
+class LeadImportRowError(BaseModel):
+    row: int
+    errors: List[Dict]
+
+
+class LeadImportResult(BaseModel):
+    imported: int
+    failed: int
+    elapsed: float
+    rows_per_second: float
+    errors: List[LeadImportRowError]
+    errors_truncated: bool = False
+
+
 class LeadUpdate(BaseModel):
     name: Optional[str] = Field(None, max_length=128)
     phone: Optional[str] = Field(None, max_length=15)
@@ -40,6 +64,8 @@ class LeadUpdate(BaseModel):
     vehicle_type: Optional[VehicleTypeLiteral] = None
     operable: Optional[bool] = None
 
+    _normalize_zip = field_validator("origin_zip", "dest_zip")(normalize_zip)
+
 
 class LeadOut(LeadBase):
     id: int
@@ -50,6 +76,11 @@ class LeadOut(LeadBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class LeadPage(BaseModel):
+    items: List[LeadOut]
+    next_cursor: Optional[str] = None
+
+
 class OrderBase(BaseModel):
     lead_id: int
     status: OrderStatusLiteral = OrderStatus.DRAFT
@@ -79,6 +110,44 @@ class OrderUpdate(BaseModel):
     notes: Optional[str] = None
 
 
+ORDER_BULK_MAX = 10_000
+
+OrderBulkOutcomeLiteral = Literal["updated", "not_found", "invalid_transition"]
+
+
+class OrderBulkFilter(BaseModel):
+    lead_id: Optional[int] = None
+    status: Optional[OrderStatusLiteral] = None
+
+
+class OrderBulkUpdate(BaseModel):
+    """
+    One ``OrderUpdate`` applied to the listed ``ids`` or to every order
+    matching ``filter``.
+    """
+    ids: Optional[List[int]] = Field(None, min_length=1, max_length=ORDER_BULK_MAX)
+    filter: Optional[OrderBulkFilter] = None
+    update: OrderUpdate
+
+    @model_validator(mode="after")
+    def _one_target(self):
+        if (self.ids is None) == (self.filter is None):
+            raise ValueError("Pass either ids or filter")
+        return self
+
+
+class OrderBulkItem(BaseModel):
+    id: int
+    outcome: OrderBulkOutcomeLiteral
+    previous_status: Optional[OrderStatusLiteral] = None
+    status: Optional[OrderStatusLiteral] = None
+
+
+class OrderBulkResult(BaseModel):
+    updated: int
+    items: List[OrderBulkItem]
+
+
 class OrderOut(OrderBase):
     id: int
     created_at: datetime
@@ -87,6 +156,11 @@ class OrderOut(OrderBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class OrderPage(BaseModel):
+    items: List[OrderOut]
+    next_cursor: Optional[str] = None
+
+
 class QuoteCalcRequest(BaseModel):
     base_price: Decimal = Field(...)
     distance_km: float = Field(...)
@@ -108,6 +182,72 @@ class QuoteCalcResponse(BaseModel):
     final_price: Decimal
 
 
+AttachmentTypeLiteral = Literal[
+    "image/png", "image/jpeg", "image/gif", "image/webp", "image/tiff", "application/pdf",
+]
+
+
+class AttachmentOut(BaseModel):
+    lead_id: int
+    attachment: str
+    content_type: str
+    size: int
+    sha256: Optional[str] = None
+
+
+class AttachmentPresignRequest(BaseModel):
+    content_type: AttachmentTypeLiteral
+    size: int = Field(gt=0)
+
+
+class AttachmentPresignResponse(BaseModel):
+    key: str
+    url: str
+    method: Literal["PUT"] = "PUT"
+    headers: Dict[str, str]
+    expires_in: int
+
+
+class AttachmentConfirmRequest(BaseModel):
+    key: str = Field(max_length=255)
+
+
 class RepriceResponse(BaseModel):
     task_id: str
-    message: str = "Repricing task queued"
\ No newline at end of file
+    message: str = "Repricing task queued"
+
+
+class PricingRules(BaseModel):
+    distance_coeff: Decimal = Field(..., allow_inf_nan=False)
+    vehicle_type_bonus: Dict[VehicleTypeLiteral, Decimal]
+    season_bonus: Dict[str, Decimal]
+    operable_adjustment: Decimal = Field(..., allow_inf_nan=False)
+    inoperable_adjustment: Decimal = Field(..., allow_inf_nan=False)
+
+
+class PricingRulesOut(PricingRules):
+    version: int
+
+
+# "retrying": a failed attempt, pending until a worker claims it back.
+TaskStateLiteral = Literal["queued", "running", "retrying", "done", "failed"]
+
+
+class TaskStatus(BaseModel):
+    task_id: str
+    state: TaskStateLiteral
+    order_id: Optional[int] = None
+    attempts: int = 0
+    queued_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Optional[dict] = None
+    error: Optional[str] = None
+
+
+class TaskBulkRequest(BaseModel):
+    task_ids: List[str] = Field(..., min_length=1, max_length=1000)
+
+
+class TaskBulkResponse(BaseModel):
+    items: Dict[str, Optional[TaskStatus]]
@@ -1,40 +1,128 @@
-import asyncio
 import os
-from typing import List, Optional
-from uuid import uuid4
+import re
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, List, Optional
 from decimal import Decimal
-import httpx
-from fastapi import UploadFile, HTTPException
-
+from uuid import uuid4
+from fastapi import HTTPException
+from starlette.requests import Request
+from starlette.responses import Response
+from tortoise.transactions import in_transaction
+
+from app.config import settings
+from app.logistics import pricing
+from app.logistics.imports import import_leads
 from app.logistics.models import Lead, Order, VehicleType, OrderStatus
 from app.logistics.schemas import (
-    LeadCreate, LeadUpdate, LeadOut,
-    OrderCreate, OrderUpdate, OrderOut, QuoteCalcRequest, QuoteCalcResponse, PriceBreakdown,
+    normalize_zip, ZipMatchLiteral, ImportFormatLiteral,
+    LeadCreate, LeadUpdate, LeadOut, LeadPage, LeadImportResult,
+    OrderCreate, OrderUpdate, OrderOut, OrderPage, QuoteCalcRequest, QuoteCalcResponse, PriceBreakdown,
+    AttachmentOut, AttachmentPresignRequest, AttachmentPresignResponse, AttachmentConfirmRequest,
+    ORDER_BULK_MAX, OrderBulkItem, OrderBulkResult, OrderBulkUpdate,
 )
-from app.utils.functions import save_file
+from app.service.storage_service import serve_object, storage
+from app.service.webhook_service import enqueue_webhooks
+from app.utils.cache import invalidate_tags
+from app.utils.export import ExportFormat, export_rows
+from app.utils.pagination import keyset_page
+from app.utils.upload import EXTENSIONS, SNIFF_BYTES, receive_file, sniff_content_type
+from app.utils.writes import delete_returning, fetch_row, update_returning, update_returning_sql
 
 import logging
 
 logger = logging.getLogger("app")
-WEBHOOK_URL = "https://example.com/webhook"
-
-
-async def send_webhook(payload: dict, retries: int = 3, backoff_factor: int = 2):
-    delay = 1
-    for attempt in range(1, retries + 1):
-        try:
-            async with httpx.AsyncClient(timeout=10) as client:
-                response = await client.post(WEBHOOK_URL, json=payload)
-                response.raise_for_status()
-            logger.info(f"Webhook sent successfully on attempt {attempt}", extra={"payload": payload})
-            return
-        except Exception as e:
-            logger.warning(f"Webhook attempt {attempt} failed: {e}", extra={"payload": payload})
-            if attempt < retries:
-                await asyncio.sleep(delay)
-                delay *= backoff_factor
-            else:
-                logger.error("Webhook failed after all retries", extra={"payload": payload, "error": str(e)})
+
+DIRECT_UPLOAD_KEY = re.compile(r"attachments/\d+/[0-9a-f]{32}\.[a-z]+")
+
+# Exports carry the same fields as LeadOut / OrderOut.
+LEAD_EXPORT_COLUMNS = tuple(LeadOut.model_fields)
+ORDER_EXPORT_COLUMNS = tuple(OrderOut.model_fields)
+
+
+def lead_list_tags(user_id: int) -> list[str]:
+    return [f"leads:user:{user_id}"]
+
+
+def order_list_tags(lead_id: Optional[int]) -> list[str]:
+    return [f"orders:lead:{lead_id}"] if lead_id else ["orders:all"]
+
+
+def order_write_tags(lead_id: int) -> list[str]:
+    """
+    A write to an order affects its lead's listing and the unfiltered one.
+    """
+    return order_list_tags(lead_id) + order_list_tags(None)
+
+
+def order_webhook_payload(order_id: int, final_price: Optional[Decimal]) -> dict:
+    return {
+        "order_id": order_id,
+        "final_price": float(final_price or 0),
+    }
+
+
+# Status changes an order may make; keeping the current status is always
+# allowed.
+ORDER_STATUS_TRANSITIONS = {
+    OrderStatus.DRAFT: {OrderStatus.QUOTED},
+    OrderStatus.QUOTED: {OrderStatus.DRAFT, OrderStatus.BOOKED},
+    OrderStatus.BOOKED: {OrderStatus.DELIVERED},
+    OrderStatus.DELIVERED: set(),
+}
+
+
+
+def status_sources(status: str) -> list[str]:
+    """
+    The statuses an order may be in to be moved to ``status``.
+    """
+    return [
+        source.value for source, targets in ORDER_STATUS_TRANSITIONS.items()
+        if source == status or status in targets
+    ]
+
+
+WEBHOOK_STATUSES = {OrderStatus.QUOTED, OrderStatus.BOOKED}
+
+# {update}: the single-row UPDATE ... RETURNING *. The outbox payload must
+# match ``order_webhook_payload``. An existing order the update skipped
+# (its status can't make the change) comes back as a row of NULLs with
+# only "previous_status" set; an unknown id returns no row.
+ORDER_UPDATE_SQL = """
+WITH existing AS (
+    SELECT "status" FROM "orders" WHERE "id" = $1
+), updated AS (
+    {update}
+), outbox AS (
+    INSERT INTO "webhook_outbox" ("endpoint", "payload")
+    SELECT {endpoint}::varchar, jsonb_build_object('order_id', "id", 'final_price', COALESCE("final_price", 0)::float8)
+    FROM updated
+    WHERE "status" = ANY({statuses}::varchar[])
+)
+SELECT updated.*, existing."status" AS "previous_status"
+FROM existing LEFT JOIN updated ON true
+"""
+
+ORDER_BULK_COLUMNS = {"status": "varchar", "base_price": "numeric", "final_price": "numeric", "notes": "text"}
+
+# {target}: CTE selecting the "id" and current "status" of the orders to
+# change, locked; {source}: the ids to report on, as "src"; {set}: the
+# assignments.
+ORDER_BULK_UPDATE_SQL = """
+WITH target AS (
+    {target}
+), updated AS (
+    UPDATE "orders" AS o SET {set}, "updated_at" = CURRENT_TIMESTAMP
+    FROM target
+    WHERE o."id" = target."id" AND ($1::varchar[] IS NULL OR target."status" = ANY($1::varchar[]))
+    RETURNING o."id", o."lead_id", o."status", o."final_price"
+)
+SELECT src."id", target."status" AS "previous_status", updated."id" IS NOT NULL AS "updated",
+       updated."lead_id", updated."status", updated."final_price"
+FROM {source}
+LEFT JOIN target ON target."id" = src."id"
+LEFT JOIN updated ON updated."id" = src."id"
+"""
 
 
 # def _vehicle_type_from_str(s: str) -> VehicleType:
@@ -60,87 +148,219 @@ class LeadService:
         payload = data.model_dump(mode="python")
         payload["created_by_id"] = user_id
         lead = await Lead.create(**payload)
+        await invalidate_tags(*lead_list_tags(user_id))
         return LeadOut.model_validate(lead)
 
+    @staticmethod
+    async def bulk_import(chunks: AsyncIterator[bytes], fmt: ImportFormatLiteral, user_id: int) -> LeadImportResult:
+        result = await import_leads(chunks, fmt, user_id)
+        if result.imported:
+            await invalidate_tags(*lead_list_tags(user_id))
+        return result
+
     @staticmethod
     async def get(lead_id: int) -> Optional[LeadOut]:
         lead = await Lead.get_or_none(id=lead_id).prefetch_related("created_by")
         return LeadOut.model_validate(lead) if lead else None
 
     @staticmethod
-    async def list(
+    def _filter(
         user_id: int,
-        *,
         origin_zip: Optional[str] = None,
         dest_zip: Optional[str] = None,
         vehicle_type: Optional[str] = None,
         operable: Optional[bool] = None,
-        limit: int = 20,
-        offset: int = 0,
-    ) -> List[LeadOut]:
+        zip_match: ZipMatchLiteral = "contains",
+    ):
         qs = Lead.filter(created_by_id=user_id)
 
+        # Zips are stored normalized, so every mode is a case-sensitive
+        # comparison: exact/prefix hit the text_pattern_ops indexes and
+        # contains hits the pg_trgm GIN indexes.
+        lookup = {"exact": "", "prefix": "__startswith", "contains": "__contains"}[zip_match]
         if origin_zip:
-            qs = qs.filter(origin_zip__icontains=origin_zip)
+            qs = qs.filter(**{f"origin_zip{lookup}": normalize_zip(origin_zip)})
         if dest_zip:
-            qs = qs.filter(dest_zip__icontains=dest_zip)
+            qs = qs.filter(**{f"dest_zip{lookup}": normalize_zip(dest_zip)})
         if vehicle_type:
             qs = qs.filter(vehicle_type=vehicle_type)
         if operable is not None:
             qs = qs.filter(operable=operable)
+        return qs
+
+    @staticmethod
+    async def list(
+        user_id: int,
+        *,
+        origin_zip: Optional[str] = None,
+        dest_zip: Optional[str] = None,
+        vehicle_type: Optional[str] = None,
+        operable: Optional[bool] = None,
+        zip_match: ZipMatchLiteral = "contains",
+        limit: int = 20,
+        offset: int = 0,
+    ) -> List[LeadOut]:
+        qs = LeadService._filter(user_id, origin_zip, dest_zip, vehicle_type, operable, zip_match)
 
-        leads = await qs.order_by("-created_at") \
+        leads = await qs.order_by("-created_at", "-id") \
             .offset(offset) \
-            .limit(limit) \
-            .select_related("created_by")
+            .limit(limit)
 
         return [LeadOut.model_validate(l) for l in leads]
 
     @staticmethod
-    async def update(lead_id: int, data: LeadUpdate) -> LeadOut:
-        lead = await Lead.get(id=lead_id)
-        upd = data.model_dump(exclude_unset=True, mode="python")
-        if "vehicle_type" in upd:
-            upd["vehicle_type"] = upd["vehicle_type"]
-        await lead.update_from_dict(upd)
-        await lead.save()
-        return LeadOut.model_validate(lead)
+    def export(
+        user_id: int,
+        fmt: ExportFormat,
+        *,
+        gzip: bool = False,
+        origin_zip: Optional[str] = None,
+        dest_zip: Optional[str] = None,
+        vehicle_type: Optional[str] = None,
+        operable: Optional[bool] = None,
+        zip_match: ZipMatchLiteral = "contains",
+    ) -> AsyncIterator[bytes]:
+        qs = LeadService._filter(user_id, origin_zip, dest_zip, vehicle_type, operable, zip_match)
+        return export_rows(qs.order_by("-created_at", "-id"), LEAD_EXPORT_COLUMNS, fmt, gzip)
 
     @staticmethod
-    async def delete(lead_id: int) -> None:
-        lead = await Lead.get(id=lead_id)
-        await lead.delete()
+    async def list_page(
+        user_id: int,
+        *,
+        origin_zip: Optional[str] = None,
+        dest_zip: Optional[str] = None,
+        vehicle_type: Optional[str] = None,
+        operable: Optional[bool] = None,
+        zip_match: ZipMatchLiteral = "contains",
+        limit: int = 20,
+        cursor: Optional[str] = None,
+    ) -> LeadPage:
+        qs = LeadService._filter(user_id, origin_zip, dest_zip, vehicle_type, operable, zip_match)
+        leads, next_cursor = await keyset_page(qs, cursor, limit)
+        return LeadPage(items=[LeadOut.model_validate(l) for l in leads], next_cursor=next_cursor)
 
+    @staticmethod
+    async def update(lead_id: int, data: LeadUpdate) -> Optional[LeadOut]:
+        """
+        Writes only the given fields; None when the lead doesn't exist.
+        """
+        lead = await update_returning(Lead, lead_id, data.model_dump(exclude_unset=True, mode="python"))
+        if lead is None:
+            return None
+        await invalidate_tags(*lead_list_tags(lead.created_by_id))
+        return LeadOut.model_validate(lead)
 
     @staticmethod
-    async def upload_attachment(lead_id: int, file: UploadFile):
-        lead = await Lead.get(id=lead_id)
+    async def delete(lead_id: int) -> bool:
+        row = await delete_returning(Lead, lead_id, "created_by_id")
+        if row is None:
+            return False
+        # Orders are removed by ON DELETE CASCADE.
+        await invalidate_tags(*lead_list_tags(row["created_by_id"]), *order_write_tags(lead_id))
+        return True
 
-        if not (file.content_type.startswith("image/") or file.content_type == "application/pdf"):
-            raise HTTPException(400, "Invalid file type. Only images or PDFs are allowed.")
 
-        content = await file.read()
-        if len(content) > 5 * 1024 * 1024:
-            raise HTTPException(400, "File too large. Maximum 5 MB allowed.")
-        await file.seek(0)
+    @staticmethod
+    async def upload_attachment(lead_id: int, request: Request) -> AttachmentOut:
+        lead = await Lead.get(id=lead_id)
+        received = await receive_file(request, storage.tmp_dir)
+
+        # Named by content hash: identical uploads share one object.
+        key = f"attachments/{received.sha256}.{received.ext}"
+        if await storage.stat(key) is None:
+            await storage.put_file(key, received.path, received.content_type)
+        else:
+            os.remove(received.path)
+
+        lead.attachment = key
+        await lead.save(update_fields=["attachment"])
+        return AttachmentOut(
+            lead_id=lead.id,
+            attachment=key,
+            content_type=received.content_type,
+            size=received.size,
+            sha256=received.sha256,
+        )
 
-        ext = file.filename.split(".")[-1]
-        object_name = f"{uuid4()}.{ext}"
+    @staticmethod
+    async def attachment_response(lead_id: int, request: Request) -> Response:
+        lead = await Lead.get_or_none(id=lead_id).only("id", "attachment")
+        if not lead:
+            raise HTTPException(404, "Lead not found")
+        if not lead.attachment:
+            raise HTTPException(404, "Attachment not found")
+        return await serve_object(storage, lead.attachment, request)
 
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        upload_dir = os.path.join(base_dir, "uploads", "attachments")
-        os.makedirs(upload_dir, exist_ok=True)
+    @staticmethod
+    def presign_attachment(lead_id: int, data: AttachmentPresignRequest) -> AttachmentPresignResponse:
+        if data.size > settings.ATTACHMENT_MAX_SIZE:
+            raise HTTPException(413, f"File too large. Maximum {settings.ATTACHMENT_MAX_SIZE // (1024 * 1024)} MB allowed.")
+
+        key = f"attachments/{lead_id}/{uuid4().hex}.{EXTENSIONS[data.content_type]}"
+        url = storage.presigned_put_url(key, settings.STORAGE_PRESIGN_EXPIRES)
+        if url is None:
+            raise HTTPException(400, "Direct uploads need object storage; upload through the API instead")
+        return AttachmentPresignResponse(
+            key=key,
+            url=url,
+            headers={"Content-Type": data.content_type},
+            expires_in=settings.STORAGE_PRESIGN_EXPIRES,
+        )
 
-        file_path = os.path.join(upload_dir, object_name)
+    @staticmethod
+    async def confirm_attachment(lead_id: int, data: AttachmentConfirmRequest) -> AttachmentOut:
+        """
+        Attach an object the client uploaded with a presigned URL, after
+        checking it is there, within the size limit and really an image/PDF.
+        """
+        if not DIRECT_UPLOAD_KEY.fullmatch(data.key) or not data.key.startswith(f"attachments/{lead_id}/"):
+            raise HTTPException(400, "Invalid attachment key")
+
+        obj = await storage.stat(data.key)
+        if obj is None:
+            raise HTTPException(404, "Upload not found")
+        if obj.last_modified and obj.last_modified < datetime.now(timezone.utc) - timedelta(
+            seconds=settings.STORAGE_UNCONFIRMED_TTL // 2,
+        ):
+            # Left for sweep_unconfirmed_uploads, which may be deleting it.
+            raise HTTPException(410, "Upload expired; upload the file again")
+        if obj.size > settings.ATTACHMENT_MAX_SIZE:
+            await storage.delete(data.key)
+            raise HTTPException(413, f"File too large. Maximum {settings.ATTACHMENT_MAX_SIZE // (1024 * 1024)} MB allowed.")
+        detected = sniff_content_type(await storage.read_head(data.key, SNIFF_BYTES))
+        if detected is None:
+            await storage.delete(data.key)
+            raise HTTPException(400, "Invalid file type. Only images or PDFs are allowed.")
 
-        await save_file(file, file_path)
+        lead = await Lead.get(id=lead_id)
+        lead.attachment = data.key
+        await lead.save(update_fields=["attachment"])
+        return AttachmentOut(lead_id=lead.id, attachment=data.key, content_type=detected[0], size=obj.size)
 
-        lead.attachment = os.path.join("uploads", "attachments", object_name)
-        await lead.save()
-        return {
-            "lead_id": lead.id,
-            "attachment": lead.attachment,
-        }
+    @staticmethod
+    async def sweep_unconfirmed_uploads(older_than: int = settings.STORAGE_UNCONFIRMED_TTL,
+                                        dry_run: bool = False) -> List[str]:
+        """
+        Delete direct uploads (``attachments/<lead_id>/...``) older than
+        ``older_than`` seconds that no lead points at: presigned uploads
+        that were never confirmed, and ones a later upload replaced.
+        Returns the deleted keys.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=older_than)
+        stale = [
+            obj.key for obj in await storage.list_objects("attachments/")
+            if DIRECT_UPLOAD_KEY.fullmatch(obj.key) and obj.last_modified and obj.last_modified < cutoff
+        ]
+        deleted = []
+        for start in range(0, len(stale), 1000):
+            chunk = stale[start:start + 1000]
+            attached = set(await Lead.filter(attachment__in=chunk).values_list("attachment", flat=True))
+            for key in chunk:
+                if key not in attached:
+                    if not dry_run:
+                        await storage.delete(key)
+                    deleted.append(key)
+        return deleted
 
 class OrderService:
     @staticmethod
@@ -148,6 +368,7 @@ class OrderService:
         payload = data.model_dump(mode="python")
         payload["status"] = data.status
         order = await Order.create(**payload)
+        await invalidate_tags(*order_write_tags(order.lead_id))
         return OrderOut.model_validate(order)
 
     @staticmethod
@@ -157,65 +378,163 @@ class OrderService:
         return OrderOut.model_validate(order) if order else None
 
     @staticmethod
-    async def list(
-        lead_id: Optional[int] = None,
-        status: Optional[str] = None,
-        limit: int = 20,
-        offset: int = 0,
-    ) -> List[OrderOut]:
+    def _filter(lead_id: Optional[int] = None, status: Optional[str] = None):
         qs = Order.all()
 
         if lead_id:
             qs = qs.filter(lead_id=lead_id)
         if status:
             qs = qs.filter(status=status)
+        return qs
 
-        orders = await qs.order_by("-created_at") \
+    @staticmethod
+    async def list(
+        lead_id: Optional[int] = None,
+        status: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> List[OrderOut]:
+        qs = OrderService._filter(lead_id, status)
+
+        orders = await qs.order_by("-created_at", "-id") \
             .offset(offset) \
-            .limit(limit) \
-            .select_related("lead__created_by")
+            .limit(limit)
 
         return [OrderOut.model_validate(o) for o in orders]
 
     @staticmethod
-    async def update(order_id: int, data: OrderUpdate) -> OrderOut:
-        order = await Order.get(id=order_id)
+    def export(
+        fmt: ExportFormat,
+        *,
+        gzip: bool = False,
+        lead_id: Optional[int] = None,
+        status: Optional[str] = None,
+    ) -> AsyncIterator[bytes]:
+        qs = OrderService._filter(lead_id, status)
+        return export_rows(qs.order_by("-created_at", "-id"), ORDER_EXPORT_COLUMNS, fmt, gzip)
+
+    @staticmethod
+    async def list_page(
+        lead_id: Optional[int] = None,
+        status: Optional[str] = None,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+    ) -> OrderPage:
+        qs = OrderService._filter(lead_id, status)
+        orders, next_cursor = await keyset_page(qs, cursor, limit)
+        return OrderPage(items=[OrderOut.model_validate(o) for o in orders], next_cursor=next_cursor)
+
+    @staticmethod
+    async def update(order_id: int, data: OrderUpdate) -> Optional[OrderOut]:
+        """
+        Writes only the given fields; None when the order doesn't exist.
+        A status change ``ORDER_STATUS_TRANSITIONS`` doesn't allow is a 409
+        and leaves the order as it was.
+        """
         upd = data.model_dump(exclude_unset=True, mode="python")
         if "status" in upd:
-            upd["status"] = upd["status"]
-        await order.update_from_dict(upd)
-        await order.save()
+            sql, params = update_returning_sql(
+                Order, order_id, upd, '"status" = ANY({}::varchar[])', [status_sources(upd["status"])],
+            )
+        else:
+            sql, params = update_returning_sql(Order, order_id, upd)
+        params += [settings.WEBHOOK_URL, [status.value for status in WEBHOOK_STATUSES]]
+        # The webhook is written to the outbox by the same statement, so it
+        # is sent if and only if the change is committed.
+        row = await fetch_row(ORDER_UPDATE_SQL.format(
+            update=sql, endpoint=f"${len(params) - 1}", statuses=f"${len(params)}",
+        ), params)
+        if row is None:
+            return None
+        if row["id"] is None:
+            raise HTTPException(409, f"Order can't move from {row['previous_status']} to {upd['status']}")
+        order = Order._init_from_db(**dict(row))
+        await invalidate_tags(*order_write_tags(order.lead_id))
         return OrderOut.model_validate(order)
 
     @staticmethod
-    async def delete(order_id: int) -> None:
-        order = await Order.get(id=order_id)
-        await order.delete()
+    async def bulk_update(data: OrderBulkUpdate) -> OrderBulkResult:
+        """
+        Apply one update to many orders in a single statement. Rows whose
+        current status can't move to the new one are left alone and
+        reported, as are unknown ids.
+        """
+        upd = data.update.model_dump(exclude_unset=True, mode="python")
+        if not upd:
+            raise HTTPException(400, "Nothing to update")
+
+        sources = status_sources(upd["status"]) if "status" in upd else None
+        params: list = [sources]
+
+        def param(value, cast: str) -> str:
+            params.append(value)
+            return f"${len(params)}::{cast}"
+
+        if data.ids is not None:
+            ids = param(list(dict.fromkeys(data.ids)), "int[]")
+            target = f'SELECT "id", "status" FROM "orders" WHERE "id" = ANY({ids}) FOR UPDATE'
+            source = f'unnest({ids}) WITH ORDINALITY AS src("id", "n")'
+        else:
+            lead_id = param(data.filter.lead_id, "int")
+            status = param(data.filter.status, "varchar")
+            target = (
+                f'SELECT "id", "status" FROM "orders" '
+                f'WHERE ({lead_id} IS NULL OR "lead_id" = {lead_id}) AND ({status} IS NULL OR "status" = {status}) '
+                f'ORDER BY "id" LIMIT {ORDER_BULK_MAX + 1} FOR UPDATE'
+            )
+            source = "target AS src"
+        assignments = ", ".join(f'"{name}" = {param(value, ORDER_BULK_COLUMNS[name])}' for name, value in upd.items())
+        order = 'src."n"' if data.ids is not None else 'src."id"'
+        sql = ORDER_BULK_UPDATE_SQL.format(target=target, source=source, set=assignments) + f"ORDER BY {order}"
+
+        async with in_transaction() as conn:
+            _, rows = await conn.execute_query(sql, params)
+            if len(rows) > ORDER_BULK_MAX:
+                # Raising rolls the update back.
+                raise HTTPException(413, f"Filter matches more than {ORDER_BULK_MAX} orders")
+            updated = [row for row in rows if row["updated"]]
+            await enqueue_webhooks(
+                [order_webhook_payload(row["id"], row["final_price"]) for row in updated if row["status"] in WEBHOOK_STATUSES],
+                using_db=conn,
+            )
+
+        tags = {tag for row in updated for tag in order_write_tags(row["lead_id"])}
+        if tags:
+            await invalidate_tags(*tags)
+
+        items = []
+        for row in rows:
+            if row["updated"]:
+                outcome, status = "updated", row["status"]
+            elif row["previous_status"] is None:
+                outcome, status = "not_found", None
+            else:
+                outcome, status = "invalid_transition", row["previous_status"]
+            items.append(OrderBulkItem(id=row["id"], outcome=outcome, previous_status=row["previous_status"], status=status))
+        return OrderBulkResult(updated=len(updated), items=items)
+
+    @staticmethod
+    async def delete(order_id: int) -> bool:
+        row = await delete_returning(Order, order_id, "lead_id")
+        if row is None:
+            return False
+        await invalidate_tags(*order_write_tags(row["lead_id"]))
+        return True
 
 
 
     @staticmethod
-    def calculate_price(data: QuoteCalcRequest) -> QuoteCalcResponse:
-        coeff = Decimal("1.5")
+    def calculate_price(data: QuoteCalcRequest, rules: Optional[pricing.CompiledRules] = None) -> QuoteCalcResponse:
+        rules = rules or pricing.current_rules()
 
-        type_bonus_map = {
-            "sedan": Decimal("0"),
-            "suv": Decimal("200"),
-            "truck": Decimal("400"),
-        }
-        vehicle_type_bonus = type_bonus_map.get(data.vehicle_type, Decimal("0"))
+        vehicle_type_bonus = rules.vehicle_type_bonus.get(data.vehicle_type, pricing.ZERO)
 
         # Season bonus
-        season_bonus_map = {
-            "winter": Decimal("300"),
-            "summer": Decimal("150"),
-            "normal": Decimal("0"),
-        }
-        season_bonus = season_bonus_map.get(data.season, Decimal("0"))
+        season_bonus = rules.season_bonus.get(data.season, pricing.ZERO)
 
-        operable_adjustment = Decimal("-100" if data.operable else "200")
+        operable_adjustment = rules.operable_adjustment[data.operable]
 
-        distance_cost = Decimal(data.distance_km) * coeff
+        distance_cost = Decimal(data.distance_km) * rules.distance_coeff
 
         final_price = (
                 data.base_price
@@ -235,5 +554,17 @@ class OrderService:
 
         return QuoteCalcResponse(
             price_breakdown=breakdown,
-            final_price=final_price.quantize(Decimal("0.01")),
-        )
\ No newline at end of file
+            final_price=final_price.quantize(pricing.CENT),
+        )
+
+    @staticmethod
+    def calculate_price_batch(columns: dict[str, list]):
+        """
+        Vectorized ``calculate_price`` over columns; returns NDJSON chunks
+        with one result per row, in input order.
+        """
+        def scalar(row: dict, rules: pricing.CompiledRules) -> Decimal:
+            return OrderService.calculate_price(QuoteCalcRequest(**row), rules).final_price
+
+        cents, prices, errors = pricing.price_batch(columns, scalar, pricing.current_rules())
+        return pricing.stream_results(cents, prices, errors)
\ No newline at end of file
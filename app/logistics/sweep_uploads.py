@@ -0,0 +1,43 @@
+"""
+Delete direct uploads that were never confirmed.
+
+    python -m app.logistics.sweep_uploads [--older-than SECONDS] [--dry-run]
+
+A presigned PUT puts the object under ``attachments/<lead_id>/`` before
+the client calls ``/attachments/confirm``; if it never does, nothing
+points at the object. Run this periodically (cron, a scheduled job) to
+remove such objects, and direct uploads a later upload replaced, once
+they are ``STORAGE_UNCONFIRMED_TTL`` old. A bucket lifecycle rule can't
+do it: confirmed and unconfirmed objects share the prefix.
+"""
+import argparse
+import asyncio
+import logging
+
+from tortoise import Tortoise
+
+from app.config import settings
+from app.database import TORTOISE_ORM
+from app.logistics.services import LeadService
+
+logger = logging.getLogger("app")
+
+
+async def main(args: argparse.Namespace) -> None:
+    await Tortoise.init(config=TORTOISE_ORM)
+    try:
+        deleted = await LeadService.sweep_unconfirmed_uploads(args.older_than, dry_run=args.dry_run)
+    finally:
+        await Tortoise.close_connections()
+    for key in deleted:
+        logger.info("%s %s", "Would delete" if args.dry_run else "Deleted", key)
+    logger.info("%s unconfirmed uploads %s", len(deleted), "found" if args.dry_run else "deleted")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Delete direct uploads that were never confirmed.")
+    parser.add_argument("--older-than", type=int, default=settings.STORAGE_UNCONFIRMED_TTL,
+                        help="Seconds since upload; keep it above STORAGE_UNCONFIRMED_TTL / 2")
+    parser.add_argument("--dry-run", action="store_true", help="List what would be deleted")
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(parser.parse_args()))
@@ -1,16 +1,39 @@
+import asyncio
 import json
+import time
 import uuid
 from decimal import Decimal
 from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+from tortoise import connections
 
+from app.config import settings
+from app.logistics import pricing
 from app.logistics.schemas import QuoteCalcRequest
-from app.logistics.services import OrderService
-from app.service.redis_service import get_redis
+from app.logistics.services import OrderService, order_write_tags
+from app.service.redis_service import get_redis, pubsub_hub
+from app.utils.cache import invalidate_tags
 import logging
 logger = logging.getLogger("app")
 
 
-TASK_QUEUE_KEY = "order_reprice_queue"
+# Largest value that fits orders.final_price (DECIMAL(12, 2)).
+MAX_PRICE = Decimal("9999999999.99")
+
+# One statement per batch: unnest the (id, price) pairs and join them to
+# the orders; RETURNING tells which orders still exist.
+UPDATE_PRICES_SQL = """
+UPDATE "orders" AS o
+SET "final_price" = v.price, "updated_at" = CURRENT_TIMESTAMP
+FROM unnest($1::int[], $2::numeric[]) AS v(id, price)
+WHERE o.id = v.id
+RETURNING o.id, o.lead_id
+"""
+
+
+TASK_KEY_PREFIX = "task:"
+TASK_CHANNEL_PREFIX = "task:events:"
+FINAL_STATES = ("done", "failed")
 
 
 class EnhancedJSONEncoder(json.JSONEncoder):
@@ -20,6 +43,18 @@ class EnhancedJSONEncoder(json.JSONEncoder):
         return super().default(obj)
 
 
+def set_task_state(pipe, task_id: str, state: str, **fields) -> None:
+    """
+    Queue a status update for ``task_id`` on ``pipe``; final states are
+    also published so long-polling readers wake up.
+    """
+    key = TASK_KEY_PREFIX + task_id
+    pipe.hset(key, mapping={"state": state, **fields})
+    pipe.expire(key, settings.TASK_STATUS_TTL)
+    if state in FINAL_STATES:
+        pipe.publish(TASK_CHANNEL_PREFIX + task_id, state)
+
+
 async def enqueue_reprice(order_id: int, order_data: dict) -> str:
     task_id = str(uuid.uuid4())
     redis: Redis = await get_redis()
@@ -27,18 +62,304 @@ async def enqueue_reprice(order_id: int, order_data: dict) -> str:
     payload = {
         "task_id": task_id,
         "order_id": order_id,
-        "data": order_data,
+        "data": json.dumps(order_data, cls=EnhancedJSONEncoder),
     }
 
-    await redis.lpush(TASK_QUEUE_KEY, json.dumps(payload, cls=EnhancedJSONEncoder))
+    async with redis.pipeline(transaction=True) as pipe:
+        set_task_state(pipe, task_id, "queued", order_id=order_id, queued_at=time.time())
+        pipe.xadd(settings.REPRICE_STREAM, payload, maxlen=settings.REPRICE_STREAM_MAXLEN, approximate=True)
+        await pipe.execute()
     return task_id
 
 
-async def reprice_worker():
+def _parse_task(task_id: str, raw: dict) -> dict | None:
+    if not raw:
+        return None
+    return {
+        "task_id": task_id,
+        "state": raw["state"],
+        "order_id": int(raw["order_id"]) if raw.get("order_id") else None,
+        "attempts": int(raw.get("attempts", 0)),
+        "queued_at": float(raw["queued_at"]) if raw.get("queued_at") else None,
+        "started_at": float(raw["started_at"]) if raw.get("started_at") else None,
+        "finished_at": float(raw["finished_at"]) if raw.get("finished_at") else None,
+        "result": json.loads(raw["result"]) if raw.get("result") else None,
+        "error": raw.get("error") or None,
+    }
+
+
+async def get_task_statuses(task_ids: list[str]) -> dict[str, dict | None]:
+    """
+    Statuses for many tasks in one round-trip; unknown or expired ids map
+    to None.
+    """
+    redis: Redis = await get_redis()
+    async with redis.pipeline(transaction=False) as pipe:
+        for task_id in task_ids:
+            pipe.hgetall(TASK_KEY_PREFIX + task_id)
+        results = await pipe.execute()
+    return {task_id: _parse_task(task_id, raw) for task_id, raw in zip(task_ids, results)}
+
+
+async def get_task_status(task_id: str, wait: float = 0) -> dict | None:
+    """
+    Current status of a task. With ``wait`` the call blocks until the task
+    reaches a final state or ``wait`` seconds pass, woken by pub/sub rather
+    than polling.
+    """
+    redis: Redis = await get_redis()
+    status = _parse_task(task_id, await redis.hgetall(TASK_KEY_PREFIX + task_id))
+    if status is None or wait <= 0 or status["state"] in FINAL_STATES:
+        return status
+
+    async with pubsub_hub.listen(TASK_CHANNEL_PREFIX + task_id) as finished:
+        # Re-read after subscribing so a completion in between isn't missed.
+        status = _parse_task(task_id, await redis.hgetall(TASK_KEY_PREFIX + task_id))
+        if status is None or status["state"] in FINAL_STATES:
+            return status
+        try:
+            await asyncio.wait_for(finished.wait(), wait)
+        except asyncio.TimeoutError:
+            return status
+    return _parse_task(task_id, await redis.hgetall(TASK_KEY_PREFIX + task_id))
+
+
+async def reprice_queue_stats() -> dict:
     redis: Redis = await get_redis()
-    while True:
-        _, raw = await redis.brpop(TASK_QUEUE_KEY)
-        task = json.loads(raw)
-        data = QuoteCalcRequest(**task["data"])
-        result = OrderService.calculate_price(data)
-        logger.info(f"[Task {task['task_id']}] Repriced order {task['order_id']}: {result.final_price}")
+    try:
+        groups = await redis.xinfo_groups(settings.REPRICE_STREAM)
+        length = await redis.xlen(settings.REPRICE_STREAM)
+        dead = await redis.xlen(settings.REPRICE_DEAD_LETTER_STREAM)
+    except ResponseError:
+        return {}
+    group = next((g for g in groups if g["name"] == settings.REPRICE_GROUP), {})
+    return {
+        "length": length,
+        "pending": group.get("pending", 0),
+        "lag": group.get("lag"),
+        "consumers": group.get("consumers", 0),
+        "dead_letter": dead,
+    }
+
+
+class PermanentTaskError(Exception):
+    """
+    A task that can never succeed; it is dead-lettered without retries.
+    """
+
+
+class RepriceWorker:
+    """
+    Reprice consumer on a Redis Stream consumer group.
+
+    Entries are read in batches with XREADGROUP; up to ``concurrency``
+    batches are priced and written at once, each with a single UPDATE, and
+    acknowledged only after that UPDATE commits. Entries left pending by a
+    crashed consumer are taken over once idle for ``claim_idle_ms``; after
+    ``max_attempts`` deliveries, or on input that can never be priced, they
+    are moved to the dead-letter stream. Run as many processes as needed:
+    the group spreads entries across consumers.
+    """
+
+    def __init__(
+        self,
+        consumer: str,
+        concurrency: int = settings.REPRICE_CONCURRENCY,
+        batch_size: int = settings.REPRICE_BATCH_SIZE,
+        block_ms: int = settings.REPRICE_BLOCK_MS,
+        max_attempts: int = settings.REPRICE_MAX_ATTEMPTS,
+        claim_idle_ms: int = settings.REPRICE_CLAIM_IDLE_MS,
+    ):
+        self.stream = settings.REPRICE_STREAM
+        self.group = settings.REPRICE_GROUP
+        self.consumer = consumer
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.max_attempts = max_attempts
+        self.claim_idle_ms = claim_idle_ms
+        self._slots = asyncio.Semaphore(concurrency)
+        self._batches: set[asyncio.Task] = set()
+        self._stopping = asyncio.Event()
+        self.processed = 0
+        self.dead_lettered = 0
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    async def ensure_group(self, redis: Redis) -> None:
+        try:
+            await redis.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def run(self) -> None:
+        redis: Redis = await get_redis()
+        await self.ensure_group(redis)
+        logger.info("Reprice worker %s started (concurrency=%s)", self.consumer, self.concurrency)
+
+        next_claim = 0.0
+        while not self._stopping.is_set():
+            await self._slots.acquire()
+            try:
+                if time.monotonic() >= next_claim:
+                    next_claim = time.monotonic() + self.claim_idle_ms / 1000 / 2
+                    entries = await self._claim_stale(redis)
+                else:
+                    entries = []
+                if not entries:
+                    entries = await self._read(redis)
+            except asyncio.CancelledError:
+                self._slots.release()
+                raise
+            except Exception:
+                self._slots.release()
+                logger.exception("Reprice worker %s failed to read, retrying", self.consumer)
+                await asyncio.sleep(1)
+                continue
+
+            if not entries:
+                self._slots.release()
+                continue
+            task = asyncio.create_task(self._process(redis, entries))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+        # Leave the group tidy on a clean shutdown; a consumer that still
+        # owns entries is kept so they can be claimed.
+        if not await redis.xpending_range(self.stream, self.group, "-", "+", 1, consumername=self.consumer):
+            await redis.xgroup_delconsumer(self.stream, self.group, self.consumer)
+        logger.info("Reprice worker %s stopped", self.consumer)
+
+    async def _read(self, redis: Redis) -> list:
+        response = await redis.xreadgroup(
+            self.group, self.consumer, {self.stream: ">"}, count=self.batch_size, block=self.block_ms,
+        )
+        return response[0][1] if response else []
+
+    async def _claim_stale(self, redis: Redis) -> list:
+        """
+        Take over entries another consumer left pending; dead-letter the
+        ones that were already delivered ``max_attempts`` times, and the
+        ones trimmed from the stream (by MAXLEN) while pending, so they
+        leave the PEL.
+        """
+        pending = await redis.xpending_range(
+            self.stream, self.group, min="-", max="+", count=self.batch_size, idle=self.claim_idle_ms,
+        )
+        if not pending:
+            return []
+        attempts = {p["message_id"]: p["times_delivered"] for p in pending}
+        claimed = await redis.xclaim(self.stream, self.group, self.consumer, self.claim_idle_ms, list(attempts))
+
+        entries = []
+        for entry_id, fields in claimed:
+            if not fields:
+                await self._dead_letter(redis, entry_id, {}, "trimmed from the stream before it was processed")
+                continue
+            if attempts.get(entry_id, 0) >= self.max_attempts:
+                await self._dead_letter(redis, entry_id, fields, f"gave up after {attempts[entry_id]} attempts")
+            else:
+                entries.append((entry_id, fields))
+        if entries:
+            logger.warning("Reprice worker %s reclaimed %s stale entries", self.consumer, len(entries))
+        return entries
+
+    async def _dead_letter(self, redis: Redis, entry_id: str, fields: dict, reason: str) -> None:
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.xadd(
+                settings.REPRICE_DEAD_LETTER_STREAM,
+                {**fields, "source_id": entry_id, "error": reason},
+                maxlen=settings.REPRICE_STREAM_MAXLEN,
+                approximate=True,
+            )
+            pipe.xack(self.stream, self.group, entry_id)
+            if fields.get("task_id"):
+                set_task_state(pipe, fields["task_id"], "failed", error=reason, finished_at=time.time())
+            await pipe.execute()
+        self.dead_lettered += 1
+        logger.error("Reprice task %s dead-lettered: %s", fields.get("task_id"), reason)
+
+    @staticmethod
+    def _price(fields: dict, rules: pricing.CompiledRules) -> tuple[int, Decimal]:
+        try:
+            order_id = int(fields["order_id"])
+            data = QuoteCalcRequest(**json.loads(fields["data"]))
+            price = OrderService.calculate_price(data, rules).final_price
+        except Exception as e:
+            raise PermanentTaskError(f"invalid task: {e}")
+        if abs(price) > MAX_PRICE:
+            raise PermanentTaskError(f"price {price} does not fit final_price")
+        return order_id, price
+
+    async def _process(self, redis: Redis, entries: list) -> None:
+        try:
+            async with redis.pipeline(transaction=False) as pipe:
+                for _, fields in entries:
+                    if fields.get("task_id"):
+                        set_task_state(pipe, fields["task_id"], "running", started_at=time.time())
+                        pipe.hincrby(TASK_KEY_PREFIX + fields["task_id"], "attempts", 1)
+                await pipe.execute()
+
+            rules = pricing.current_rules()
+            prices: dict[int, Decimal] = {}
+            entry_orders: dict[str, int] = {}
+            for entry_id, fields in entries:
+                try:
+                    order_id, price = self._price(fields, rules)
+                except PermanentTaskError as e:
+                    await self._dead_letter(redis, entry_id, fields, str(e))
+                    continue
+                # Later entries for the same order win, as they would one by one.
+                prices[order_id] = price
+                entry_orders[entry_id] = order_id
+
+            if not entry_orders:
+                return
+
+            _, rows = await connections.get("default").execute_query(
+                UPDATE_PRICES_SQL, [list(prices), list(prices.values())],
+            )
+            updated = {row["id"] for row in rows}
+
+            tags = {tag for row in rows for tag in order_write_tags(row["lead_id"])}
+            if tags:
+                await invalidate_tags(*tags)
+
+            fields_by_id = dict(entries)
+            ack_ids = []
+            finished_at = time.time()
+            async with redis.pipeline(transaction=False) as pipe:
+                for entry_id, order_id in entry_orders.items():
+                    if order_id not in updated:
+                        continue
+                    ack_ids.append(entry_id)
+                    task_id = fields_by_id[entry_id].get("task_id")
+                    if task_id:
+                        result = json.dumps({"order_id": order_id, "final_price": str(prices[order_id])})
+                        set_task_state(pipe, task_id, "done", result=result, finished_at=finished_at)
+                if ack_ids:
+                    pipe.xack(self.stream, self.group, *ack_ids)
+                await pipe.execute()
+            for entry_id, order_id in entry_orders.items():
+                if order_id not in updated:
+                    await self._dead_letter(redis, entry_id, fields_by_id[entry_id], f"order {order_id} not found")
+            self.processed += len(ack_ids)
+            logger.info("Reprice worker %s repriced %s orders", self.consumer, len(updated))
+        except Exception as e:
+            # Left pending: retried once claimed back after claim_idle_ms,
+            # or dead-lettered then if out of attempts.
+            logger.exception("Reprice batch of %s entries failed", len(entries))
+            try:
+                async with redis.pipeline(transaction=False) as pipe:
+                    for _, fields in entries:
+                        if fields.get("task_id"):
+                            set_task_state(pipe, fields["task_id"], "retrying", error=repr(e))
+                    await pipe.execute()
+            except Exception:
+                logger.exception("Failed to record reprice batch failure")
+        finally:
+            self._slots.release()
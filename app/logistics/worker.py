@@ -0,0 +1,50 @@
+"""
+Reprice worker process.
+
+    python -m app.logistics.worker [--concurrency N] [--batch-size N] [--consumer NAME]
+
+Start as many processes as needed; they share the consumer group.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+
+from tortoise import Tortoise
+
+from app.config import settings
+from app.database import TORTOISE_ORM
+from app.logistics.tasks import RepriceWorker
+from app.service.pricing_service import pricing_rules_watcher
+from app.service.redis_service import init_redis, close_redis
+
+logger = logging.getLogger("app")
+
+
+async def main(args: argparse.Namespace) -> None:
+    await Tortoise.init(config=TORTOISE_ORM)
+    await init_redis()
+    await pricing_rules_watcher.start()
+
+    worker = RepriceWorker(args.consumer, concurrency=args.concurrency, batch_size=args.batch_size)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+
+    try:
+        await worker.run()
+    finally:
+        await pricing_rules_watcher.stop()
+        await close_redis()
+        await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reprice orders from the Redis Stream.")
+    parser.add_argument("--concurrency", type=int, default=settings.REPRICE_CONCURRENCY)
+    parser.add_argument("--batch-size", type=int, default=settings.REPRICE_BATCH_SIZE)
+    parser.add_argument("--consumer", default=f"{socket.gethostname()}-{os.getpid()}")
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(parser.parse_args()))
@@ -1,17 +1,16 @@
 from fastapi import FastAPI
-from .initializer import init_db
+from .initializer import init_db, lifespan
 from .logger import setup_logging
-from .middleware.audit_log import AuditMiddleware
-from .middleware.idempotency import IdempotencyMiddleware
-from .middleware.throttling import RateLimitMiddleware
-from .middleware.user_attach import AuthMiddleware
+from .config import settings
+from .middleware.pipeline import build_pipeline
 from app.user.routes import user_router
 from app.logistics.routes import router as logistics_router
+from app.service.routes import system_router
 from starlette.middleware.cors import CORSMiddleware
 
 logger = setup_logging()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 init_db(app)
 
 app.add_middleware(
@@ -22,11 +21,9 @@ app.add_middleware(
     allow_headers=["*"],)
 
 
-app.add_middleware(RateLimitMiddleware)
-app.add_middleware(AuditMiddleware)
-app.add_middleware(IdempotencyMiddleware)
-app.add_middleware(AuthMiddleware)
+build_pipeline(app, settings.MIDDLEWARE_PIPELINE)
 
 
 app.include_router(user_router)
 app.include_router(logistics_router)
+app.include_router(system_router)
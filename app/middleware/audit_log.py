@@ -1,33 +1,70 @@
+import asyncio
 import hashlib
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from app.logistics.models import AuditLog
 
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-class AuditMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        if request.method not in {"POST", "PUT", "PATCH", "DELETE"}:
-            return await call_next(request)
+from app.config import settings
+from app.middleware.body import get_header, read_body
+from app.service.audit_service import audit_sink, hash_payload
 
-        body = await request.body()
 
-        async def receive():
-            return {"type": "http.request", "body": body, "more_body": False}
+class _StreamHash:
+    """
+    SHA-256 of the body chunks the handler reads; empty bodies hash to ""
+    like ``hash_payload``.
+    """
 
-        request._receive = receive
+    def __init__(self):
+        self.digest = hashlib.sha256()
+        self.size = 0
 
-        response = await call_next(request)
+    async def update(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if len(chunk) < settings.AUDIT_HASH_INLINE_LIMIT:
+            self.digest.update(chunk)
+        else:
+            await asyncio.to_thread(self.digest.update, chunk)
 
-        user_id = getattr(request.user, "id", None)
-        if not user_id:
-            return response
+    def hexdigest(self) -> str:
+        return self.digest.hexdigest() if self.size else ""
+
+
+class AuditMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] not in {"POST", "PUT", "PATCH", "DELETE"}:
+            return await self.app(scope, receive, send)
 
-        payload_hash = hashlib.sha256(body).hexdigest() if body else ""
+        content_length = get_header(scope, b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) <= settings.AUDIT_BUFFER_LIMIT:
+            body, receive = await read_body(scope, receive)
+            digest = None
+        else:
+            # Uploads and imports: hash what the handler reads instead of
+            # holding the whole body in memory.
+            body, digest = None, _StreamHash()
+            receive = self._hashing(receive, digest)
 
-        await AuditLog.create(
+        await self.app(scope, receive, send)
+
+        user_id = getattr(scope.get("user"), "id", None)
+        if not user_id:
+            return
+
+        audit_sink.add(
             user_id=user_id,
-            endpoint=f"{request.method} {request.url.path}",
-            payload_hash=payload_hash,
+            endpoint=f"{scope['method']} {scope['path']}",
+            payload_hash=await hash_payload(body) if digest is None else digest.hexdigest(),
         )
 
-        return response
+    @staticmethod
+    def _hashing(receive: Receive, digest: _StreamHash) -> Receive:
+        async def wrapped() -> Message:
+            message = await receive()
+            if message["type"] == "http.request":
+                await digest.update(message.get("body", b""))
+            return message
+
+        return wrapped
@@ -0,0 +1,42 @@
+from starlette.types import Message, Receive, Scope
+
+BODY_SCOPE_KEY = "app.request_body"
+
+
+async def read_body(scope: Scope, receive: Receive) -> tuple[bytes, Receive]:
+    """
+    Read the request body once and share it through the scope.
+
+    Returns the body and a ``receive`` callable that replays it to the next
+    stage. Later stages calling this again get the cached bytes without
+    touching the socket.
+    """
+    body = scope.get(BODY_SCOPE_KEY)
+    if body is None:
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        body = scope[BODY_SCOPE_KEY] = b"".join(chunks)
+
+    replayed = False
+
+    async def replay() -> Message:
+        nonlocal replayed
+        if replayed:
+            return await receive()
+        replayed = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    return body, replay
+
+
+def get_header(scope: Scope, name: bytes) -> str | None:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
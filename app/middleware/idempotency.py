@@ -1,49 +1,155 @@
-import json
+import asyncio
+import hashlib
+import struct
 
+import orjson
 from redis.asyncio import Redis
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import JSONResponse, Response
-from app.service.redis_service import get_redis
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.config import settings
+from app.middleware.body import get_header, read_body
+from app.service.redis_service import get_cache, pubsub_hub
 import logging
 
 logger = logging.getLogger("app")
 
+# Held by the request that claimed a key until its response is stored.
+PROCESSING = b"-"
 
-class IdempotencyMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, ttl: int = 300):
-        super().__init__(app)
+# Stored response: status and length of the header block, the headers as
+# orjson ``[[name, value], ...]`` (latin-1), then the body bytes.
+RESPONSE_HEADER = struct.Struct(">HI")
+
+
+def pack_response(status: int, headers: list[tuple[bytes, bytes]], body: bytes) -> bytes:
+    header_block = orjson.dumps([[name.decode("latin-1"), value.decode("latin-1")] for name, value in headers])
+    return RESPONSE_HEADER.pack(status, len(header_block)) + header_block + body
+
+
+def unpack_response(data: bytes) -> tuple[int, list[tuple[bytes, bytes]], bytes]:
+    status, size = RESPONSE_HEADER.unpack_from(data)
+    start = RESPONSE_HEADER.size
+    headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in orjson.loads(data[start:start + size])]
+    return status, headers, data[start + size:]
+
+
+class IdempotencyMiddleware:
+    """
+    Replays the stored response for a repeated ``Idempotency-Key``.
+
+    Keys are scoped to the user (for anonymous requests, the client
+    address and body), method and path. The first request claims
+    the key with ``SET NX``; duplicates arriving while it runs wait for its
+    pub/sub notification and then replay the stored status, headers and
+    body. Only 2xx responses up to ``IDEMPOTENCY_MAX_BODY`` bytes are
+    stored; otherwise the claim is dropped and a retry runs again.
+    """
+
+    def __init__(self, app: ASGIApp, ttl: int = settings.IDEMPOTENCY_TTL):
+        self.app = app
         self.ttl = ttl
 
-    async def dispatch(self, request, call_next):
-        if request.method not in {"POST", "PUT", "PATCH"}:
-            return await call_next(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] not in {"POST", "PUT", "PATCH"}:
+            return await self.app(scope, receive, send)
 
-        idempotency_key = request.headers.get("Idempotency-Key")
+        idempotency_key = get_header(scope, b"idempotency-key")
         if not idempotency_key:
-            return await call_next(request)
+            return await self.app(scope, receive, send)
 
-        redis: Redis = await get_redis()
-        redis_key = f"idempotency:{idempotency_key}"
+        user = scope.get("user")
+        if user:
+            owner = str(user.id)
+        else:
+            # Anonymous callers share no identity, so a key alone would let
+            # anyone replay someone else's response (e.g. a login token).
+            # Scope it to the client address and the exact body instead.
+            body, receive = await read_body(scope, receive)
+            client = scope.get("client")
+            address = client[0] if client else ""
+            owner = "anon:" + hashlib.sha256(address.encode() + b"\0" + body).hexdigest()[:32]
+        digest = hashlib.sha256(f"{scope['method']}:{scope['path']}:{idempotency_key}".encode()).hexdigest()[:32]
+        redis_key = f"idempotency:{owner}:{digest}"
+        channel = f"idempotency:done:{owner}:{digest}"
 
-        cached = await redis.get(redis_key)
+        redis: Redis = await get_cache()
+        deadline = asyncio.get_running_loop().time() + settings.IDEMPOTENCY_WAIT
+        while not await redis.set(redis_key, PROCESSING, nx=True, ex=settings.IDEMPOTENCY_LOCK_TTL):
+            stored = await self.wait(redis, redis_key, channel, deadline)
+            if stored == PROCESSING:
+                if asyncio.get_running_loop().time() < deadline:
+                    continue
+                response = JSONResponse(
+                    status_code=409,
+                    content={"detail": "A request with this Idempotency-Key is still being processed"},
+                    headers={"Retry-After": "1"},
+                )
+                return await response(scope, receive, send)
+            if stored is not None:
+                return await self.replay(stored, send)
+            # The first request finished without storing a response; claim
+            # the key again.
 
-        if cached:
-            data = json.loads(cached)
-            return JSONResponse(content=data)
+        status_code = 500
+        headers: list[tuple[bytes, bytes]] = []
+        chunks: list[bytes] = []
+        size = 0
 
-        response: Response = await call_next(request)
+        async def send_wrapper(message: Message):
+            nonlocal status_code, headers, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+            elif message["type"] == "http.response.body" and size <= settings.IDEMPOTENCY_MAX_BODY:
+                body = message.get("body", b"")
+                size += len(body)
+                chunks.append(body)
+            await send(message)
 
-        body = b""
-        async for chunk in response.body_iterator:
-            body += chunk
-
-        response.body_iterator = iter([body])
+        stored = None
+        try:
+            await self.app(scope, receive, send_wrapper)
+            if 200 <= status_code < 300 and size <= settings.IDEMPOTENCY_MAX_BODY:
+                stored = pack_response(status_code, headers, b"".join(chunks))
+        finally:
+            try:
+                async with redis.pipeline(transaction=True) as pipe:
+                    if stored is not None:
+                        pipe.set(redis_key, stored, ex=self.ttl)
+                    else:
+                        pipe.delete(redis_key)
+                    pipe.publish(channel, b"1")
+                    await pipe.execute()
+            except Exception:
+                logger.exception("⚠️ Idempotency cache error")
 
-        if 200 <= response.status_code < 300:
+    @staticmethod
+    async def wait(redis: Redis, redis_key: str, channel: str, deadline: float) -> bytes | None:
+        """
+        The stored response for ``redis_key`` once the request holding it
+        finishes, None if it stored none, or ``PROCESSING`` if it is still
+        held at ``deadline``.
+        """
+        async with pubsub_hub.listen(channel) as done:
+            # Read after subscribing so a completion in between isn't missed.
+            stored = await redis.get(redis_key)
+            if stored != PROCESSING:
+                return stored
+            timeout = deadline - asyncio.get_running_loop().time()
             try:
-                decoded = body.decode()
-                await redis.set(redis_key, decoded, ex=self.ttl)
-            except Exception as e:
-                logger.exception("⚠️ Idempotency cache error:", e)
+                await asyncio.wait_for(done.wait(), max(timeout, 0))
+            except asyncio.TimeoutError:
+                # SUBSCRIBE isn't confirmed before returning, so the
+                # notification may have been missed; the key has the answer.
+                pass
+        return await redis.get(redis_key)
 
-        return response
+    @staticmethod
+    async def replay(stored: bytes, send: Send) -> None:
+        status, headers, body = unpack_response(stored)
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": headers + [(b"idempotent-replayed", b"true")],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,32 @@
+from fastapi import FastAPI
+
+from app.middleware.audit_log import AuditMiddleware
+from app.middleware.idempotency import IdempotencyMiddleware
+from app.middleware.throttling import RateLimitMiddleware
+from app.middleware.user_attach import AuthMiddleware
+
+MIDDLEWARE_REGISTRY = {
+    "auth": AuthMiddleware,
+    "idempotency": IdempotencyMiddleware,
+    "audit": AuditMiddleware,
+    "rate_limit": RateLimitMiddleware,
+}
+
+
+def build_pipeline(app: FastAPI, stages: list[str]):
+    """
+    Install the request pipeline.
+
+    ``stages`` is ordered outermost first, i.e. in the order a request
+    passes through them. ``add_middleware`` wraps the stack, so the list is
+    applied in reverse.
+    :param app:
+    :param stages:
+    :return:
+    """
+    unknown = set(stages) - MIDDLEWARE_REGISTRY.keys()
+    if unknown:
+        raise ValueError(f"Unknown middleware stages: {', '.join(sorted(unknown))}")
+
+    for name in reversed(stages):
+        app.add_middleware(MIDDLEWARE_REGISTRY[name])
@@ -1,56 +1,216 @@
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
+import hashlib
+import math
 import time
+from dataclasses import dataclass
+from typing import Literal, Optional
+
 from redis.asyncio import Redis
+from redis.commands.core import AsyncScript
+from starlette.datastructures import MutableHeaders
 from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from app.config import settings
+from app.middleware.body import get_header
 from app.service.redis_service import get_redis
 
-RATE_LIMIT = 100
-WINDOW_SECONDS = 600
-
-
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        user = request.scope.get("user")
-        if not user:
-            return await call_next(request)
-
-        redis: Redis = await get_redis()
-        key = f"rate_limit:user:{user.id}"
-        now = int(time.time())
-
-        script = """
-        local key = KEYS[1]
-        local now = tonumber(ARGV[1])
-        local window = tonumber(ARGV[2])
-        local limit = tonumber(ARGV[3])
-
-        local count = redis.call('INCR', key)
-        if count == 1 then
-            redis.call('EXPIRE', key, window)
-        end
-        if count > limit then
-            local ttl = redis.call('TTL', key)
-            return {count, ttl}
-        end
-        return {count, -1}
-        """
-
-        result = await redis.eval(script, 1, key, now, WINDOW_SECONDS, RATE_LIMIT)
-        count, ttl = result
-
-        if ttl > 0:
-            return JSONResponse(
+KeyType = Literal["user", "ip", "api_key"]
+
+
+@dataclass(frozen=True)
+class RatePolicy:
+    """
+    ``limit`` requests per ``period`` seconds for each ``key``, with up to
+    ``burst`` (default ``limit``) at once. Applies to requests whose path is
+    ``path`` or below it and, if given, whose method is in ``methods``.
+    ``lease`` is how many requests a process may admit on its own between
+    Redis calls while the key is well under its limit.
+    """
+    name: str
+    limit: int
+    period: float
+    key: KeyType = "user"
+    burst: Optional[int] = None
+    path: str = "/"
+    methods: frozenset[str] = frozenset()
+    lease: int = 0
+
+    @property
+    def emission_ms(self) -> int:
+        return max(round(self.period * 1000 / self.limit), 1)
+
+    @property
+    def capacity(self) -> int:
+        return self.burst or self.limit
+
+    def matches(self, method: str, path: str) -> bool:
+        if self.methods and method not in self.methods:
+            return False
+        prefix = self.path.rstrip("/")
+        return not prefix or path == prefix or path.startswith(prefix + "/")
+
+
+# First match wins; a policy is skipped when the request has no identity of
+# its key type (e.g. a user policy for an anonymous request).
+RATE_LIMIT_POLICIES: tuple[RatePolicy, ...] = (
+    RatePolicy("login", limit=10, period=60, burst=5, key="ip", path="/user/login", methods=frozenset({"POST"})),
+    RatePolicy("calc", limit=120, period=60, key="user", path="/logistics/calc", lease=settings.RATE_LIMIT_LOCAL_LEASE),
+    RatePolicy("calc-anon", limit=30, period=60, burst=10, key="ip", path="/logistics/calc"),
+    RatePolicy("user", limit=100, period=600, key="user", lease=settings.RATE_LIMIT_LOCAL_LEASE),
+)
+
+# GCRA: the key holds the theoretical arrival time (TAT) in ms; a request
+# fits while TAT - now stays within ``capacity`` emission intervals. Grants
+# the request plus up to ``lease`` more for the caller to hand out locally,
+# but never more than half of what is left, so the lease shrinks to nothing
+# near the limit. ``refund`` gives back the unused part of an earlier lease.
+# Uses Redis time so every process agrees on ``now``.
+GCRA_SCRIPT = """
+local key = KEYS[1]
+local emission = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local lease = tonumber(ARGV[3])
+local refund = tonumber(ARGV[4])
+
+local t = redis.call('TIME')
+local now = t[1] * 1000 + math.floor(t[2] / 1000)
+local tat = tonumber(redis.call('GET', key)) or now
+tat = math.max(tat - refund * emission, now)
+
+local available = math.floor((now + capacity * emission - tat) / emission)
+local grant = 0
+if available >= 1 then
+    grant = 1 + math.min(lease, math.floor((available - 1) / 2))
+    tat = tat + grant * emission
+end
+if grant > 0 or refund > 0 then
+    redis.call('SET', key, tat, 'PX', math.max(tat - now, 1))
+end
+return {grant, math.max(available - grant, 0), math.max(tat - (capacity - 1) * emission - now, 0), tat - now}
+"""
+
+
+@dataclass
+class Decision:
+    allowed: bool
+    remaining: int
+    # Seconds until a denied request may be retried.
+    retry_after: float
+    # Epoch time the key is back to its full burst.
+    reset_at: float
+
+
+@dataclass
+class _Lease:
+    """
+    Requests granted by Redis for this process to admit locally until
+    ``expires`` (monotonic); ``remaining`` is what Redis had left besides.
+    A denial is kept the same way, with no tokens, until it may be retried.
+    """
+    tokens: int
+    expires: float
+    remaining: int
+    reset_at: float
+    allowed: bool = True
+
+
+class RateLimitMiddleware:
+    """
+    Applies the first matching policy. The GCRA script is loaded once and
+    called by ``EVALSHA``; requests covered by a local lease or an earlier
+    denial are decided without Redis.
+    """
+
+    def __init__(self, app: ASGIApp, policies: tuple[RatePolicy, ...] = RATE_LIMIT_POLICIES):
+        self.app = app
+        self.policies = policies
+        self._script: AsyncScript | None = None
+        self._leases: dict[str, _Lease] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        match = self.match(scope) if scope["type"] == "http" else None
+        if match is None:
+            return await self.app(scope, receive, send)
+
+        policy, key = match
+        decision = self._take_local(key) or await self._take_redis(policy, key)
+
+        if not decision.allowed:
+            retry_after = max(math.ceil(decision.retry_after), 1)
+            response = JSONResponse(
                 status_code=429,
-                content={"detail": f"Rate limit exceeded. Retry after {ttl}s"},
-                headers={"Retry-After": str(ttl)},
+                content={"detail": f"Rate limit exceeded. Retry after {retry_after}s"},
+                headers={"Retry-After": str(retry_after)},
             )
+            return await response(scope, receive, send)
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["X-RateLimit-Limit"] = str(policy.limit)
+                headers["X-RateLimit-Remaining"] = str(decision.remaining)
+                headers["X-RateLimit-Reset"] = str(math.ceil(decision.reset_at))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    def match(self, scope: Scope) -> tuple[RatePolicy, str] | None:
+        for policy in self.policies:
+            if not policy.matches(scope["method"], scope["path"]):
+                continue
+            identity = self.identity(policy.key, scope)
+            if identity:
+                return policy, f"rate_limit:{policy.name}:{identity}"
+        return None
+
+    @staticmethod
+    def identity(key: KeyType, scope: Scope) -> str | None:
+        if key == "user":
+            user = scope.get("user")
+            return str(user.id) if user else None
+        if key == "ip":
+            client = scope.get("client")
+            return client[0] if client else None
+        api_key = get_header(scope, b"x-api-key")
+        return hashlib.sha256(api_key.encode()).hexdigest()[:32] if api_key else None
+
+    def _take_local(self, key: str) -> Decision | None:
+        lease = self._leases.get(key)
+        now = time.monotonic()
+        if lease is None or lease.expires <= now:
+            return None
+        if not lease.allowed:
+            return Decision(False, 0, lease.expires - now, lease.reset_at)
+        if not lease.tokens:
+            return None
+        lease.tokens -= 1
+        return Decision(True, lease.remaining + lease.tokens, 0, lease.reset_at)
+
+    async def _take_redis(self, policy: RatePolicy, key: str) -> Decision:
+        if self._script is None:
+            redis: Redis = await get_redis()
+            self._script = redis.register_script(GCRA_SCRIPT)
+
+        lease = self._leases.pop(key, None)
+        refund = lease.tokens if lease else 0
+        grant, remaining, retry_ms, reset_ms = await self._script(
+            keys=[key], args=[policy.emission_ms, policy.capacity, policy.lease, refund],
+        )
+        reset_at = time.time() + reset_ms / 1000
+        if not grant:
+            # Other requests can only push the retry time later.
+            self._store_lease(key, _Lease(0, time.monotonic() + retry_ms / 1000, 0, reset_at, allowed=False))
+        elif grant > 1:
+            expires = time.monotonic() + settings.RATE_LIMIT_LOCAL_TTL
+            self._store_lease(key, _Lease(grant - 1, expires, remaining, reset_at))
+        return Decision(grant > 0, remaining + max(grant - 1, 0), retry_ms / 1000, reset_at)
 
-        response = await call_next(request)
-        response.headers.update({
-            "X-RateLimit-Limit": str(RATE_LIMIT),
-            "X-RateLimit-Remaining": str(RATE_LIMIT - count),
-            "X-RateLimit-Reset": str(now + WINDOW_SECONDS),
-        })
-        return response
+    def _store_lease(self, key: str, lease: _Lease) -> None:
+        if len(self._leases) >= settings.RATE_LIMIT_LOCAL_MAX_KEYS:
+            # Unused tokens of dropped leases are not refunded; they come
+            # back as the key refills.
+            now = time.monotonic()
+            self._leases = {k: v for k, v in self._leases.items() if v.expires > now}
+            if len(self._leases) >= settings.RATE_LIMIT_LOCAL_MAX_KEYS:
+                self._leases.clear()
+        self._leases[key] = lease
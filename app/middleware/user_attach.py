@@ -1,23 +1,45 @@
 # app/middleware/auth.py
-from fastapi import Request
+from fastapi import HTTPException
 from fastapi.security.utils import get_authorization_scheme_param
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
 
-from app.auth import decode_access_token
+from app.auth import Principal, decode_access_claims, get_token_version
+from app.config import settings
+from app.middleware.body import get_header
 from app.user.models import User
 
 
-class AuthMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        authorization: str | None = request.headers.get("Authorization")
+class AuthMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        authorization = get_header(scope, b"authorization")
         scheme, token = get_authorization_scheme_param(authorization)
 
         user = None
         if scheme.lower() == "bearer" and token:
-            user_id = decode_access_token(token)
-            if user_id:
-                user = await User.get_or_none(id=user_id)
+            try:
+                user = await self.authenticate(token)
+            except HTTPException as exc:
+                response = JSONResponse({"detail": exc.detail}, status_code=exc.status_code, headers=exc.headers)
+                return await response(scope, receive, send)
+
+        scope["user"] = user
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    async def authenticate(token: str):
+        claims = decode_access_claims(token)
+
+        principal = Principal.from_claims(claims) if settings.AUTH_MODE == "claims" else None
+        if principal is None:
+            return await User.get_or_none(id=claims["sub"])
 
-        request.scope["user"] = user
-        response = await call_next(request)
-        return response
\ No newline at end of file
+        if claims["ver"] < await get_token_version(principal.id):
+            raise HTTPException(status_code=401, detail="Token has been revoked.", headers={"WWW-Authenticate": "Bearer"})
+        return principal
@@ -1,16 +1,48 @@
+from decimal import Decimal
+
+import orjson
 from fastapi.responses import JSONResponse
-from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
 from typing import Any, Dict, Optional
 
 
-class CustomResponse(JSONResponse):
+def _default(obj: Any) -> Any:
+    """
+    Fallback for types orjson can't encode natively. Decimals follow
+    ``jsonable_encoder`` (int when integral, float otherwise) and pydantic
+    models are dumped in JSON mode, like FastAPI's response_model path.
+    """
+    if isinstance(obj, Decimal):
+        return int(obj) if obj.as_tuple().exponent >= 0 else float(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with orjson in a single pass; datetimes, enums,
+    UUIDs and dataclasses are handled natively.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class CustomResponse(FastJSONResponse):
     def __init__(self, content: Any, status_code: int = 200, message: Optional[str] = None, **kwargs: Dict):
         data = {
             "status_code": status_code,
             "message": message,
             "data": content
         }
-        super().__init__(content=jsonable_encoder(data), status_code=status_code, **kwargs)
+        super().__init__(content=data, status_code=status_code, **kwargs)
 
 
 class PostResponse(CustomResponse):
@@ -18,13 +50,13 @@ class PostResponse(CustomResponse):
         super().__init__(content=content, status_code=status_code, message=message, **kwargs)
 
 
-class ListResponse(JSONResponse):
+class ListResponse(FastJSONResponse):
     def __init__(self, content: Any, status_code: int = 200, **kwargs: Dict):
         data = {
             "status_code": status_code,
             "data": content
         }
-        super().__init__(content=jsonable_encoder(data), status_code=status_code, **kwargs)
+        super().__init__(content=data, status_code=status_code, **kwargs)
 
 
 class PutResponse(CustomResponse):
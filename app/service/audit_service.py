@@ -0,0 +1,127 @@
+import asyncio
+import hashlib
+import logging
+from datetime import datetime
+
+from app.config import settings
+from app.logistics.models import AuditLog
+from app.utils.constants import local_tz
+
+logger = logging.getLogger("app")
+
+
+async def hash_payload(body: bytes) -> str:
+    """
+    SHA-256 hex digest of a request body; large bodies are hashed in a
+    thread (hashlib releases the GIL) to keep the event loop free.
+    """
+    if not body:
+        return ""
+    if len(body) < settings.AUDIT_HASH_INLINE_LIMIT:
+        return hashlib.sha256(body).hexdigest()
+    return await asyncio.to_thread(lambda: hashlib.sha256(body).hexdigest())
+
+
+class AuditSink:
+    """
+    Buffers audit entries in memory and writes them with ``bulk_create``.
+
+    A batch is flushed once it reaches ``batch_size`` entries or after
+    ``flush_interval`` seconds, whichever comes first. The queue is bounded;
+    when the database falls behind, new entries are dropped and counted
+    rather than slowing requests down.
+    """
+
+    def __init__(self, max_size: int, batch_size: int, flush_interval: float):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue[AuditLog] = asyncio.Queue(maxsize=max_size)
+        self._task: asyncio.Task | None = None
+        self._flushing: asyncio.Future | None = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def add(self, user_id: int, endpoint: str, payload_hash: str) -> None:
+        try:
+            self._queue.put_nowait(AuditLog(
+                user_id=user_id,
+                endpoint=endpoint,
+                payload_hash=payload_hash,
+                created_at=datetime.now(tz=local_tz),
+            ))
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="audit-sink")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._flushing is not None:
+            await self._flushing
+        while not self._queue.empty():
+            await self._flush(self._drain())
+
+    def _drain(self) -> list[AuditLog]:
+        batch = []
+        while len(batch) < self.batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        batch = []
+        try:
+            while True:
+                batch.append(await self._queue.get())
+                deadline = loop.time() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                pending, batch = batch, []
+                # Shielded so that shutdown never interrupts a half-sent INSERT.
+                self._flushing = asyncio.ensure_future(self._flush(pending))
+                await asyncio.shield(self._flushing)
+                self._flushing = None
+        finally:
+            if batch:
+                self._flushing = asyncio.ensure_future(self._flush(batch))
+
+    async def _flush(self, batch: list[AuditLog]) -> None:
+        if not batch:
+            return
+        try:
+            await AuditLog.bulk_create(batch)
+            self.written += len(batch)
+        except Exception:
+            self.failed += len(batch)
+            logger.exception("Failed to write %s audit log entries", len(batch))
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "queue_size": self._queue.maxsize,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+audit_sink = AuditSink(
+    max_size=settings.AUDIT_QUEUE_SIZE,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval=settings.AUDIT_FLUSH_INTERVAL,
+)
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+from typing import Optional
+
+from fastapi import HTTPException
+from tortoise.exceptions import IntegrityError
+
+from app.logistics import pricing
+from app.logistics.models import PricingRuleSet
+from app.service.redis_service import get_redis
+
+logger = logging.getLogger("app")
+
+PRICING_RULES_CHANNEL = "pricing:rules"
+
+
+async def load_pricing_rules() -> pricing.CompiledRules:
+    """
+    Compile the newest stored rule set and make it the active one.
+    """
+    latest = await PricingRuleSet.all().order_by("-version").first()
+    if latest is not None and latest.version > pricing.current_rules().version:
+        pricing.activate(pricing.compile_rules(latest.rules, latest.version))
+    return pricing.current_rules()
+
+
+async def publish_pricing_rules(rules: dict, user_id: Optional[int] = None) -> pricing.CompiledRules:
+    """
+    Store ``rules`` as the next version, activate it here and tell the other
+    workers to reload.
+    """
+    try:
+        pricing.compile_rules(rules)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    latest = await PricingRuleSet.all().order_by("-version").first()
+    try:
+        row = await PricingRuleSet.create(
+            version=(latest.version if latest else 0) + 1,
+            rules=rules,
+            created_by_id=user_id,
+        )
+    except IntegrityError:
+        raise HTTPException(409, "Pricing rules were changed concurrently, retry")
+
+    compiled = pricing.compile_rules(row.rules, row.version)
+    pricing.activate(compiled)
+    try:
+        redis = await get_redis()
+        await redis.publish(PRICING_RULES_CHANNEL, row.version)
+    except Exception:
+        logger.exception("Failed to announce pricing rules v%s", row.version)
+    return compiled
+
+
+class PricingRulesWatcher:
+    """
+    Keeps the in-process rule set current.
+
+    Listens on ``PRICING_RULES_CHANNEL`` and reloads from the database when
+    a newer version is announced. Messages missed while disconnected are
+    covered by reloading after every (re)subscribe.
+    """
+
+    def __init__(self, retry_delay: float = 1.0):
+        self.retry_delay = retry_delay
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        await load_pricing_rules()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                redis = await get_redis()
+                async with redis.pubsub() as pubsub:
+                    await pubsub.subscribe(PRICING_RULES_CHANNEL)
+                    await load_pricing_rules()
+                    async for message in pubsub.listen():
+                        if message["type"] != "message":
+                            continue
+                        if int(message["data"]) > pricing.current_rules().version:
+                            rules = await load_pricing_rules()
+                            logger.info("Pricing rules v%s activated", rules.version)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Pricing rules watcher failed, reconnecting")
+                await asyncio.sleep(self.retry_delay)
+
+
+pricing_rules_watcher = PricingRulesWatcher()
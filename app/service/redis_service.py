@@ -1,20 +1,195 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
 import redis.asyncio as redis
+from redis.asyncio.connection import BlockingConnectionPool
 
 from app.config import settings as global_settings
 
+logger = logging.getLogger("app")
+
+
+class InstrumentedConnectionPool(BlockingConnectionPool):
+    """
+    Blocking pool that keeps counters about connection usage.
+
+    Callers wait up to ``timeout`` seconds for a free connection instead of
+    opening new sockets, so the time spent waiting is the signal to look at
+    when tuning ``REDIS_POOL_SIZE``.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.created = 0
+        self.in_use = 0
+        self.acquired = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def make_connection(self):
+        self.created += 1
+        return super().make_connection()
+
+    async def get_connection(self, *args, **kwargs):
+        start = time.perf_counter()
+        connection = await super().get_connection(*args, **kwargs)
+        waited = time.perf_counter() - start
+
+        self.in_use += 1
+        self.acquired += 1
+        self.wait_time_total += waited
+        self.wait_time_max = max(self.wait_time_max, waited)
+        return connection
+
+    async def release(self, connection):
+        self.in_use = max(self.in_use - 1, 0)
+        await super().release(connection)
 
-async def get_redis():
-    return await redis.from_url(
+    def stats(self) -> dict:
+        return {
+            "max_connections": self.max_connections,
+            "created": self.created,
+            "in_use": self.in_use,
+            "idle": max(self.created - self.in_use, 0),
+            "acquired": self.acquired,
+            "wait_time_avg_ms": round(self.wait_time_total / self.acquired * 1000, 3) if self.acquired else 0.0,
+            "wait_time_max_ms": round(self.wait_time_max * 1000, 3),
+        }
+
+
+_clients: dict[str, redis.Redis] = {}
+
+
+def _make_client(decode_responses: bool) -> redis.Redis:
+    pool = InstrumentedConnectionPool.from_url(
         global_settings.redis_url.unicode_string(),
+        max_connections=global_settings.REDIS_POOL_SIZE,
+        timeout=global_settings.REDIS_POOL_TIMEOUT,
+        health_check_interval=global_settings.REDIS_HEALTH_CHECK_INTERVAL,
+        socket_keepalive=True,
         encoding="utf-8",
-        decode_responses=True,
+        decode_responses=decode_responses,
     )
+    return redis.Redis(connection_pool=pool)
 
 
-async def get_cache():
-    return await redis.from_url(
-        global_settings.redis_url.unicode_string(),
-        decode_responses=False,
-    )
+def _client(name: str, decode_responses: bool) -> redis.Redis:
+    client = _clients.get(name)
+    if client is None:
+        client = _clients[name] = _make_client(decode_responses)
+    return client
+
+
+async def get_redis() -> redis.Redis:
+    """
+    Shared text client (``decode_responses=True``) backed by the process-wide pool.
+    """
+    return _client("default", decode_responses=True)
+
+
+async def get_cache() -> redis.Redis:
+    """
+    Shared binary client (``decode_responses=False``) backed by its own pool.
+    """
+    return _client("cache", decode_responses=False)
+
+
+async def init_redis() -> None:
+    """
+    Create both pools and make sure Redis answers before serving traffic.
+    """
+    await (await get_redis()).ping()
+    await (await get_cache()).ping()
+
+
+class PubSubHub:
+    """
+    One pub/sub connection per process, shared by every waiter.
+
+    ``listen(channel)`` subscribes on first use and unsubscribes when the
+    last waiter leaves, so long-polling requests cost an ``asyncio.Event``
+    each instead of a Redis connection each.
+    """
+
+    def __init__(self):
+        self._pubsub: redis.client.PubSub | None = None
+        self._waiters: dict[str, set[asyncio.Event]] = {}
+        self._lock = asyncio.Lock()
+        self._reader: asyncio.Task | None = None
+
+    @asynccontextmanager
+    async def listen(self, channel: str):
+        event = asyncio.Event()
+        async with self._lock:
+            if self._pubsub is None:
+                self._pubsub = (await get_redis()).pubsub()
+            waiters = self._waiters.setdefault(channel, set())
+            if not waiters:
+                try:
+                    await self._pubsub.subscribe(channel)
+                except Exception:
+                    del self._waiters[channel]
+                    raise
+            waiters.add(event)
+            if self._reader is None or self._reader.done():
+                self._reader = asyncio.create_task(self._read())
+        try:
+            yield event
+        finally:
+            async with self._lock:
+                waiters = self._waiters.get(channel)
+                waiters.discard(event)
+                if not waiters:
+                    del self._waiters[channel]
+                    try:
+                        await self._pubsub.unsubscribe(channel)
+                    except Exception:
+                        logger.exception("Pub/sub unsubscribe failed")
+
+    async def _read(self) -> None:
+        while True:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # The connection resubscribes its channels on reconnect.
+                logger.exception("Pub/sub read failed")
+                await asyncio.sleep(1)
+                continue
+            if message and message["type"] == "message":
+                for event in self._waiters.get(message["channel"], ()):
+                    event.set()
+
+    async def close(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+        if self._pubsub is not None:
+            await self._pubsub.close()
+            self._pubsub = None
+        self._waiters.clear()
+
+    def stats(self) -> dict:
+        return {"channels": len(self._waiters), "waiters": sum(len(w) for w in self._waiters.values())}
+
+
+pubsub_hub = PubSubHub()
+
+
+async def close_redis() -> None:
+    await pubsub_hub.close()
+    while _clients:
+        _, client = _clients.popitem()
+        await client.close()
+        await client.connection_pool.disconnect()
 
 
+def redis_pool_stats() -> dict:
+    return {name: client.connection_pool.stats() for name, client in _clients.items()}
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends
+
+from app.auth import get_admin, password_hasher
+from app.logistics.pricing import current_rules
+from app.logistics.tasks import reprice_queue_stats
+from app.service.audit_service import audit_sink
+from app.service.redis_service import pubsub_hub, redis_pool_stats
+from app.service.webhook_service import webhook_dispatcher
+from app.user.models import User
+from app.utils.cache import cache_stats
+
+system_router = APIRouter(prefix="/system", tags=["system"])
+
+
+@system_router.get("/stats")
+async def stats(user: User = Depends(get_admin)):
+    return {
+        "redis_pools": redis_pool_stats(),
+        "pubsub": pubsub_hub.stats(),
+        "password_hasher": password_hasher.stats(),
+        "audit_sink": audit_sink.stats(),
+        "response_cache": cache_stats(),
+        "pricing_rules_version": current_rules().version,
+        "reprice_queue": await reprice_queue_stats(),
+        "webhooks": webhook_dispatcher.stats(),
+    }
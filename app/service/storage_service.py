@@ -0,0 +1,338 @@
+import asyncio
+import os
+import re
+from abc import ABC, abstractmethod
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import List, Optional
+
+from fastapi import HTTPException
+from minio import Minio
+from minio.error import S3Error
+from starlette.datastructures import Headers
+from starlette.requests import Request
+from starlette.responses import FileResponse, RedirectResponse, Response
+
+from app.config import settings
+
+
+@dataclass
+class StoredObject:
+    key: str
+    size: int
+    etag: Optional[str]
+    content_type: Optional[str]
+    last_modified: Optional[datetime]
+
+
+class StorageBackend(ABC):
+    """
+    Where attachment bytes live. Rows only ever hold the object key.
+
+    ``tmp_dir`` is where uploads are staged; for the local backend it is on
+    the same filesystem, so storing an upload is a rename.
+    """
+
+    tmp_dir: str
+
+    async def start(self) -> None:
+        pass
+
+    @abstractmethod
+    async def put_file(self, key: str, path: str, content_type: str) -> None:
+        """
+        Move the staged file at ``path`` to ``key``; ``path`` is consumed.
+        """
+
+    @abstractmethod
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        ...
+
+    @abstractmethod
+    async def read_head(self, key: str, length: int) -> bytes:
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    async def list_objects(self, prefix: str) -> List[StoredObject]:
+        """
+        Every object whose key starts with ``prefix``.
+        """
+
+    def presigned_put_url(self, key: str, expires: int) -> Optional[str]:
+        """
+        URL a client can PUT the object to directly, or ``None`` if the
+        backend can't take direct uploads.
+        """
+        return None
+
+    def presigned_get_url(self, key: str, expires: int) -> Optional[str]:
+        return None
+
+    def local_path(self, key: str) -> Optional[str]:
+        """
+        Filesystem path of the object, for backends that keep one.
+        """
+        return None
+
+
+class LocalStorage(StorageBackend):
+    def __init__(self, root: str):
+        self.root = root
+        self.tmp_dir = os.path.join(root, ".tmp")
+
+    def path_for(self, key: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid object key: {key!r}")
+        return path
+
+    def local_path(self, key: str) -> Optional[str]:
+        return self.path_for(key)
+
+    async def start(self) -> None:
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    async def put_file(self, key: str, path: str, content_type: str) -> None:
+        target = self.path_for(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(path, target)
+
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        try:
+            st = os.stat(self.path_for(key))
+        except FileNotFoundError:
+            return None
+        return StoredObject(
+            key=key,
+            size=st.st_size,
+            etag=None,
+            content_type=None,
+            last_modified=datetime.fromtimestamp(st.st_mtime, timezone.utc),
+        )
+
+    async def read_head(self, key: str, length: int) -> bytes:
+        def read():
+            with open(self.path_for(key), "rb") as f:
+                return f.read(length)
+        return await asyncio.to_thread(read)
+
+    async def delete(self, key: str) -> None:
+        try:
+            os.remove(self.path_for(key))
+        except FileNotFoundError:
+            pass
+
+    async def list_objects(self, prefix: str) -> List[StoredObject]:
+        def walk():
+            found = []
+            for directory, dirs, files in os.walk(self.root):
+                if directory == self.root and ".tmp" in dirs:
+                    dirs.remove(".tmp")
+                for name in files:
+                    path = os.path.join(directory, name)
+                    key = os.path.relpath(path, self.root).replace(os.sep, "/")
+                    if not key.startswith(prefix):
+                        continue
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    found.append(StoredObject(
+                        key=key,
+                        size=st.st_size,
+                        etag=None,
+                        content_type=None,
+                        last_modified=datetime.fromtimestamp(st.st_mtime, timezone.utc),
+                    ))
+            return found
+        return await asyncio.to_thread(walk)
+
+
+# Smallest part S3 accepts, except for the last one.
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class S3Storage(StorageBackend):
+    """
+    S3-compatible bucket (MinIO in docker-compose).
+
+    The SDK is blocking, so calls run in threads. Files above ``part_size``
+    are sent as multipart uploads, ``parallel_parts`` at a time;
+    ``part_size`` is kept between the S3 minimum and ``ATTACHMENT_MAX_SIZE``,
+    so that only happens once the limit is raised above 5 MiB. Presigned
+    URLs are signed for ``public_client`` when the bucket is reached under
+    a different host from outside.
+    """
+
+    def __init__(
+        self,
+        client: Minio,
+        bucket: str,
+        public_client: Optional[Minio] = None,
+        part_size: int = settings.STORAGE_PART_SIZE,
+        parallel_parts: int = settings.STORAGE_PARALLEL_PARTS,
+    ):
+        self.client = client
+        self.public_client = public_client or client
+        self.bucket = bucket
+        self.part_size = max(min(part_size, settings.ATTACHMENT_MAX_SIZE), S3_MIN_PART_SIZE)
+        self.parallel_parts = parallel_parts
+        self.tmp_dir = tempfile.gettempdir()
+
+    async def start(self) -> None:
+        if not await asyncio.to_thread(self.client.bucket_exists, self.bucket):
+            await asyncio.to_thread(self.client.make_bucket, self.bucket)
+
+    async def put_file(self, key: str, path: str, content_type: str) -> None:
+        try:
+            await asyncio.to_thread(
+                self.client.fput_object, self.bucket, key, path,
+                content_type=content_type,
+                part_size=self.part_size,
+                num_parallel_uploads=self.parallel_parts,
+            )
+        finally:
+            os.remove(path)
+
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        try:
+            obj = await asyncio.to_thread(self.client.stat_object, self.bucket, key)
+        except S3Error as e:
+            if e.code in {"NoSuchKey", "NoSuchObject", "NotFound"}:
+                return None
+            raise
+        return StoredObject(
+            key=key,
+            size=obj.size,
+            etag=obj.etag,
+            content_type=obj.content_type,
+            last_modified=obj.last_modified,
+        )
+
+    async def read_head(self, key: str, length: int) -> bytes:
+        def read():
+            response = self.client.get_object(self.bucket, key, offset=0, length=length)
+            try:
+                return response.read()
+            finally:
+                response.close()
+                response.release_conn()
+        return await asyncio.to_thread(read)
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self.client.remove_object, self.bucket, key)
+
+    async def list_objects(self, prefix: str) -> List[StoredObject]:
+        def walk():
+            return [
+                StoredObject(
+                    key=obj.object_name,
+                    size=obj.size,
+                    etag=obj.etag,
+                    content_type=obj.content_type,
+                    last_modified=obj.last_modified,
+                )
+                for obj in self.client.list_objects(self.bucket, prefix=prefix, recursive=True)
+            ]
+        return await asyncio.to_thread(walk)
+
+    def presigned_put_url(self, key: str, expires: int) -> Optional[str]:
+        return self.public_client.presigned_put_object(self.bucket, key, expires=timedelta(seconds=expires))
+
+    def presigned_get_url(self, key: str, expires: int) -> Optional[str]:
+        return self.public_client.presigned_get_object(self.bucket, key, expires=timedelta(seconds=expires))
+
+
+# Keys named after the content hash get it as their ETag.
+CONTENT_HASH_NAME = re.compile(r"[0-9a-f]{64}")
+
+
+class ObjectFileResponse(FileResponse):
+    # Used when the server doesn't offer the ``http.response.pathsend``
+    # extension, where the file is handed to it for a zero-copy send.
+    chunk_size = settings.DOWNLOAD_CHUNK_SIZE
+
+
+def is_not_modified(request_headers: Headers, etag: str, last_modified: str) -> bool:
+    """
+    Conditional GET check: If-None-Match wins over If-Modified-Since.
+    """
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag in tags
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+async def serve_object(storage: StorageBackend, key: str, request: Request) -> Response:
+    """
+    Response for a stored object.
+
+    Object storage gets a redirect to a short-lived presigned URL, so the
+    bytes never pass through the API. Local files are sent with Range
+    support, a strong ETag (the content hash when the key carries it) and
+    Last-Modified, answering revalidations with 304.
+    """
+    url = storage.presigned_get_url(key, settings.STORAGE_PRESIGN_EXPIRES)
+    if url is not None:
+        return RedirectResponse(url, status_code=307, headers={"Cache-Control": "no-store"})
+
+    path = storage.local_path(key)
+    try:
+        stat_result = await asyncio.to_thread(os.stat, path)
+    except FileNotFoundError:
+        raise HTTPException(404, "Attachment not found")
+
+    name = os.path.basename(key)
+    headers = {"Cache-Control": "private, no-cache"}
+    stem = name.split(".", 1)[0]
+    if CONTENT_HASH_NAME.fullmatch(stem):
+        headers["ETag"] = f'"{stem}"'
+    response = ObjectFileResponse(
+        path,
+        headers=headers,
+        filename=name,
+        stat_result=stat_result,
+        content_disposition_type="inline",
+    )
+    if is_not_modified(request.headers, response.headers["etag"], response.headers["last-modified"]):
+        return Response(status_code=304, headers={
+            header: response.headers[header] for header in ("etag", "last-modified", "cache-control")
+        })
+    return response
+
+
+def _minio(endpoint: str) -> Minio:
+    # With the region given the SDK signs URLs without asking the server.
+    return Minio(
+        endpoint,
+        access_key=settings.MINIO_ACCESS_KEY,
+        secret_key=settings.MINIO_SECRET_KEY,
+        secure=settings.MINIO_USE_SSL,
+        region=settings.MINIO_REGION,
+    )
+
+
+def create_storage() -> StorageBackend:
+    if settings.STORAGE_BACKEND == "s3":
+        public = _minio(settings.MINIO_PUBLIC_ENDPOINT) if settings.MINIO_PUBLIC_ENDPOINT else None
+        return S3Storage(_minio(settings.MINIO_ENDPOINT), settings.MINIO_BUCKET, public_client=public)
+    root = settings.STORAGE_LOCAL_ROOT or os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads",
+    )
+    return LocalStorage(os.path.abspath(root))
+
+
+storage = create_storage()
@@ -0,0 +1,284 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Iterable, Optional
+from urllib.parse import urlsplit
+
+import httpx
+import orjson
+from tortoise import connections
+from tortoise.backends.base.client import BaseDBAsyncClient
+
+from app.config import settings
+from app.logistics.models import WebhookOutbox
+
+logger = logging.getLogger("app")
+
+# Seconds of lease kept free after a request for marking the row delivered.
+LEASE_MARGIN = 5
+
+# Claims due rows by pushing them a lease into the future, so other
+# dispatchers skip them; a dispatcher that dies mid-batch only delays its
+# rows until the lease runs out. Each row is sent only while the lease
+# still covers a whole request and is marked delivered right after, so a
+# row is never sent again by a dispatcher that claimed it after the lease.
+CLAIM_SQL = """
+UPDATE "webhook_outbox" AS w
+SET "next_attempt_at" = CURRENT_TIMESTAMP + make_interval(secs => $2), "attempts" = w."attempts" + 1
+WHERE w."id" IN (
+    SELECT "id" FROM "webhook_outbox"
+    WHERE "status" = 'pending' AND "next_attempt_at" <= CURRENT_TIMESTAMP
+    ORDER BY "next_attempt_at"
+    LIMIT $1
+    FOR UPDATE SKIP LOCKED
+)
+RETURNING w."id", w."endpoint", w."payload", w."attempts"
+"""
+
+DELIVERED_SQL = """
+UPDATE "webhook_outbox" SET "status" = 'delivered', "delivered_at" = CURRENT_TIMESTAMP, "last_error" = NULL
+WHERE "id" = $1
+"""
+
+RETRY_SQL = """
+UPDATE "webhook_outbox"
+SET "next_attempt_at" = CURRENT_TIMESTAMP + make_interval(secs => $2), "last_error" = $3, "attempts" = "attempts" - $4
+WHERE "id" = $1
+"""
+
+FAILED_SQL = """
+UPDATE "webhook_outbox" SET "status" = 'failed', "last_error" = $2 WHERE "id" = $1
+"""
+
+
+async def enqueue_webhooks(payloads: Iterable[dict], endpoint: Optional[str] = None,
+                           using_db: Optional[BaseDBAsyncClient] = None) -> None:
+    """
+    Add webhooks to the outbox. Pass the transaction as ``using_db`` so they
+    are committed, or rolled back, together with the change they announce.
+    """
+    rows = [WebhookOutbox(endpoint=endpoint or settings.WEBHOOK_URL, payload=payload) for payload in payloads]
+    if rows:
+        await WebhookOutbox.bulk_create(rows, using_db=using_db)
+
+
+def backoff_delay(attempt: int) -> float:
+    """
+    Exponential backoff with full jitter.
+    """
+    ceiling = min(settings.WEBHOOK_BACKOFF_MAX, settings.WEBHOOK_BACKOFF_BASE * 2 ** (attempt - 1))
+    return random.uniform(0, ceiling)
+
+
+class CircuitBreaker:
+    """
+    Opens after ``threshold`` consecutive failures; after ``cooldown``
+    seconds a single probe is let through, which closes it on success.
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if not self._probing and time.monotonic() - self.opened_at >= self.cooldown:
+            self._probing = True
+            return True
+        return False
+
+    def retry_in(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(self.cooldown - (time.monotonic() - self.opened_at), 1.0)
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._probing or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if self._probing else "open"
+
+
+class WebhookDispatcher:
+    """
+    Delivers rows from ``webhook_outbox``.
+
+    Due rows are claimed in batches with ``FOR UPDATE SKIP LOCKED``, so any
+    number of processes can run a dispatcher. Requests share one keep-alive
+    ``httpx.AsyncClient`` and at most ``concurrency`` are in flight.
+    Failures are retried with jittered exponential backoff up to
+    ``max_attempts``; each endpoint has its own circuit breaker, and rows
+    for an open endpoint are rescheduled without using up an attempt.
+
+    Pass ``client`` (e.g. one with a mock transport or pointed at a local
+    stub server) to exercise delivery without the real receiver.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = settings.WEBHOOK_CONCURRENCY,
+        batch_size: int = settings.WEBHOOK_BATCH_SIZE,
+        poll_interval: float = settings.WEBHOOK_POLL_INTERVAL,
+        max_attempts: int = settings.WEBHOOK_MAX_ATTEMPTS,
+        client: Optional[httpx.AsyncClient] = None,
+    ):
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self._client = client
+        self._owns_client = client is None
+        self._slots = asyncio.Semaphore(concurrency)
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._task: asyncio.Task | None = None
+        self.delivered = 0
+        self.retried = 0
+        self.failed = 0
+
+    async def start(self) -> None:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=settings.WEBHOOK_TIMEOUT,
+                limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+            )
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._owns_client and self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> dict:
+        return {
+            "delivered": self.delivered,
+            "retried": self.retried,
+            "failed": self.failed,
+            "breakers": {origin: breaker.state for origin, breaker in self._breakers.items()},
+        }
+
+    def _breaker(self, endpoint: str) -> CircuitBreaker:
+        try:
+            parts = urlsplit(endpoint)
+            origin = f"{parts.scheme}://{parts.netloc}"
+        except ValueError:
+            # Left for the request to reject, like any other bad endpoint.
+            origin = endpoint
+        breaker = self._breakers.get(origin)
+        if breaker is None:
+            breaker = self._breakers[origin] = CircuitBreaker(
+                settings.WEBHOOK_BREAKER_THRESHOLD, settings.WEBHOOK_BREAKER_COOLDOWN,
+            )
+        return breaker
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                claimed = await self.dispatch_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Webhook dispatch failed")
+                claimed = 0
+            # A full batch means there is probably more due right away.
+            if claimed < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    async def dispatch_once(self) -> int:
+        """
+        Claim one batch of due rows and deliver it; returns the batch size.
+        """
+        # Taken before the claim, so it never outlasts the lease in the database.
+        lease_ends = time.monotonic() + settings.WEBHOOK_LEASE_SECONDS
+        _, rows = await connections.get("default").execute_query(
+            CLAIM_SQL, [self.batch_size, settings.WEBHOOK_LEASE_SECONDS],
+        )
+        if rows:
+            await asyncio.gather(*(self._deliver(row, lease_ends) for row in rows))
+        return len(rows)
+
+    async def _deliver(self, row, lease_ends: float) -> bool:
+        db = connections.get("default")
+        breaker = self._breaker(row["endpoint"])
+        if not breaker.allow():
+            # Not attempted: hand the claimed attempt back.
+            await db.execute_query(RETRY_SQL, [row["id"], breaker.retry_in(), "circuit open", 1])
+            return False
+
+        async with self._slots:
+            if lease_ends - time.monotonic() < settings.WEBHOOK_TIMEOUT + LEASE_MARGIN:
+                # Too late to finish before another dispatcher may claim the row.
+                await db.execute_query(RETRY_SQL, [row["id"], 0, "lease ran out before sending", 1])
+                return False
+
+            error, retry_after, permanent = None, None, False
+            try:
+                # asyncpg hands jsonb back as text unless a codec is set.
+                payload = row["payload"]
+                if not isinstance(payload, (str, bytes)):
+                    payload = orjson.dumps(payload)
+                # httpx applies its timeout per phase; this bounds the whole request.
+                response = await asyncio.wait_for(self._client.post(row["endpoint"], content=payload, headers={
+                    "Content-Type": "application/json",
+                    "Idempotency-Key": f"webhook-{row['id']}",
+                }), settings.WEBHOOK_TIMEOUT)
+            except asyncio.TimeoutError:
+                error = f"timed out after {settings.WEBHOOK_TIMEOUT}s"
+            except Exception as e:
+                # Not only transport errors: a bad URL or payload must still
+                # count the attempt, or the row comes back forever.
+                error = f"{type(e).__name__}: {e}"
+            else:
+                if response.is_success:
+                    breaker.record_success()
+                    self.delivered += 1
+                    await db.execute_query(DELIVERED_SQL, [row["id"]])
+                    return True
+                error = f"HTTP {response.status_code}"
+                # Other 4xx responses won't change on retry.
+                permanent = response.is_client_error and response.status_code not in (408, 429)
+                retry_after = response.headers.get("Retry-After")
+
+        if permanent:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+
+        if permanent or row["attempts"] >= self.max_attempts:
+            self.failed += 1
+            logger.error("Webhook %s failed after %s attempts: %s", row["id"], row["attempts"], error)
+            await db.execute_query(FAILED_SQL, [row["id"], error])
+            return False
+
+        delay = backoff_delay(row["attempts"])
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        self.retried += 1
+        logger.warning("Webhook %s attempt %s failed: %s", row["id"], row["attempts"], error)
+        await db.execute_query(RETRY_SQL, [row["id"], delay, error, 0])
+        return False
+
+
+webhook_dispatcher = WebhookDispatcher()
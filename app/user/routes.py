@@ -6,6 +6,7 @@ from sqlalchemy.sql.functions import current_user
 from starlette import status
 
 from app.auth import create_access_token, verify_password, get_current_user
+from app.response import FastJSONResponse
 from app.user.models import User
 
 from app.user.schemas import UserCreate, UserCurrent
@@ -14,7 +15,8 @@ from fastapi import HTTPException
 from app.user.services import UserService
 
 user_router = APIRouter(
-    prefix='/user'
+    prefix='/user',
+    default_response_class=FastJSONResponse,
 )
 
 
@@ -30,6 +32,11 @@ async def login_for_access_token(form: OAuth2PasswordRequestForm = Depends()):
     return {"access_token": access_token, "token_type": "bearer"}
 
 
+@user_router.post('/logout', status_code=status.HTTP_204_NO_CONTENT)
+async def logout(user: UserCurrent = Depends(get_current_user)):
+    await UserService.logout(user.id)
+
+
 @user_router.post('/me')
 async def me(user: UserCurrent =  Depends(get_current_user)):
     return user
\ No newline at end of file
@@ -2,7 +2,7 @@ from fastapi import HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
 from starlette import status
 
-from app.auth import get_password_hash, create_access_token, verify_password
+from app.auth import get_password_hash, create_user_token, verify_and_update_password, revoke_user_tokens
 from app.user.models import User
 
 
@@ -14,20 +14,27 @@ class UserService:
         if user:
             raise HTTPException(status_code=400, detail="Username already registered")
 
-        hashed_password = get_password_hash(form.password)
+        hashed_password = await get_password_hash(form.password)
         user = await User.create(username=form.username, password=hashed_password, role=form.role)
 
-        access_token = create_access_token({'id': user.id})
+        access_token = await create_user_token(user)
         return access_token
 
 
     @staticmethod
     async def login(form: OAuth2PasswordRequestForm):
         user = await User.filter(username=form.username).first()
-        if not user or not verify_password(form.password, user.password):
+        verified, new_hash = await verify_and_update_password(form.password, user.password) if user else (False, None)
+        if not verified:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect username or password",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-        return create_access_token(data={"sub": str(user.id)})
\ No newline at end of file
+        if new_hash:
+            await User.filter(id=user.id).update(password=new_hash)
+        return await create_user_token(user)
+
+    @staticmethod
+    async def logout(user_id: int):
+        await revoke_user_tokens(user_id)
\ No newline at end of file
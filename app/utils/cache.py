@@ -1,16 +1,299 @@
+import asyncio
 import hashlib
-import json
+import logging
+import math
+import random
+import struct
+import time
+import zlib
+from collections import OrderedDict
 from functools import wraps
 from fastapi import Request
 from redis.asyncio import Redis
+from starlette.responses import Response
+
+from app.config import settings
+from app.response import dumps
+from app.service.redis_service import get_cache
+
+logger = logging.getLogger("app")
+
+
+TAG_PREFIX = "cache:tag:"
+
+GENERATION_PREFIX = "cache:gen:"
+# Generation counters only need to outlive the slowest computation.
+GENERATION_TTL = 86400
+
+# L2 values are ``HEADER + body``: compute time, absolute expiry and a
+# compression flag, followed by the final response bytes.
+HEADER = struct.Struct("!ddB")
+
+# KEYS: the tag sets, then their generation counters. Deletes every key
+# indexed under the tags and the sets themselves, and bumps the
+# generations so computations started earlier don't store their results.
+INVALIDATE_SCRIPT = """
+local n = #KEYS / 2
+local deleted = 0
+for i = 1, n do
+    local members = redis.call('SMEMBERS', KEYS[i])
+    for j = 1, #members, 500 do
+        deleted = deleted + redis.call('DEL', unpack(members, j, math.min(j + 499, #members)))
+    end
+    redis.call('DEL', KEYS[i])
+    redis.call('INCR', KEYS[n + i])
+    redis.call('EXPIRE', KEYS[n + i], ARGV[1])
+end
+return deleted
+"""
+
+# KEYS: the entry, its tag sets, then their generation counters; ARGV: ttl,
+# value, then the generations read before computing. Stores and indexes
+# the entry only if none of the tags was invalidated since.
+STORE_SCRIPT = """
+local n = (#KEYS - 1) / 2
+for i = 1, n do
+    if (redis.call('GET', KEYS[1 + n + i]) or '0') ~= ARGV[2 + i] then
+        return 0
+    end
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[1])
+for i = 2, n + 1 do
+    redis.call('SADD', KEYS[i], KEYS[1])
+    redis.call('EXPIRE', KEYS[i], ARGV[1])
+end
+return 1
+"""
+
+
+class LocalCache:
+    """
+    Bounded in-process LRU (L1) in front of Redis (L2).
+
+    Entries are ``(body, delta, expires_at)`` tuples where ``body`` is the
+    encoded response and ``delta`` is how long it took to compute, used for
+    early refresh. Tags map to the
+    local keys so invalidations done by this process take effect at once;
+    other processes pick them up within ``CACHE_L1_TTL``. Each
+    invalidation also bumps the tags' generations; ``set`` given the
+    generations read before computing skips the entry if they moved.
+    """
+
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self._data: OrderedDict[str, tuple] = OrderedDict()
+        self._tags: dict[str, set[str]] = {}
+        self._key_tags: dict[str, tuple[str, ...]] = {}
+        self._generations: dict[str, int] = {}
+        # Bumped when the generations are pruned, so older snapshots fail.
+        self._epoch = 0
+
+    def get(self, key: str):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[2] <= time.time():
+            self._discard(key)
+            return None
+        self._data.move_to_end(key)
+        return entry
+
+    def generations(self, tags: list[str]) -> tuple:
+        return (self._epoch, *(self._generations.get(tag, 0) for tag in tags))
+
+    def set(self, key: str, entry: tuple, tags: list[str] = (), generations: tuple = None):
+        if generations is not None and generations != self.generations(tags):
+            counters["stale_skips"] += 1
+            return
+        self._data[key] = entry
+        self._data.move_to_end(key)
+        self._key_tags[key] = tuple(tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._data) > self.max_items:
+            self._discard(next(iter(self._data)))
+
+    def invalidate(self, tags: list[str]):
+        if len(self._generations) + len(tags) > 4 * self.max_items:
+            self._generations.clear()
+            self._epoch += 1
+        for tag in tags:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+            for key in list(self._tags.get(tag, ())):
+                self._discard(key)
+
+    def _discard(self, key: str):
+        self._data.pop(key, None)
+        for tag in self._key_tags.pop(key, ()):
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def __len__(self):
+        return len(self._data)
+
+
+local_cache = LocalCache(settings.CACHE_L1_MAX_ITEMS)
+_inflight: dict[str, asyncio.Future] = {}
+counters = {
+    "l1_hits": 0,
+    "l2_hits": 0,
+    "misses": 0,
+    "coalesced": 0,
+    "early_refreshes": 0,
+    "invalidations": 0,
+    "stale_skips": 0,
+    "errors": 0,
+}
+
+
+def cache_stats() -> dict:
+    return {**counters, "l1_size": len(local_cache), "l1_max_items": local_cache.max_items}
 
-from app.service.redis_service import get_redis
 
 def make_cache_key(request: Request):
-    raw_key = f"{request.url.path}?{request.url.query}&method={request.method}"
+    principal = getattr(request.scope.get("user"), "id", None)
+    raw_key = f"{request.url.path}?{request.url.query}&method={request.method}&user={principal}"
     return hashlib.sha256(raw_key.encode()).hexdigest()
 
-def redis_cache(ttl: int = 60):
+
+async def invalidate_tags(*tags: str) -> None:
+    """
+    Drop every cached response indexed under any of ``tags``.
+    """
+    local_cache.invalidate(tags)
+    counters["invalidations"] += 1
+    try:
+        redis: Redis = await get_cache()
+        await redis.eval(
+            INVALIDATE_SCRIPT, 2 * len(tags),
+            *(TAG_PREFIX + tag for tag in tags), *(GENERATION_PREFIX + tag for tag in tags),
+            GENERATION_TTL,
+        )
+    except Exception:
+        counters["errors"] += 1
+        logger.exception("Cache invalidation failed")
+
+
+def should_refresh(delta: float, expires_at: float, beta: float) -> bool:
+    """
+    Probabilistic early expiration (XFetch): the closer an entry is to
+    expiry and the slower it is to compute, the likelier a caller is to
+    refresh it ahead of time, so workers don't all miss at the same moment.
+    """
+    return time.time() - delta * beta * math.log(random.random() or 1e-12) >= expires_at
+
+
+async def _read_l2(redis: Redis, key: str):
+    try:
+        cached = await redis.get(key)
+    except Exception:
+        counters["errors"] += 1
+        logger.exception("Cache read failed")
+        return None
+    if not cached:
+        return None
+    delta, expires_at, compressed = HEADER.unpack_from(cached)
+    body = cached[HEADER.size:]
+    return (zlib.decompress(body) if compressed else body), delta, expires_at
+
+
+def encode_body(content) -> bytes:
+    """
+    Serialize an endpoint result exactly as FastAPI would send it.
+    """
+    return dumps(content)
+
+
+def pack_l2(body: bytes, delta: float, expires_at: float) -> bytes:
+    compressed = 0 < settings.CACHE_COMPRESS_MIN_BYTES <= len(body)
+    if compressed:
+        body = zlib.compress(body, 1)
+    return HEADER.pack(delta, expires_at, compressed) + body
+
+
+def as_response(body: bytes) -> Response:
+    return Response(content=body, media_type="application/json")
+
+
+async def _read_generations(redis: Redis, tags: list[str]):
+    """
+    The tags' current generations, or None when Redis can't be read.
+    """
+    if not tags:
+        return []
+    try:
+        return [int(value or 0) for value in await redis.mget(*(GENERATION_PREFIX + tag for tag in tags))]
+    except Exception:
+        counters["errors"] += 1
+        logger.exception("Cache read failed")
+        return None
+
+
+async def _compute(key: str, ttl: int, tags: list[str], func, args, kwargs):
+    """
+    Run ``func`` once per key; concurrent callers share the same future.
+
+    The tags' generations are read first and the result is only stored
+    if they are unchanged, so a write that invalidates the tags while
+    ``func`` runs isn't undone by storing what ``func`` read before it.
+    """
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        local_generations = local_cache.generations(tags)
+        redis: Redis = await get_cache()
+        generations = await _read_generations(redis, tags)
+
+        start = time.perf_counter()
+        body = encode_body(await func(*args, **kwargs))
+        delta = time.perf_counter() - start
+        expires_at = time.time() + ttl
+
+        current = True
+        if generations is not None:
+            try:
+                current = bool(await redis.eval(
+                    STORE_SCRIPT, 1 + 2 * len(tags),
+                    key, *(TAG_PREFIX + tag for tag in tags), *(GENERATION_PREFIX + tag for tag in tags),
+                    ttl, pack_l2(body, delta, expires_at), *generations,
+                ))
+            except Exception:
+                counters["errors"] += 1
+                logger.exception("Cache write failed")
+        if current:
+            local_cache.set(key, (body, delta, min(expires_at, time.time() + settings.CACHE_L1_TTL)), tags, local_generations)
+        else:
+            counters["stale_skips"] += 1
+
+        future.set_result(body)
+        return body
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # Mark the exception as retrieved when nobody else was waiting.
+        future.exception()
+        raise
+    finally:
+        del _inflight[key]
+
+
+def redis_cache(ttl: int = 60, tags=None, beta: float = settings.CACHE_EARLY_REFRESH_BETA):
+    """
+    Cache an endpoint's result per path, query and principal.
+
+    The encoded JSON body is cached and hits are returned as a raw
+    ``Response``, so FastAPI skips ``response_model`` validation and
+    encoding for them.
+
+    ``tags`` is an optional callable receiving the endpoint kwargs and
+    returning the tags the entry should be indexed under, so writes can
+    drop it with ``invalidate_tags``.
+    """
     def decorator(func):
         @wraps(func)
         async def wrapper(*args, **kwargs):
@@ -26,20 +309,38 @@ def redis_cache(ttl: int = 60):
                 return await func(*args, **kwargs)
 
             cache_key = make_cache_key(request)
+            entry_tags = tags(kwargs) if tags else []
 
-            redis: Redis = await get_redis()
+            entry = local_cache.get(cache_key)
+            if entry:
+                counters["l1_hits"] += 1
+                return as_response(entry[0])
 
-            cached = await redis.get(cache_key)
-            if cached:
-                return json.loads(cached)
+            inflight = _inflight.get(cache_key)
+            if inflight:
+                counters["coalesced"] += 1
+                return as_response(await asyncio.shield(inflight))
 
-            response = await func(*args, **kwargs)
-
-            try:
-                await redis.set(cache_key, json.dumps(response), ex=ttl)
-            except Exception:
-                pass
+            generations = local_cache.generations(entry_tags)
+            redis: Redis = await get_cache()
+            entry = await _read_l2(redis, cache_key)
+            if entry:
+                body, delta, expires_at = entry
+                if cache_key in _inflight or not should_refresh(delta, expires_at, beta):
+                    counters["l2_hits"] += 1
+                    local_cache.set(
+                        cache_key, (body, delta, min(expires_at, time.time() + settings.CACHE_L1_TTL)),
+                        entry_tags, generations,
+                    )
+                    return as_response(body)
+                counters["early_refreshes"] += 1
+            else:
+                inflight = _inflight.get(cache_key)
+                if inflight:
+                    counters["coalesced"] += 1
+                    return as_response(await asyncio.shield(inflight))
+                counters["misses"] += 1
 
-            return response
+            return as_response(await _compute(cache_key, ttl, entry_tags, func, args, kwargs))
         return wrapper
     return decorator
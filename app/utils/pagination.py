@@ -0,0 +1,48 @@
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException
+from tortoise.expressions import Q
+from tortoise.queryset import QuerySet
+
+
+def encode_cursor(created_at: datetime, pk: int) -> str:
+    raw = json.dumps([created_at.isoformat(), pk], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, pk = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, TypeError):
+        raise HTTPException(400, "Invalid cursor")
+
+
+def keyset_queryset(qs: QuerySet, cursor: str | None, limit: int) -> QuerySet:
+    """
+    One page plus one row, ordered by ``(-created_at, -id)`` starting after
+    ``cursor``.
+
+    The extra ``created_at <= ts`` bound turns the row comparison into an
+    index range scan on the ``(..., created_at, id)`` indexes.
+    """
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        qs = qs.filter(created_at__lte=created_at).filter(Q(created_at__lt=created_at) | Q(id__lt=pk))
+    return qs.order_by("-created_at", "-id").limit(limit + 1)
+
+
+async def keyset_page(qs: QuerySet, cursor: str | None, limit: int) -> tuple[list, str | None]:
+    """
+    Fetch one page after ``cursor`` and the cursor of the next one.
+    """
+    rows = await keyset_queryset(qs, cursor, limit)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
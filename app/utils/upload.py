@@ -0,0 +1,221 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import HTTPException
+from python_multipart import MultipartParser
+from python_multipart.multipart import parse_options_header
+from starlette.requests import Request
+
+from app.config import settings
+
+# (signature, offset, content type, extension); checked in order.
+MAGIC_NUMBERS = (
+    (b"\x89PNG\r\n\x1a\n", 0, "image/png", "png"),
+    (b"\xff\xd8\xff", 0, "image/jpeg", "jpg"),
+    (b"GIF87a", 0, "image/gif", "gif"),
+    (b"GIF89a", 0, "image/gif", "gif"),
+    (b"WEBP", 8, "image/webp", "webp"),
+    (b"II*\x00", 0, "image/tiff", "tif"),
+    (b"MM\x00*", 0, "image/tiff", "tif"),
+    (b"%PDF-", 0, "application/pdf", "pdf"),
+)
+SNIFF_BYTES = 16
+EXTENSIONS = {content_type: ext for _, _, content_type, ext in MAGIC_NUMBERS}
+
+# Room for the multipart boundaries and part headers around the file.
+MULTIPART_OVERHEAD = 16 * 1024
+
+MULTIPART_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                },
+            },
+        },
+    },
+}
+
+
+def sniff_content_type(head: bytes) -> Optional[tuple[str, str]]:
+    """
+    Content type and extension from a file's leading bytes, or ``None`` if
+    it isn't one of ``MAGIC_NUMBERS``.
+    """
+    if head[8:12] == b"WEBP" and not head.startswith(b"RIFF"):
+        return None
+    for signature, offset, content_type, ext in MAGIC_NUMBERS:
+        if head[offset:offset + len(signature)] == signature:
+            return content_type, ext
+    return None
+
+
+@dataclass
+class ReceivedFile:
+    path: str
+    filename: Optional[str]
+    content_type: str
+    ext: str
+    size: int
+    sha256: str
+
+
+class _FilePart:
+    """
+    Collects one multipart file field into a temp file, checking the size
+    and hashing as the bytes arrive.
+    """
+
+    def __init__(self, tmp_dir: str, max_size: int, chunk_size: int):
+        self.tmp_dir = tmp_dir
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self.filename: Optional[str] = None
+        self.detected: Optional[tuple[str, str]] = None
+        self.size = 0
+        self.buffer = bytearray()
+        self.hash = hashlib.sha256()
+        self.file = None
+        self.path: Optional[str] = None
+
+    def feed(self, data: bytes) -> None:
+        self.size += len(data)
+        if self.size > self.max_size:
+            raise HTTPException(413, f"File too large. Maximum {self.max_size // (1024 * 1024)} MB allowed.")
+        self.buffer += data
+
+    def _write(self, data: bytearray) -> None:
+        # hashlib releases the GIL, so hashing rides along on the write thread.
+        self.hash.update(data)
+        self.file.write(data)
+
+    async def flush(self, final: bool = False) -> None:
+        if not final and len(self.buffer) < self.chunk_size:
+            return
+        if self.detected is None:
+            if not final and len(self.buffer) < SNIFF_BYTES:
+                return
+            self.detected = sniff_content_type(bytes(self.buffer[:SNIFF_BYTES]))
+            if self.detected is None:
+                raise HTTPException(400, "Invalid file type. Only images or PDFs are allowed.")
+        if self.file is None:
+            fd, self.path = tempfile.mkstemp(dir=self.tmp_dir, suffix=".part")
+            self.file = os.fdopen(fd, "wb")
+        data, self.buffer = self.buffer, bytearray()
+        await asyncio.to_thread(self._write, data)
+
+    async def close(self) -> None:
+        if self.file is not None:
+            await asyncio.to_thread(self.file.close)
+
+    def discard(self) -> None:
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+async def receive_file(
+    request: Request,
+    tmp_dir: str,
+    field: str = "file",
+    max_size: int = settings.ATTACHMENT_MAX_SIZE,
+    chunk_size: int = settings.UPLOAD_CHUNK_SIZE,
+) -> ReceivedFile:
+    """
+    Stream the ``field`` file of a multipart request into ``tmp_dir``.
+
+    The body is parsed as it arrives: nothing is buffered beyond one chunk,
+    a ``Content-Length`` over the limit is refused before reading, the size
+    limit is enforced on the fly, the type comes from the file's magic
+    bytes rather than the client's header, and the SHA-256 is computed
+    while writing. The caller owns the returned temp file.
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    boundary = options.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(400, "Expected a multipart/form-data body")
+
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_size + MULTIPART_OVERHEAD:
+        raise HTTPException(413, f"File too large. Maximum {max_size // (1024 * 1024)} MB allowed.")
+
+    part = _FilePart(tmp_dir, max_size, chunk_size)
+    current: Optional[_FilePart] = None
+    header_field, header_value = bytearray(), bytearray()
+    headers: dict[bytes, bytes] = {}
+    errors: list[HTTPException] = []
+
+    def on_part_begin():
+        headers.clear()
+
+    def on_header_field(data: bytes, start: int, end: int):
+        header_field.extend(data[start:end])
+
+    def on_header_value(data: bytes, start: int, end: int):
+        header_value.extend(data[start:end])
+
+    def on_header_end():
+        headers[bytes(header_field).lower()] = bytes(header_value)
+        header_field.clear()
+        header_value.clear()
+
+    def on_headers_finished():
+        nonlocal current
+        _, disposition = parse_options_header(headers.get(b"content-disposition", b""))
+        if disposition.get(b"name", b"").decode("latin-1") == field and part.path is None and not part.size:
+            current = part
+            part.filename = disposition.get(b"filename", b"").decode("utf-8", "replace") or None
+
+    def on_part_data(data: bytes, start: int, end: int):
+        if current is not None and not errors:
+            try:
+                current.feed(data[start:end])
+            except HTTPException as e:
+                errors.append(e)
+
+    def on_part_end():
+        nonlocal current
+        current = None
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if errors:
+                raise errors[0]
+            await part.flush()
+        parser.finalize()
+        if not part.size:
+            raise HTTPException(400, f"Missing file field '{field}'")
+        await part.flush(final=True)
+        await part.close()
+    except BaseException:
+        await part.close()
+        part.discard()
+        raise
+
+    content_type, ext = part.detected
+    return ReceivedFile(
+        path=part.path,
+        filename=part.filename,
+        content_type=content_type,
+        ext=ext,
+        size=part.size,
+        sha256=part.hash.hexdigest(),
+    )
@@ -0,0 +1,69 @@
+from typing import Sequence, Type
+
+from tortoise import connections
+from tortoise.models import Model
+
+
+def update_returning_sql(
+    model: Type[Model], pk, values: dict, where: str = "", where_params: Sequence = ()
+) -> tuple[str, list]:
+    """
+    ``UPDATE ... RETURNING *`` for one row, setting only ``values`` and the
+    ``auto_now`` columns. The primary key is ``$1``; further parameters may
+    be appended by the caller. ``where`` is ANDed to the key match, with its
+    ``{}`` placeholders numbered for ``where_params``.
+    """
+    meta = model._meta
+    params = [pk]
+    assignments = []
+    for name, value in values.items():
+        field = meta.fields_map[name]
+        params.append(field.to_db_value(value, model))
+        assignments.append(f'"{field.source_field or name}" = ${len(params)}')
+    for name, field in meta.fields_map.items():
+        if getattr(field, "auto_now", False):
+            assignments.append(f'"{field.source_field or name}" = CURRENT_TIMESTAMP')
+    condition = f'"{meta.db_pk_column}" = $1'
+    if where:
+        first = len(params) + 1
+        params += where_params
+        condition += " AND " + where.format(*(f"${i}" for i in range(first, len(params) + 1)))
+    sql = f'UPDATE "{meta.db_table}" SET {", ".join(assignments)} WHERE {condition} RETURNING *'
+    return sql, params
+
+
+async def fetch_row(sql: str, params: list):
+    """
+    Run a statement returning at most one row, and return that row or None.
+    """
+    _, rows = await connections.get("default").execute_query(sql, params)
+    return rows[0] if rows else None
+
+
+async def fetch_instance(model: Type[Model], sql: str, params: list):
+    """
+    Run a statement returning at most one row of ``model`` and build the
+    instance from it, or None when it returned nothing.
+    """
+    row = await fetch_row(sql, params)
+    return model._init_from_db(**dict(row)) if row is not None else None
+
+
+async def update_returning(model: Type[Model], pk, values: dict):
+    """
+    Update one row in a single round trip and return it, or None when no
+    row has that key.
+    """
+    return await fetch_instance(model, *update_returning_sql(model, pk, values))
+
+
+async def delete_returning(model: Type[Model], pk, *columns: str):
+    """
+    Delete one row and return the requested columns of it, or None when no
+    row has that key.
+    """
+    meta = model._meta
+    returning = ", ".join(f'"{column}"' for column in columns) or f'"{meta.db_pk_column}"'
+    sql = f'DELETE FROM "{meta.db_table}" WHERE "{meta.db_pk_column}" = $1 RETURNING {returning}'
+    _, rows = await connections.get("default").execute_query(sql, [pk])
+    return rows[0] if rows else None
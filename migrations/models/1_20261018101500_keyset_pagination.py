@@ -0,0 +1,59 @@
+from tortoise import BaseDBAsyncClient
+
+RUN_IN_TRANSACTION = True
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_leads_created_675f57";
+        DROP INDEX IF EXISTS "idx_orders_status_33ec6d";
+        DROP INDEX IF EXISTS "idx_orders_created_cdc9e7";
+        CREATE INDEX IF NOT EXISTS "idx_leads_created_2646d4" ON "leads" ("created_by_id", "created_at", "id");
+        CREATE INDEX IF NOT EXISTS "idx_orders_lead_id_517eca" ON "orders" ("lead_id", "created_at", "id");
+        CREATE INDEX IF NOT EXISTS "idx_orders_status_37f857" ON "orders" ("status", "created_at", "id");
+        CREATE INDEX IF NOT EXISTS "idx_orders_created_dd2f2e" ON "orders" ("created_at", "id");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_leads_created_2646d4";
+        DROP INDEX IF EXISTS "idx_orders_lead_id_517eca";
+        DROP INDEX IF EXISTS "idx_orders_status_37f857";
+        DROP INDEX IF EXISTS "idx_orders_created_dd2f2e";
+        CREATE INDEX IF NOT EXISTS "idx_leads_created_675f57" ON "leads" ("created_by_id");
+        CREATE INDEX IF NOT EXISTS "idx_orders_status_33ec6d" ON "orders" ("status");
+        CREATE INDEX IF NOT EXISTS "idx_orders_created_cdc9e7" ON "orders" ("created_at");"""
+
+
+MODELS_STATE = (
+    "eJztm1tv4jgUgP8KylNHYisI9DZvQGmHHS6rlu6OpltFJjFgNbEzidOWne1/X9u5XydhC4"
+    "WKlyocn5PYny/nkvSnZBAN6vbxnQ0t6XPtp4SBAdlFTF6vScA0QykXUDDThaLDNIQEzGxq"
+    "AZUy4RzoNmQiDdqqhUyKCGZS7Og6FxKVKSK8CEUORj8cqFCygHQpOnL/wMQIa/AF2vznvX"
+    "iO6BxruZcswp7+wJXMR2WOoK7Feo803iMhV+jKFLIBpldCkfdhpqhEdwwcKpsruiQ40EaY"
+    "cukCYmgBCvntqeXwQfE+e4P3x+n2P1RxOx6x0eAcODqNQChJRiWYU2W9scUAF/wpv8nN9l"
+    "n7vHXaPmcqoieB5OzVHV44dtdQEBhPpVfRDihwNQTckFsAOUWvtwRWNr6oTQIi63oSoo+s"
+    "iKIvCDGGC+qNOBrgRdEhXtAl+9mSC6D92bnpfencHLXkT3wshC1xd+GPvRZZNHGuIUcT2P"
+    "YzsTJWYT7HqM1+cpRPTkqAZFq5JEVbHKXY6ZkY+9gxBMoB6xPAKkwh9W23h1MC7K7i5IgT"
+    "lTqXo8H4cw1oBsJ/4851fzxlvwLliqTLcM6nLBjzs3P+GDkFuGAG1MdnYGlKrCWcDB0CzU"
+    "7PRtczu/p6A3Ughpym7nmUIbtFCfrewbnFtfzqrx5f6vVCkCIyyUOVbjJkIykBmM215j2b"
+    "P8mj0XE0RIdkkeV7g7ZC/wu4lqKTxbacsOL6S9WCfPYUQCv64S5afCBXfCHLrdaZ3Gidnp"
+    "+0z85OzhuBT043FTnn7uCa++fYli3nsJWqlCNGv0a9I45mi7RDuhBrJvGYlHXjUZuDG49E"
+    "RCudAE1ZAntZLSqK2+0n0tN2CaKn7VygvCnOM3L8pmheshaKDJhNNG6Z4Kl5psf+xY7SZW"
+    "PQJlhf+T46n+50MOrfTjujP/hIDNv+oQtEnWmft8hCukpIj04TMxHcpPbXYPqlxn/Wvk/G"
+    "fUGQ2HRhiSeGetPvEu8TcChRMHlWgBZxQb7UB1MlFttkMCJCs4xAxA/Z8oOQIC7ccPxBLL"
+    "RAWPkHmV6ITcW1KAn463q2SoQndRFXHIoFb10sqFoo2O8iQVM+L3GGM63cQ1y0JbwiA1GJ"
+    "YWCwpxDLRBbN/MCimYoroAGQXik+8w32k6B8UiaUYFoFwVkqmIgfq2VJxq32FGejDM1GPs"
+    "xGkmXglCqQjNocOLocn+ASMTUXRCbLX9f/kvd4Z7aSDTWAa//WbOeJ/WXuXn18p+pfbPeb"
+    "bPizrCprlxAW2eGc7R8xS4CdMbvdXLVFJYHJZBjLEbqDRIFgfDfq9pl/EmiZEqI5dQNAKV"
+    "CXBqxWOYhbrbVWt1813ULp4JDqfqBUNzqxjqmtObFxy8PEvuvEep1Pb9jZKrM0nZtbp+zW"
+    "qk6/wxn4Bol2qgSUhTPN8opYEC3wV7hKRULZr9/8Dzp2DmLe6zcmtsBzULZJLxI2RjYy6P"
+    "ri2/60Nr4bDqXXMq8ziaV5H6+s/z5zwu+xmyfMu7zRdHlkVBEDUPllxHA+NlxH1L2KJtst"
+    "1LHd+qEvS1cOeaunmdt+qDduvN4YTsE6uWBovcWvQTQLzLO+BhFylgL+cAh7IrtgGdOjuG"
+    "B7Aj1BC2rrJIYXJYLvi9zQ+yIZeM+ADRXTQmpGangJVWQAPXvRxg2T4ZlreezdYZedURbH"
+    "y35vMOoMj5pyXU4kgj7idqqYMUcY6GuhTFgeWEqYbZmMU2AKX3KO0MBgT1LqokSg/20ayw"
+    "H83Xs06nz7FMsDhpPxta8e2e294aR7yK8/Yhp2yK8/6MSm8mseqVbLrCMWe/bF16aSaj/a"
+    "/5/pdMmvWXco+asn8unI0ohl0r3Oba9z2S9KpDf6YSxkIc9Syvos1m2pF34UG+psMpE8pH"
+    "hrbMp6QYrHMh/bq7aUfWsSMdnTV6ebeGfCt0YFiJ76fgJsNsq8fGZa+Z+VNFJZBnsizXx/"
+    "9/vtZJwTDYcmCZB3mA3wXkMqrdd0ZNOH3cRaQJGPujjxSOYYiaiH36Bb7d9O3t69vP4HK+"
+    "k4mA=="
+)
@@ -0,0 +1,54 @@
+from tortoise import BaseDBAsyncClient
+
+RUN_IN_TRANSACTION = True
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "pricing_rule_sets" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "version" INT NOT NULL UNIQUE,
+    "rules" JSONB NOT NULL,
+    "created_at" TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "created_by_id" INT REFERENCES "users" ("id") ON DELETE SET NULL
+);"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "pricing_rule_sets";"""
+
+
+MODELS_STATE = (
+    "eJztm1tv4jgUx78K4qkjdSsI9DZvQGmHHQqjlu6OpltFJnHBamLTxGnLzva777FzvzGBKR"
+    "SqvFTh2Cexf/Hlf07cn1WT6diwD25sbFU/V35WKTIxXMTs+5Uqms1CqzBwNDZkRQdqSAsa"
+    "29xCGgfjPTJsDCYd25pFZpwwClbqGIYwMg0qEjoJTQ4ljw5WOZtgPpUNub0DM6E6fsG2+H"
+    "krnyMbByW3VYvB0+9EpdmDek+wocdaT3TRImlX+XwmbT3Kz2VF0YaxqjHDMWlYeTbnU0aD"
+    "2oRyYZ1gii3Esbg9txzRKdFmr/N+P932h1Xchkd8dHyPHINHIBQkozEqqEJrbNnBiXjKH0"
+    "q9edw8aRw1T6CKbElgOX51uxf23XWUBAaj6qssRxy5NSTckFsAOUWvM0VWNr6oTwIiND0J"
+    "0Ue2iKJvCDGGA+qNOJroRTUwnfAp/GwoC6D91brqfGld7TWUT6IvDIa4O/AHXokiiwTXkO"
+    "MM2fYzszJGYT7HqM9uclQODwuAhFq5JGVZHKWc6ZkYu9QxJcoetAlRDaeQ+r6bw1lFcFe5"
+    "csSJVltnl73B5wrSTUL/oa2L7mAEv4LKS5IuwjmfsmQs1s77h8gqIAxjpD08I0tXYyXhyz"
+    "Aw0u3022h7budfr7CBZJfT1L0dpQ+3KEDfWzg3OJZf/dHjW71WxCe2RTS4iWo5BlZtzH8T"
+    "xjf3dldwt2uc2nC2G4sYL0xheSMoXWQqZtKCKEwB3Xu2eJLHpeXohPfZJEuSBGULZQkStV"
+    "SDTTalTVRXRmgWFm9PRXxJedImkw+kUE4VpdE4VmqNo5PD5vHx4UktkCrpokWapd27ELIl"
+    "tpIV0zHqspQjTr9GvSX77wZph3Qx1WfMY1JU3UR9SnUTEYpzgyFdnSJ7upxYjPvtJtKjZg"
+    "GiR81coKIozjOy/KZonkEJJybOJhr3TPDUPdcD/2JL6UIf9CE15qF0yaM76l12r0ety2+i"
+    "J6ZtPxoSUWvUFSWKtM4T1r2jxJsIblL5uzf6UhE/Kz+Gg64kyGw+seQTw3qjH1XRJuRwpl"
+    "L2rCI9sgX5Vh/MMhJ1nWJEKtYMIeIr2XwREsjlNesPZpEJoeq/ZOZFHlxey0yJP67H84Q8"
+    "2Ze6osyhvHUOZdn8yW7nTurKSYE1HGrlLuKyLLErAoilGAYOOwqxiLKo5wuLekpXYBMRYy"
+    "l95jvsJkHlsIiUgFoLxFlKTMSX1aIk4147irNWhGYtH2YtyTLYlJYgGfUpObocn/CUQDUX"
+    "RCbLX6dFk/d4Z7ZVG+uIVv6r2M4T/IXtXnt4p6RobPbPoPvjrORzmzFQdjRn+kfcEmDH4L"
+    "edo3ZRSmA47MdihHYvkSAY3Fy2u7A/SbRQifCcvAHiHGlTEy+XOYh7rTRWN5813UDqoAx1"
+    "P1CoG32xzkxf8cXGPcsX+64vNvXtKIzEM1PTubF1ym+l7PQ7rIFvEGinUkBZONMsz5mFyY"
+    "R+xfOUEsr+EOefc9k6iHmf38BsoecgbZMeJNBH6Bl29+Lr7qgyuOn3q69FvvIyS/fO9Kz+"
+    "ZXMo7rGdK8y7fNF0eWRkEQNQ+WnE8H2sOY9oeBlNmC3csd38oW9LZw5FqVczt7zMN6493x"
+    "i+glViwdB7g4dkdAvdZx2SkXYIAR8dBk+EC4iYHuQFzAnyhC2srxIYnhYQ36e50vs0KbzH"
+    "yMaqOAiSERqeYY2YyMgetHHHpDxzPQ+8O2zzZpTF8azb6V22+nt1ZV9JBII+4mYqmXFPKD"
+    "JWQpnwLFlWKUyZjFVghF9yltDAYUdC6kWBQPf7KBYD+LN377L1/VMsDugPBxd+9chs7/SH"
+    "7TK+/ohhWBlff9AXm4qvhVJdLrKOeOzYia91BdW+2v/NcLrgId8tCv72E/F0ZGjEIulO67"
+    "rTOusuCqTXGUYmDgxnxJPpI8X5gWXmaea1xphl9LfCfN1fEP1BUGR7iZiC8CIeb7Po7QbC"
+    "yH+UwGjPUMp/Xg8H2cQChwSvGwo9udWJxvcrBrH53VYveVlwRJ8XC+ekRk7s2uIGpXD+kP"
+    "oqLZzLDxjlB4wt/oCx1n9IwiCVpll6yytZqLNQWKcUV1s2QVcSV/mnVfLV1a4cWVvHWRUx"
+    "NZaA6FXfTYD1WpFDf1Ar/zhvLZXdhSfyzHNT+ao14lLq1jzd+q7/YvL6P2laowY="
+)
@@ -0,0 +1,52 @@
+from tortoise import BaseDBAsyncClient
+
+RUN_IN_TRANSACTION = True
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        UPDATE "leads" SET "attachment" = substr("attachment", 9) WHERE "attachment" LIKE 'uploads/%';"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        UPDATE "leads" SET "attachment" = 'uploads/' || "attachment" WHERE "attachment" LIKE 'attachments/%' AND "attachment" NOT LIKE 'attachments/%/%';"""
+
+
+MODELS_STATE = (
+    "eJztXFtz2jgU/isMT+kM2wGH3PoGCUnZEugkZNtptuMRtgBNbInachPazX9fSb7bMrVpAJ"
+    "P6JWOOztHl0+07R1J+1k2iQ8N+e2dDq/6u9rOOgQnZR0zeqNXBYhFKuYCCiSEUHaYhJGBi"
+    "UwtolAmnwLAhE+nQ1iy0oIhgJsWOYXAh0ZgiwrNQ5GD0zYEqJTNI56Ii91+ZGGEdPkGb/7"
+    "wX5YjKsZT7ukVY6V+50uJBnSJo6LHaI53XSMhVulwIWR/TS6HI6zBRNWI4Jg6VF0s6JzjQ"
+    "Rphy6QxiaAEKefbUcnijeJ29xvvtdOsfqrgVj9jocAocg0ZAyImMRjBHldXGFg2c8VL+Ul"
+    "rtk/bp4XH7lKmImgSSk2e3eWHbXUOBwHBcfxbpgAJXQ4Ab4haAnELvfA4sOXxRmwSIrOpJ"
+    "EH3IVqHoC0IYwwH1Qjia4Ek1IJ7ROft5qKwA7Z/Ozfn7zs3BofKGt4WwIe4O/KGXoogkjm"
+    "uI4wLY9iOxJKMwG8eozX7iqBwd5QCSaWUiKdLiUIqZLoWxhx1TQNlndQJYgylIfdvtwVkH"
+    "LFexcsQRrXcurvvDdzWgmwj/iztXveGY/QqUCyKdB+dslAXGfO2cPkRWAS6YAO3hEVi6Gk"
+    "sJO8OAQLfTvdH1zC4/3EADiCanUfd2lAHLIgf63sK5xbH87I8eX+rVIj6xLaSxTFTLMaBq"
+    "Q/qbYHx0s7thud3C1IZTblj4eCEKyRpB6SRTMZMSgNkU0L2yeUkeLh1HR3RAZjJKEqStpC"
+    "WAa6kGmW2Lm6gujdAsyHtPBbQgPemi2StiKGeKcnh4ojQPj0+P2icnR6fNgKqkk1Zxlm7/"
+    "itOW2EqWj8eoRVGOGP0a6pLsv1tEO0QXYn1BPEzyspuoTcVuIkRxaRCgq3Ngz4uRxbjdfk"
+    "J63M6B6HE7E1CeFMczsvym0LxgKRSZUI5o3DKBp+6ZvvU/Sooua4M+wsYypC5Z6I77173b"
+    "cef6I2+JadvfDAFRZ9zjKYqQLhPSg+NETwSZ1D71x+9r/Gfty2jYEwgSm84sUWKoN/5S53"
+    "UCDiUqJo8q0CNbkC/1gSlCUTdJRgRjlRARn8lmk5CALm+YfxALzRBWf6CF53lQ8S0iJf64"
+    "niwT9KQheEUVQ3npGErR+Ml+x05aymmONZxpZS7iIi2xKzIgCmEYGOwpiHmYRSubWLRSvA"
+    "KaABmF+JlvsJ8IKkd5qATTWkHOUmQivqzmRTJutadwNvOg2cwGs5nEMtiUCiAZtalwdHH8"
+    "DueIqblASLH8dVg0mceOsa3bUAe49l/Ndr6zv2y71x52FBSNzf4Fa/5EFnzuEsKYHc6Y/h"
+    "GzBLATZlfOUbsqJDAaDWI+QrefCBAM7667PbY/CWiZEqIZcQNAKdDmJiwWOYhbrTVWtx81"
+    "3ULooHJ1X5GrG+1YZ6Gv2bFxy6pjd9qxqbOj0BOXhqYzfeuU3VrR6R2sgS/gaKdCQDI401"
+    "heEguiGf4AlykmJD+I8++5lA7ErOM3JrbAYxC2SQ8S1kbWMujuxbe9cW14NxjUn/Oc8hJL"
+    "9+70rH+yOeJ5lHOF2cmJpouHJIoYAJUdRgz7Y8NxRMOLaLLZQh3bjR/6snTkkKd6mpnpVb"
+    "xx4/HGsAvW8QVD6y1ektEtMJVdkhFy5gJ+cwgrkX0wj+lBfLA5gb5DC+rrOIZnOcj3WSb1"
+    "PksS7wmwocovgkhcwwuoIRMY8kEbN0zSM9fyrZdDmTcjGY4XvfP+dWdw0FIaSsIR9CFup4"
+    "IZU4SBsRaUCcsKyzpmU0ayCozhU8YSGhjsiUu9yhHofR7HfAB/9h5cdz6/ifkBg9HwyleP"
+    "zPbzwahb+dev0Q2r/OtX2rEp/5oz1WKedcRiz258bcqp9tn+b7rTOS/5lsj5ayT86cjQiH"
+    "nS553b885Fb5UjvUk3MnFhWOJPpq8UZzuW0tvMG/UxK+9vjfnaWOH9MafI9gIxOcGLWLzM"
+    "orcfEEZelLDRLmHKf9+OhnLEAoMEXneYteReRxpt1Axk06+lXvJk4PA2rybOSY6c2LV5Bh"
+    "VxfpX8Kk2cqwOM6gCjxAcYm+Rdn+BkTsjDyKET8iSjXXGFlazr0VVVSai72bB+GOPF8Imy"
+    "1ZVCc0GrJ0o7faL0Zz6iOWrleWvNtLLvabUkr63FY5gilC5iUpG6PKRuD0+ZFmy6cAhTIP"
+    "sp0XMl9j0FyCjFAZO3QEvQzlx+oybbC2U1d8utYscfiZ0tBd1qz0NiXrkfJXM/DGBTFVoW"
+    "sYocc8WtqrOu6qzrT5ozwf62RtcmbV+gc8s1k0rUl36zy/oGtgMtpM3rsn/H4aY0Vv4zjl"
+    "CnOlx4yYVrV4cL2S5q9unCnnioG3mrwadGARA99f0EsNXM8+iNaWU/Z22mbjexEqn03VC2"
+    "ix8xqVz8LBd/p9vL8/9utG9U"
+)
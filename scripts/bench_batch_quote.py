@@ -0,0 +1,60 @@
+"""
+Throughput of the batch quote engine against the scalar loop.
+
+    PYTHONPATH=. python scripts/bench_batch_quote.py [--rows N] [--seed S]
+
+Prices ``--rows`` random quotes once with ``OrderService.calculate_price``
+row by row and once with ``OrderService.calculate_price_batch``, then
+checks that every price matches. The mix includes quarter-km distances
+(rounding ties) and non-cent base prices, which take the Decimal fallback.
+"""
+import argparse
+import random
+import time
+
+import orjson
+
+from app.logistics.schemas import QuoteCalcRequest
+from app.logistics.services import OrderService
+
+
+def random_columns(rows: int, seed: int) -> dict[str, list]:
+    rng = random.Random(seed)
+    columns = {"base_price": [], "distance_km": [], "vehicle_type": [], "operable": [], "season": []}
+    for _ in range(rows):
+        base = rng.randint(0, 500_000) / 100
+        if rng.random() < 0.01:
+            base = rng.randint(0, 5_000_000) / 1000
+        columns["base_price"].append(base)
+        columns["distance_km"].append(rng.randint(0, 20_000) / 4 if rng.random() < 0.2 else rng.uniform(0, 5000))
+        columns["vehicle_type"].append(rng.choice(["sedan", "suv", "truck"]))
+        columns["operable"].append(rng.random() < 0.8)
+        columns["season"].append(rng.choice(["normal", "winter", "summer", "spring"]))
+    return columns
+
+
+def main(args: argparse.Namespace) -> None:
+    columns = random_columns(args.rows, args.seed)
+    rows = [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+    started = time.perf_counter()
+    scalar = [str(OrderService.calculate_price(QuoteCalcRequest(**row)).final_price) for row in rows]
+    scalar_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    body = b"".join(OrderService.calculate_price_batch(columns))
+    batch_time = time.perf_counter() - started
+
+    batch = [orjson.loads(line)["final_price"] for line in body.splitlines()]
+    mismatches = sum(a != b for a, b in zip(scalar, batch)) + abs(len(scalar) - len(batch))
+
+    print(f"scalar {scalar_time:7.2f}s  {args.rows / scalar_time:10.0f} rows/s")
+    print(f"batch  {batch_time:7.2f}s  {args.rows / batch_time:10.0f} rows/s  ({scalar_time / batch_time:.1f}x)")
+    print(f"mismatches: {mismatches}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=1)
+    main(parser.parse_args())
@@ -0,0 +1,150 @@
+"""
+Throughput and worker CPU of concurrent attachment downloads.
+
+    PYTHONPATH=. python scripts/bench_download.py [--size-mb M] [--concurrency N] [--requests R]
+
+Writes a ``--size-mb`` file into a throwaway ``LocalStorage`` root and
+serves it through ``serve_object`` from a uvicorn worker in a child
+process, once with Starlette's default 64 KiB file chunks and once with
+``DOWNLOAD_CHUNK_SIZE``. (uvicorn doesn't offer ``http.response.pathsend``,
+so both read the file in chunks.) For each, ``--concurrency`` clients fetch
+``--requests`` full copies over TCP, then the same number of random
+``--range-mb`` Range requests. Reported are MB/s received and the CPU time
+the worker spent, from ``time.process_time()`` read inside it before and
+after each run. The storage root is removed afterwards.
+"""
+import argparse
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import random
+import shutil
+import socket
+import tempfile
+import time
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from starlette.responses import FileResponse
+
+from app.config import settings
+from app.service.storage_service import LocalStorage, ObjectFileResponse, serve_object
+
+MB = 1024 * 1024
+
+
+def make_app(root: str, key: str) -> FastAPI:
+    storage = LocalStorage(root)
+    app = FastAPI()
+
+    @app.get("/attachment")
+    async def attachment(request: Request):
+        return await serve_object(storage, key, request)
+
+    @app.get("/cpu")
+    async def cpu():
+        return {"seconds": time.process_time()}
+
+    return app
+
+
+def serve(root: str, key: str, port: int, chunk_size: int) -> None:
+    ObjectFileResponse.chunk_size = chunk_size
+    uvicorn.run(make_app(root, key), host="127.0.0.1", port=port, log_level="warning")
+
+
+def write_file(root: str, size: int) -> str:
+    """
+    Random content under its hash, like an uploaded attachment.
+    """
+    data = os.urandom(size)
+    key = f"attachments/1/{hashlib.sha256(data).hexdigest()}.pdf"
+    path = os.path.join(root, key)
+    os.makedirs(os.path.dirname(path))
+    with open(path, "wb") as f:
+        f.write(data)
+    return key
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_until_up(client: httpx.AsyncClient) -> None:
+    for _ in range(100):
+        try:
+            await client.get("/cpu")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+async def run(client: httpx.AsyncClient, args: argparse.Namespace, size: int, ranged: bool) -> tuple[float, float]:
+    """
+    MB/s received and worker CPU seconds for one batch of downloads.
+    """
+    span = min(args.range_mb * MB, size)
+    queue = asyncio.Queue()
+    for _ in range(args.requests):
+        start = random.randrange(size - span + 1)
+        queue.put_nowait({"Range": f"bytes={start}-{start + span - 1}"} if ranged else {})
+    received = 0
+
+    async def worker():
+        nonlocal received
+        while not queue.empty():
+            headers = queue.get_nowait()
+            async with client.stream("GET", "/attachment", headers=headers) as response:
+                assert response.status_code == (206 if ranged else 200), response.status_code
+                async for chunk in response.aiter_raw():
+                    received += len(chunk)
+
+    cpu_before = (await client.get("/cpu")).json()["seconds"]
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    cpu_after = (await client.get("/cpu")).json()["seconds"]
+    return received / MB / elapsed, cpu_after - cpu_before
+
+
+async def bench(args: argparse.Namespace, port: int, size: int) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency + 1)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+        await wait_until_up(client)
+        return {"full": await run(client, args, size, False), "range": await run(client, args, size, True)}
+
+
+def main(args: argparse.Namespace) -> None:
+    root = tempfile.mkdtemp(prefix="bench-download-")
+    size = args.size_mb * MB
+    try:
+        key = write_file(root, size)
+        print(f"{args.size_mb} MB file, {args.concurrency} concurrent, {args.requests} requests per run, "
+              f"ranges of {args.range_mb} MB")
+        for name, chunk_size in (("64 KiB", FileResponse.chunk_size), ("1 MiB", settings.DOWNLOAD_CHUNK_SIZE)):
+            port = free_port()
+            server = multiprocessing.Process(target=serve, args=(root, key, port, chunk_size), daemon=True)
+            server.start()
+            try:
+                results = asyncio.run(bench(args, port, size))
+            finally:
+                server.terminate()
+                server.join()
+            for mode, (throughput, cpu) in results.items():
+                print(f"{name:7} chunks {mode:6} {throughput:9.1f} MB/s {cpu:7.2f} CPU-s in the worker")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=200)
+    parser.add_argument("--range-mb", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=32)
+    main(parser.parse_args())
@@ -0,0 +1,162 @@
+"""
+Throughput and peak memory of streaming a large order export.
+
+    PYTHONPATH=. python scripts/bench_export.py [--rows N] [--keep]
+
+Needs the Postgres from ``.env`` with migrations applied. Seeds ``--rows``
+orders on one throwaway lead, then streams ``/logistics/orders/export``
+for that lead as NDJSON, CSV and gzipped NDJSON and CSV. The app is
+called in-process as a bare ASGI callable whose ``send`` counts and drops
+each chunk; httpx's ASGI transport would hold the whole body in memory
+and hide what the server itself keeps. Each mode runs in its own child
+process so ``ru_maxrss`` is that export's peak, not the highest of all of
+them; "idle" is a child that only sets up, the baseline to compare
+against. The lead, its orders and the user are deleted afterwards
+unless ``--keep`` is given.
+"""
+import argparse
+import asyncio
+import resource
+import subprocess
+import sys
+import time
+import zlib
+
+from fastapi import FastAPI
+from tortoise import Tortoise, connections
+
+from app.auth import Principal, get_admin
+from app.database import TORTOISE_ORM
+from app.logistics.routes import router
+from app.user.models import Role
+
+MODES = {
+    "ndjson": ("ndjson", False),
+    "csv": ("csv", False),
+    "ndjson+gzip": ("ndjson", True),
+    "csv+gzip": ("csv", True),
+}
+
+SEED_SQL = """
+INSERT INTO "orders" ("lead_id", "status", "base_price", "final_price", "notes", "created_at", "updated_at")
+SELECT $1, (ARRAY['draft', 'quoted', 'booked', 'delivered'])[1 + g % 4],
+       (100 + g % 900)::numeric(12, 2), (120 + g % 900)::numeric(12, 2),
+       CASE WHEN g % 5 = 0 THEN 'Call before pickup, gate code ' || g END,
+       now() - g * interval '1 second', now()
+FROM generate_series(1, $2) AS g
+"""
+
+
+def peak_rss_mb() -> float:
+    # Kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_app(user_id: int) -> FastAPI:
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_admin] = lambda: Principal(id=user_id, username="bench-export", role=Role.ADMIN)
+    return app
+
+
+async def export(user_id: int, lead_id: int, mode: str) -> None:
+    app = make_app(user_id)
+    await Tortoise.init(config=TORTOISE_ORM)
+    if mode == "idle":
+        await Tortoise.close_connections()
+        print(f"{mode:12} {'':52} {peak_rss_mb():8.1f} MB peak RSS")
+        return
+
+    fmt, gzip = MODES[mode]
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": "/logistics/orders/export", "raw_path": b"/logistics/orders/export",
+        "query_string": f"format={fmt}&lead_id={lead_id}".encode(), "root_path": "",
+        "headers": [(b"host", b"bench"), (b"accept-encoding", b"gzip" if gzip else b"identity")],
+        "client": ("127.0.0.1", 0), "server": ("bench", 80),
+    }
+    decompressor = zlib.decompressobj(31) if gzip else None
+    size = lines = 0
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if requested:
+            # The client never disconnects.
+            await asyncio.Event().wait()
+        requested = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal size, lines
+        if message["type"] == "http.response.start" and message["status"] != 200:
+            raise RuntimeError(f"export answered {message['status']}")
+        if message["type"] == "http.response.body":
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            lines += (decompressor.decompress(chunk) if decompressor else chunk).count(b"\n")
+
+    try:
+        started = time.perf_counter()
+        await app(scope, receive, send)
+        elapsed = time.perf_counter() - started
+    finally:
+        await Tortoise.close_connections()
+    rows = lines - (fmt == "csv")
+    print(f"{mode:12} {rows:9} rows {rows / elapsed:10.0f} rows/s "
+          f"{size / 2 ** 20:8.1f} MB sent {peak_rss_mb():8.1f} MB peak RSS")
+
+
+def run_child(user_id: int, lead_id: int, mode: str) -> None:
+    subprocess.run(
+        [sys.executable, __file__, "--child", mode, "--user", str(user_id), "--lead", str(lead_id)],
+        check=True,
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    await Tortoise.init(config=TORTOISE_ORM)
+    db = connections.get("default")
+    _, rows = await db.execute_query(
+        """INSERT INTO "users" ("username", "password", "role") VALUES ('bench-export', '!', 'admin') RETURNING "id" """
+    )
+    user_id = rows[0]["id"]
+    try:
+        _, rows = await db.execute_query(
+            """
+            INSERT INTO "leads" (
+                "name", "phone", "email", "origin_zip", "dest_zip", "vehicle_type", "operable",
+                "created_by_id", "created_at", "updated_at"
+            ) VALUES ('Bench export', '5550000000', 'export@example.com', '10001', '94105', 'sedan', true, $1, now(), now())
+            RETURNING "id"
+            """,
+            [user_id],
+        )
+        lead_id = rows[0]["id"]
+        started = time.perf_counter()
+        await db.execute_query(SEED_SQL, [lead_id, args.rows])
+        await db.execute_script('ANALYZE "orders"')
+        print(f"Seeded {args.rows} orders in {time.perf_counter() - started:.1f}s")
+
+        for mode in ["idle", *MODES]:
+            await asyncio.to_thread(run_child, user_id, lead_id, mode)
+    finally:
+        if not args.keep:
+            # Orders go with the lead (ON DELETE CASCADE).
+            await db.execute_query('DELETE FROM "leads" WHERE "created_by_id" = $1', [user_id])
+            await db.execute_query('DELETE FROM "users" WHERE "id" = $1', [user_id])
+        await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--keep", action="store_true", help="Leave the seeded rows in place")
+    parser.add_argument("--child", choices=["idle", *MODES], help=argparse.SUPPRESS)
+    parser.add_argument("--user", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--lead", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        asyncio.run(export(args.user, args.lead, args.child))
+    else:
+        asyncio.run(main(args))
@@ -0,0 +1,99 @@
+"""
+Offset versus keyset pagination of a large lead listing.
+
+    PYTHONPATH=. python scripts/bench_keyset.py [--rows N] [--page P] [--keep]
+
+Needs the Postgres from ``.env`` with migrations applied. Seeds ``--rows``
+leads for a throwaway user, then times page 1 and page ``--page`` of
+``LeadService.list`` (offset) and ``LeadService.list_page`` (cursor) and
+prints ``EXPLAIN ANALYZE`` for the deep page in both modes. The user and
+its leads are deleted afterwards unless ``--keep`` is given.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from tortoise import Tortoise, connections
+
+from app.database import TORTOISE_ORM
+from app.logistics.models import Lead
+from app.logistics.services import LeadService
+from app.utils.export import queryset_sql
+from app.utils.pagination import encode_cursor, keyset_queryset
+
+LIMIT = 20
+
+SEED_SQL = """
+INSERT INTO "leads" (
+    "name", "phone", "email", "origin_zip", "dest_zip", "vehicle_type", "operable",
+    "created_by_id", "created_at", "updated_at"
+)
+SELECT 'Lead ' || g, '5550000000', 'lead' || g || '@example.com',
+       lpad((g % 99999)::text, 5, '0'), lpad(((g * 7) % 99999)::text, 5, '0'),
+       (ARRAY['sedan', 'suv', 'truck'])[1 + g % 3], g % 2 = 0,
+       $1, now() - g * interval '1 second', now()
+FROM generate_series(1, $2) AS g
+"""
+
+
+async def timed(func, repeat: int = 5) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await func()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+async def explain(qs) -> str:
+    sql, params = queryset_sql(qs)
+    _, rows = await connections.get("default").execute_query("EXPLAIN (ANALYZE, BUFFERS) " + sql, params)
+    return "\n".join(row["QUERY PLAN"] for row in rows)
+
+
+async def main(args: argparse.Namespace) -> None:
+    await Tortoise.init(config=TORTOISE_ORM)
+    db = connections.get("default")
+    _, rows = await db.execute_query(
+        """INSERT INTO "users" ("username", "password", "role") VALUES ('bench-keyset', '!', 'agent') RETURNING "id" """
+    )
+    user_id = rows[0]["id"]
+    try:
+        started = time.perf_counter()
+        await db.execute_query(SEED_SQL, [user_id, args.rows])
+        await db.execute_script('ANALYZE "leads"')
+        print(f"Seeded {args.rows} leads in {time.perf_counter() - started:.1f}s")
+
+        offset = (args.page - 1) * LIMIT
+        qs = Lead.filter(created_by_id=user_id)
+        # The cursor a client would hold after reading the pages before.
+        last = await qs.order_by("-created_at", "-id").offset(offset - 1).first()
+        cursor = encode_cursor(last.created_at, last.id)
+
+        results = {
+            "offset page 1": await timed(lambda: LeadService.list(user_id, limit=LIMIT)),
+            f"offset page {args.page}": await timed(lambda: LeadService.list(user_id, limit=LIMIT, offset=offset)),
+            "cursor page 1": await timed(lambda: LeadService.list_page(user_id, limit=LIMIT)),
+            f"cursor page {args.page}": await timed(lambda: LeadService.list_page(user_id, limit=LIMIT, cursor=cursor)),
+        }
+        for name, ms in results.items():
+            print(f"{name:22} {ms:9.2f} ms")
+
+        print(f"\nOFFSET, page {args.page}:")
+        print(await explain(qs.order_by("-created_at", "-id").offset(offset).limit(LIMIT)))
+        print(f"\nKeyset, page {args.page}:")
+        print(await explain(keyset_queryset(qs, cursor, LIMIT)))
+    finally:
+        if not args.keep:
+            await db.execute_query('DELETE FROM "leads" WHERE "created_by_id" = $1', [user_id])
+            await db.execute_query('DELETE FROM "users" WHERE "id" = $1', [user_id])
+        await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=3_000_000)
+    parser.add_argument("--page", type=int, default=10_000)
+    parser.add_argument("--keep", action="store_true", help="Leave the seeded rows in place")
+    asyncio.run(main(parser.parse_args()))
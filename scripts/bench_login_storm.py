@@ -0,0 +1,74 @@
+"""
+Login throughput and latency of other requests during a login storm.
+
+    PYTHONPATH=. python scripts/bench_login_storm.py [--logins N] [--concurrency C]
+
+Runs ``--logins`` Argon2 verifications ``--concurrency`` at a time, first
+inline on the event loop (as login did before) and then through
+``password_hasher``. Meanwhile a probe task stands in for non-auth
+requests: it sleeps 1 ms in a loop and records how late it wakes up.
+No database is involved; only the password check is measured.
+"""
+import argparse
+import asyncio
+import math
+import statistics
+import time
+
+from app.auth import password_hasher, pwd_context, verify_and_update_password
+
+
+async def probe(stop: asyncio.Event, delays: list[float]) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.001)
+        delays.append(time.perf_counter() - started - 0.001)
+
+
+async def storm(verify, hashed: str, logins: int, concurrency: int) -> tuple[float, list[float]]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login():
+        async with semaphore:
+            await verify("correct horse", hashed)
+
+    stop, delays = asyncio.Event(), []
+    prober = asyncio.create_task(probe(stop, delays))
+    await asyncio.sleep(0.05)
+    delays.clear()
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await prober
+    return elapsed, delays
+
+
+async def inline_verify(password: str, hashed: str):
+    return pwd_context.verify_and_update(password, hashed)
+
+
+def report(name: str, logins: int, elapsed: float, delays: list[float]) -> None:
+    delays = sorted(delays)
+    p50 = statistics.median(delays) * 1000
+    p99 = delays[math.ceil(len(delays) * 0.99) - 1] * 1000
+    print(
+        f"{name:8} {logins / elapsed:6.1f} logins/s  probe wakeups {len(delays):6}  "
+        f"p50 {p50:8.2f} ms  p99 {p99:8.2f} ms  max {delays[-1] * 1000:8.2f} ms"
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    hashed = pwd_context.hash("correct horse")
+    for name, verify in (("inline", inline_verify), ("pool", verify_and_update_password)):
+        elapsed, delays = await storm(verify, hashed, args.logins, args.concurrency)
+        report(name, args.logins, elapsed, delays)
+    password_hasher.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--logins", type=int, default=50)
+    # Stays within the hasher's queue limit so no login is rejected.
+    parser.add_argument("--concurrency", type=int, default=16)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,178 @@
+"""
+Redis commands per request of the rate limiter, before and after GCRA.
+
+    PYTHONPATH=. python scripts/bench_rate_limit.py [--seconds S] [--rates R ...]
+
+Needs the Redis from ``.env``. "before" is the fixed-window middleware this
+tree used to have: one EVAL carrying the script source per authenticated
+request. "after" is ``RateLimitMiddleware`` with the default policies:
+EVALSHA, local leases and cached denials. For each of the user, calc and
+login policies, requests are sent at each rate for ``--seconds`` through
+httpx's ASGI transport, and every command the Redis client sends is
+counted. Each run uses its own user id and client address, so runs start
+with an empty bucket; the keys expire on their own.
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from collections import Counter
+
+import httpx
+import redis.asyncio as redis
+from fastapi import FastAPI
+from starlette.datastructures import MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.auth import Principal
+from app.config import settings
+from app.middleware import throttling
+from app.user.models import Role
+
+# policy: (method, path, authenticated)
+TARGETS = {
+    "user": ("GET", "/logistics/leads", True),
+    "calc": ("POST", "/logistics/calc", True),
+    "login": ("POST", "/user/login", False),
+}
+
+
+class CountingRedis(redis.Redis):
+    """
+    Redis client that counts the commands it sends, by name.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.commands = Counter()
+
+    async def execute_command(self, *args, **options):
+        self.commands[str(args[0]).split()[0].upper()] += 1
+        return await super().execute_command(*args, **options)
+
+
+class FixedWindowRateLimit:
+    """
+    The rate limiter before GCRA: 100 requests per fixed 600 s window for
+    authenticated users, counted by a script sent with EVAL every time.
+    """
+    RATE_LIMIT = 100
+    WINDOW_SECONDS = 600
+    SCRIPT = """
+        local key = KEYS[1]
+        local now = tonumber(ARGV[1])
+        local window = tonumber(ARGV[2])
+        local limit = tonumber(ARGV[3])
+
+        local count = redis.call('INCR', key)
+        if count == 1 then
+            redis.call('EXPIRE', key, window)
+        end
+        if count > limit then
+            local ttl = redis.call('TTL', key)
+            return {count, ttl}
+        end
+        return {count, -1}
+        """
+
+    def __init__(self, app: ASGIApp, client: redis.Redis):
+        self.app = app
+        self.client = client
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        user = scope.get("user") if scope["type"] == "http" else None
+        if not user:
+            return await self.app(scope, receive, send)
+
+        now = int(time.time())
+        count, ttl = await self.client.eval(
+            self.SCRIPT, 1, f"rate_limit:user:{user.id}", now, self.WINDOW_SECONDS, self.RATE_LIMIT,
+        )
+        if ttl > 0:
+            response = JSONResponse(status_code=429, content={}, headers={"Retry-After": str(ttl)})
+            return await response(scope, receive, send)
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["X-RateLimit-Remaining"] = str(self.RATE_LIMIT - count)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+class SetUser:
+    """
+    Stands in for the auth stage: attaches ``user`` to every request.
+    """
+
+    def __init__(self, app: ASGIApp, user: Principal | None):
+        self.app = app
+        self.user = user
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        scope["user"] = self.user
+        await self.app(scope, receive, send)
+
+
+def make_app(limiter: str, client: redis.Redis, user: Principal | None) -> ASGIApp:
+    app = FastAPI()
+
+    @app.get("/logistics/leads")
+    @app.post("/logistics/calc")
+    @app.post("/user/login")
+    async def noop():
+        return {}
+
+    if limiter == "before":
+        limited = FixedWindowRateLimit(app, client)
+    else:
+        limited = throttling.RateLimitMiddleware(app)
+    return SetUser(limited, user)
+
+
+async def run(limiter: str, client: CountingRedis, target: str, rate: float, seconds: float) -> dict:
+    method, path, authenticated = TARGETS[target]
+    # A fresh identity per run, so each one starts with an empty bucket.
+    user = Principal(id=uuid.uuid4().int % 10 ** 9, username="bench", role=Role.AGENT) if authenticated else None
+    transport = httpx.ASGITransport(app=make_app(limiter, client, user), client=(f"bench-{uuid.uuid4().hex}", 40000))
+
+    client.commands.clear()
+    statuses = Counter()
+    interval = 1 / rate
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        started = time.monotonic()
+        sent = 0
+        while (due := started + sent * interval) < started + seconds:
+            await asyncio.sleep(max(due - time.monotonic(), 0))
+            statuses[(await http.request(method, path)).status_code] += 1
+            sent += 1
+    return {"requests": sent, "allowed": statuses[200], "denied": statuses[429], "commands": dict(client.commands)}
+
+
+async def main(args: argparse.Namespace) -> None:
+    client = CountingRedis.from_url(settings.redis_url.unicode_string(), decode_responses=True)
+
+    async def get_redis():
+        return client
+
+    throttling.get_redis = get_redis
+    print(f"{'':6} {'policy':6} {'req/s':>6} {'requests':>8} {'allowed':>8} {'denied':>7} {'cmd/req':>8}  commands")
+    try:
+        for target in TARGETS:
+            for rate in args.rates:
+                for limiter in ("before", "after"):
+                    result = await run(limiter, client, target, rate, args.seconds)
+                    total = sum(result["commands"].values())
+                    print(f"{limiter:6} {target:6} {rate:6g} {result['requests']:8} {result['allowed']:8} "
+                          f"{result['denied']:7} {total / result['requests']:8.2f}  {result['commands']}")
+    finally:
+        await client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5.0, help="How long to send at each rate")
+    parser.add_argument("--rates", type=float, nargs="+", default=[1, 10, 50], help="Requests per second")
+    asyncio.run(main(parser.parse_args()))
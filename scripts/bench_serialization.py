@@ -0,0 +1,68 @@
+"""
+Serialization of 100 ``OrderOut`` rows.
+
+    PYTHONPATH=. python scripts/bench_serialization.py [--number N]
+
+Compares the old path (``jsonable_encoder`` + stdlib ``json``, as the
+response classes did) with ``FastJSONResponse``, both for a plain return
+value and for a ``response_model`` route, where FastAPI first dumps the
+models to JSON-compatible Python and hands that to the response class.
+"""
+import argparse
+import json
+import timeit
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.logistics.schemas import OrderOut
+from app.response import FastJSONResponse, ListResponse
+
+ROWS = TypeAdapter(List[OrderOut])
+
+
+def sample_rows(size: int = 100) -> list[OrderOut]:
+    now = datetime.now(timezone.utc)
+    return [
+        OrderOut(
+            id=i, lead_id=i // 3, status="quoted", base_price=Decimal("1250.00") + i,
+            final_price=Decimal("1399.99") + i, notes=f"Order {i}",
+            created_at=now - timedelta(minutes=i), updated_at=now,
+        )
+        for i in range(size)
+    ]
+
+
+def json_render(content) -> bytes:
+    # What starlette's JSONResponse.render does.
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def old_render(content) -> bytes:
+    return json_render(jsonable_encoder(content))
+
+
+def main(args: argparse.Namespace) -> None:
+    rows = sample_rows()
+    cases = {
+        "plain: jsonable_encoder + json": lambda: old_render(rows),
+        "plain: FastJSONResponse": lambda: FastJSONResponse(rows).body,
+        "wrapped: old ListResponse": lambda: old_render({"status_code": 200, "data": rows}),
+        "wrapped: ListResponse": lambda: ListResponse(rows).body,
+        "response_model: JSONResponse": lambda: json_render(ROWS.dump_python(rows, mode="json")),
+        "response_model: FastJSONResponse": lambda: FastJSONResponse(ROWS.dump_python(rows, mode="json")).body,
+        # FastAPI's own path when the response class is left at its default.
+        "response_model: dump_json": lambda: ROWS.dump_json(rows),
+    }
+    for name, case in cases.items():
+        per_call = min(timeit.repeat(case, number=args.number, repeat=5)) / args.number
+        print(f"{name:34} {per_call * 1e6:8.1f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=500)
+    main(parser.parse_args())
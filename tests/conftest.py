@@ -0,0 +1,136 @@
+import os
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Callable, Optional
+
+import pytest
+
+# Settings are read at import time; fall back to the sample environment.
+for line in (Path(__file__).parent.parent / ".env.dist").read_text().splitlines():
+    name, sep, value = line.partition("=")
+    if sep and not name.startswith("#"):
+        os.environ.setdefault(name.strip(), value.strip())
+
+
+class FakeDB:
+    """
+    Stands in for the Postgres connection: records every statement and
+    answers it with ``handler(sql, params)``, or ``(1, [])`` without one.
+    ``connection`` is what ``acquire_connection`` hands out.
+    """
+
+    def __init__(self):
+        self.queries: list[tuple[str, list]] = []
+        self.handler: Optional[Callable] = None
+        self.connection = None
+
+    async def execute_query(self, sql, params=None):
+        self.queries.append((sql, params))
+        return self.handler(sql, params) if self.handler else (1, [])
+
+    def calls(self, sql) -> list[list]:
+        return [params for query, params in self.queries if query == sql]
+
+    @asynccontextmanager
+    async def acquire_connection(self):
+        yield self.connection
+
+
+class FakeConnections:
+    def __init__(self, db: FakeDB):
+        self.db = db
+
+    def get(self, name):
+        return self.db
+
+
+class MemoryRedis:
+    """
+    Stands in for the Redis clients: keys, hashes and sets all live in
+    ``data``. ``scripts`` maps the source of each Lua script a test needs
+    to a function with the same effect; PUBLISH goes to ``hub``.
+    """
+
+    def __init__(self):
+        self.data: dict[str, object] = {}
+        self.acked: list[str] = []
+        self.scripts: dict[str, Callable] = {}
+        self.hub = None
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def mget(self, *keys):
+        return [self.data.get(key) for key in keys]
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def eval(self, script, numkeys, *args):
+        return self.scripts[script](self.data, args[:numkeys], args[numkeys:])
+
+    def pipeline(self, transaction=True):
+        return MemoryPipeline(self)
+
+
+class MemoryPipeline:
+    """
+    Queues commands and applies them in order on ``execute``.
+    """
+
+    def __init__(self, redis: MemoryRedis):
+        self.redis = redis
+        self.ops: list[Callable] = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def set(self, key, value, ex=None):
+        self.ops.append(lambda: self.redis.data.__setitem__(key, value))
+
+    def delete(self, key):
+        self.ops.append(lambda: self.redis.data.pop(key, None))
+
+    def hset(self, key, mapping):
+        self.ops.append(lambda: self.redis.data.setdefault(key, {}).update(mapping))
+
+    def hincrby(self, key, field, amount):
+        def incr():
+            entry = self.redis.data.setdefault(key, {})
+            entry[field] = int(entry.get(field, 0)) + amount
+        self.ops.append(incr)
+
+    def xack(self, stream, group, *ids):
+        self.ops.append(lambda: self.redis.acked.extend(ids))
+
+    def expire(self, *args):
+        pass
+
+    def publish(self, channel, message):
+        if self.redis.hub is not None:
+            self.ops.append(lambda: self.redis.hub.publish(channel))
+
+    async def execute(self):
+        for op in self.ops:
+            op()
+
+
+@pytest.fixture
+def fake_db() -> FakeDB:
+    return FakeDB()
+
+
+@pytest.fixture
+def fake_connections(fake_db) -> FakeConnections:
+    return FakeConnections(fake_db)
+
+
+@pytest.fixture
+def memory_redis() -> MemoryRedis:
+    return MemoryRedis()
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from app.utils import cache
+from app.utils.cache import GENERATION_PREFIX, INVALIDATE_SCRIPT, STORE_SCRIPT, TAG_PREFIX, LocalCache
+
+TAG = "leads:user:1"
+
+
+def invalidate(data: dict, keys, argv):
+    """
+    INVALIDATE_SCRIPT: drop each tag's keys and bump its generation.
+    """
+    n = len(keys) // 2
+    for tag, generation in zip(keys[:n], keys[n:]):
+        for key in data.pop(tag, set()):
+            data.pop(key, None)
+        data[generation] = data.get(generation, 0) + 1
+    return 0
+
+
+def store(data: dict, keys, argv):
+    """
+    STORE_SCRIPT: store and index the value unless a generation moved.
+    """
+    n = (len(keys) - 1) // 2
+    if [int(data.get(key, 0)) for key in keys[1 + n:]] != [int(value) for value in argv[2:]]:
+        return 0
+    data[keys[0]] = argv[1]
+    for tag in keys[1:1 + n]:
+        data.setdefault(tag, set()).add(keys[0])
+    return 1
+
+
+@pytest.fixture
+def redis(monkeypatch, memory_redis):
+    memory_redis.scripts.update({INVALIDATE_SCRIPT: invalidate, STORE_SCRIPT: store})
+
+    async def get_cache():
+        return memory_redis
+
+    monkeypatch.setattr(cache, "get_cache", get_cache)
+    monkeypatch.setattr(cache, "local_cache", LocalCache(16))
+    return memory_redis
+
+
+def test_stores_and_indexes_the_result(redis):
+    async def func():
+        return {"page": 1}
+
+    assert asyncio.run(cache._compute("key", 300, [TAG], func, (), {})) == b'{"page":1}'
+
+    assert redis.data[TAG_PREFIX + TAG] == {"key"}
+    assert redis.data["key"].endswith(b'{"page":1}')
+    assert cache.local_cache.get("key")[0] == b'{"page":1}'
+
+
+def test_invalidation_during_compute_is_not_undone(redis):
+    async def func():
+        # A write commits and invalidates while the page is being read.
+        await cache.invalidate_tags(TAG)
+        return {"page": "before the write"}
+
+    asyncio.run(cache._compute("key", 300, [TAG], func, (), {}))
+
+    assert "key" not in redis.data
+    assert cache.local_cache.get("key") is None
+    assert redis.data[GENERATION_PREFIX + TAG] == 1
+
+
+def test_local_set_skips_entries_read_before_an_invalidation():
+    local = LocalCache(16)
+    generations = local.generations([TAG])
+    local.invalidate([TAG])
+
+    local.set("key", (b"stale", 0.0, float("inf")), [TAG], generations)
+    assert local.get("key") is None
+
+    local.set("key", (b"fresh", 0.0, float("inf")), [TAG], local.generations([TAG]))
+    assert local.get("key")[0] == b"fresh"
+
+
+def test_pruning_generations_fails_older_snapshots():
+    local = LocalCache(1)
+    generations = local.generations([TAG])
+    local.invalidate([f"tag:{i}" for i in range(5)])
+
+    assert local.generations([TAG]) != generations
@@ -0,0 +1,142 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+
+from app.config import settings
+from app.middleware import idempotency
+from app.middleware.idempotency import PROCESSING, IdempotencyMiddleware, pack_response
+
+
+class MemoryHub:
+    """
+    Stands in for ``pubsub_hub``: PUBLISH wakes the channel's listeners.
+    """
+
+    def __init__(self):
+        self.waiters: dict[str, set[asyncio.Event]] = {}
+
+    @asynccontextmanager
+    async def listen(self, channel):
+        event = asyncio.Event()
+        self.waiters.setdefault(channel, set()).add(event)
+        try:
+            yield event
+        finally:
+            self.waiters[channel].discard(event)
+
+    def publish(self, channel):
+        for event in self.waiters.get(channel, ()):
+            event.set()
+
+
+@pytest.fixture
+def redis(monkeypatch, memory_redis):
+    memory_redis.hub = MemoryHub()
+
+    async def get_cache():
+        return memory_redis
+
+    monkeypatch.setattr(idempotency, "get_cache", get_cache)
+    monkeypatch.setattr(idempotency, "pubsub_hub", memory_redis.hub)
+    monkeypatch.setattr(settings, "IDEMPOTENCY_WAIT", 0.2)
+    return memory_redis
+
+
+def make_app(calls: list) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/orders")
+    async def create(request: Request):
+        calls.append(await request.body())
+        return {"id": len(calls)}
+
+    return app
+
+
+async def post(app, ip: str = "10.0.0.1", body: bytes = b"{}", key: str = "k1") -> httpx.Response:
+    transport = httpx.ASGITransport(app=IdempotencyMiddleware(app), client=(ip, 40000))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.post("/orders", content=body, headers={"Idempotency-Key": key})
+
+
+def test_duplicate_replays_a_response_stored_without_notification(redis):
+    calls = []
+    app = make_app(calls)
+
+    async def run():
+        first = await post(app)
+        [key] = redis.data
+        # The first request is still running when the duplicate arrives...
+        redis.data[key] = PROCESSING
+
+        async def finish_unannounced():
+            # ...and stores its response, but the notification is missed.
+            await asyncio.sleep(0.05)
+            redis.data[key] = pack_response(201, [(b"content-type", b"application/json")], b'{"id":1}')
+
+        finisher = asyncio.create_task(finish_unannounced())
+        duplicate = await post(app)
+        await finisher
+        return first, duplicate
+
+    first, duplicate = asyncio.run(run())
+
+    assert first.status_code == 200
+    assert duplicate.status_code == 201
+    assert duplicate.headers["idempotent-replayed"] == "true"
+    assert duplicate.json() == {"id": 1}
+    assert len(calls) == 1
+
+
+def test_duplicate_still_held_at_the_deadline_gets_409(redis):
+    calls = []
+    app = make_app(calls)
+
+    async def run():
+        await post(app)
+        [key] = redis.data
+        redis.data[key] = PROCESSING
+        return await post(app)
+
+    duplicate = asyncio.run(run())
+
+    assert duplicate.status_code == 409
+    assert duplicate.headers["retry-after"] == "1"
+    assert len(calls) == 1
+
+
+def test_anonymous_key_is_not_shared_across_clients(redis):
+    calls = []
+    app = make_app(calls)
+
+    async def run():
+        return await post(app, ip="10.0.0.1"), await post(app, ip="10.0.0.2")
+
+    first, other = asyncio.run(run())
+
+    assert first.json() == {"id": 1}
+    assert other.json() == {"id": 2}
+    assert "idempotent-replayed" not in other.headers
+
+
+def test_anonymous_key_is_scoped_to_the_body(redis):
+    calls = []
+    app = make_app(calls)
+
+    async def run():
+        return (
+            await post(app, body=b'{"password": "a"}'),
+            await post(app, body=b'{"password": "b"}'),
+            await post(app, body=b'{"password": "a"}'),
+        )
+
+    first, other, retry = asyncio.run(run())
+
+    assert [first.json(), other.json()] == [{"id": 1}, {"id": 2}]
+    assert retry.json() == {"id": 1}
+    assert retry.headers["idempotent-replayed"] == "true"
+    # The body read for the key still reaches the endpoint.
+    assert calls == [b'{"password": "a"}', b'{"password": "b"}']
@@ -0,0 +1,90 @@
+import asyncio
+
+import orjson
+import pytest
+from asyncpg.exceptions import ForeignKeyViolationError
+
+from app.logistics import imports
+from app.logistics.imports import LEAD_COPY_COLUMNS, RowValidator, import_leads
+
+
+class FakeConnection:
+    """
+    Stands in for the asyncpg connection: a COPY holding any refused row
+    fails as a whole, like in Postgres; otherwise its rows are kept.
+    """
+
+    def __init__(self, refused: set[str]):
+        self.refused = refused
+        self.copies = 0
+        self.rows: list[dict] = []
+
+    async def copy_records_to_table(self, table, records, columns):
+        self.copies += 1
+        rows = [dict(zip(columns, record)) for record in records]
+        if any(row["name"] in self.refused for row in rows):
+            raise ForeignKeyViolationError('insert or update on table "leads" violates foreign key constraint')
+        self.rows += rows
+
+
+def lead(name: str, **fields) -> dict:
+    return {
+        "name": name, "phone": "5550100", "email": f"{name}@example.com",
+        "origin_zip": "10001", "dest_zip": "94105", "vehicle_type": "sedan", "operable": True,
+        **fields,
+    }
+
+
+def ndjson(rows: list[dict]) -> bytes:
+    return b"".join(orjson.dumps(row) + b"\n" for row in rows)
+
+
+def run_import(conn: FakeConnection, body: bytes, chunk_rows: int):
+    async def chunks():
+        yield body
+
+    return asyncio.run(import_leads(chunks(), "ndjson", user_id=7, chunk_rows=chunk_rows))
+
+
+@pytest.fixture(autouse=True)
+def in_thread(monkeypatch):
+    monkeypatch.setattr(imports, "row_validator", RowValidator(0))
+
+
+@pytest.fixture
+def copy_into(monkeypatch, fake_db, fake_connections):
+    def connect(refused: set[str]) -> FakeConnection:
+        fake_db.connection = FakeConnection(refused)
+        monkeypatch.setattr(imports, "connections", fake_connections)
+        return fake_db.connection
+
+    return connect
+
+
+def test_copies_every_valid_row(copy_into):
+    conn = copy_into(refused=set())
+
+    result = run_import(conn, ndjson([lead(f"lead{i}") for i in range(10)]), chunk_rows=4)
+
+    assert (result.imported, result.failed) == (10, 0)
+    assert conn.copies == 3
+    assert [row["name"] for row in conn.rows] == [f"lead{i}" for i in range(10)]
+    assert {row["created_by_id"] for row in conn.rows} == {7}
+    assert set(conn.rows[0]) == set(LEAD_COPY_COLUMNS)
+
+
+def test_only_rows_the_database_refuses_are_skipped(copy_into):
+    conn = copy_into(refused={"lead3", "lead12"})
+    rows = [lead(f"lead{i}") for i in range(1, 17)]
+    rows[4] = lead("lead5", email="not-an-email")
+
+    result = run_import(conn, ndjson(rows), chunk_rows=8)
+
+    assert (result.imported, result.failed) == (13, 3)
+    assert sorted(row["name"] for row in conn.rows) == sorted(
+        f"lead{i}" for i in range(1, 17) if i not in {3, 5, 12}
+    )
+    assert [error.row for error in result.errors] == [3, 5, 12]
+    assert result.errors[0].errors[0]["type"] == "database"
+    assert "foreign key" in result.errors[0].errors[0]["msg"]
+    assert result.errors[1].errors[0]["loc"] == ("email",)
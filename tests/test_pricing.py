@@ -0,0 +1,43 @@
+from decimal import Decimal
+
+import orjson
+import pytest
+
+from app.logistics import pricing
+from app.logistics.schemas import QuoteCalcRequest
+from app.logistics.services import OrderService
+
+ROW = {"base_price": "100.00", "distance_km": 10, "vehicle_type": "sedan", "operable": True}
+
+
+@pytest.fixture(autouse=True)
+def rules(monkeypatch):
+    rules = pricing.compile_rules({**pricing.DEFAULT_RULES, "season_bonus": {"normal": "50", "winter": "300"}})
+    monkeypatch.setattr(pricing, "_active", rules)
+    return rules
+
+
+def batch_prices(columns: dict[str, list]) -> list[str]:
+    body = b"".join(OrderService.calculate_price_batch(columns))
+    return [orjson.loads(line)["final_price"] for line in body.splitlines()]
+
+
+def test_ndjson_row_without_season_is_priced_like_calc(rules):
+    body = orjson.dumps(ROW) + b"\n" + orjson.dumps({**ROW, "season": "winter"}) + b"\n"
+
+    columns = pricing.parse_batch(body, ndjson=True)
+
+    assert columns["season"] == ["normal", "winter"]
+    expected = [
+        OrderService.calculate_price(QuoteCalcRequest(**ROW), rules).final_price,
+        OrderService.calculate_price(QuoteCalcRequest(**ROW, season="winter"), rules).final_price,
+    ]
+    assert [Decimal(price) for price in batch_prices(columns)] == expected
+    assert expected[0] == Decimal("65.00")
+
+
+def test_columns_without_season_match_ndjson():
+    columnar = pricing.parse_batch(orjson.dumps({name: [value] for name, value in ROW.items()}), ndjson=False)
+    rows = pricing.parse_batch(orjson.dumps(ROW), ndjson=True)
+
+    assert columnar == rows
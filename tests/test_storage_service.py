@@ -0,0 +1,32 @@
+import pytest
+from minio import Minio
+from minio.helpers import get_part_info
+
+from app.config import settings
+from app.service.storage_service import S3_MIN_PART_SIZE, S3Storage
+
+MB = 1024 * 1024
+
+
+def storage(part_size: int) -> S3Storage:
+    # The client connects lazily; nothing is sent here.
+    return S3Storage(Minio("localhost:9000"), "attachments", part_size=part_size)
+
+
+@pytest.mark.parametrize("max_size, part_size, expected", [
+    (5 * MB, 16 * MB, 5 * MB),
+    (5 * MB, 1 * MB, S3_MIN_PART_SIZE),
+    (64 * MB, 16 * MB, 16 * MB),
+    (20 * MB, 64 * MB, 20 * MB),
+])
+def test_part_size_is_kept_between_s3_minimum_and_max_attachment(monkeypatch, max_size, part_size, expected):
+    monkeypatch.setattr(settings, "ATTACHMENT_MAX_SIZE", max_size)
+    assert storage(part_size).part_size == expected
+
+
+def test_multipart_starts_above_five_mib(monkeypatch):
+    monkeypatch.setattr(settings, "ATTACHMENT_MAX_SIZE", 64 * MB)
+    part_size = storage(settings.STORAGE_PART_SIZE).part_size
+
+    assert get_part_info(5 * MB, part_size)[1] == 1
+    assert get_part_info(64 * MB, part_size)[1] > 1
@@ -0,0 +1,29 @@
+import asyncio
+import json
+
+from app.logistics import tasks
+from app.logistics.tasks import TASK_KEY_PREFIX, RepriceWorker
+
+QUOTE = {"base_price": "100", "distance_km": 50, "vehicle_type": "sedan", "operable": True}
+
+
+def test_failed_batch_is_marked_retrying_and_left_pending(monkeypatch, fake_db, fake_connections, memory_redis):
+    def fail(sql, params):
+        raise ConnectionError("connection reset")
+
+    fake_db.handler = fail
+    monkeypatch.setattr(tasks, "connections", fake_connections)
+    worker = RepriceWorker("test", concurrency=1)
+    entries = [("1-0", {"task_id": "t1", "order_id": "5", "data": json.dumps(QUOTE)})]
+
+    async def run():
+        await worker._slots.acquire()
+        await worker._process(memory_redis, entries)
+
+    asyncio.run(run())
+
+    task = memory_redis.data[TASK_KEY_PREFIX + "t1"]
+    assert task["state"] == "retrying"
+    assert "connection reset" in task["error"]
+    assert task["attempts"] == 1
+    assert memory_redis.acked == []
@@ -0,0 +1,180 @@
+import asyncio
+
+import httpx
+import orjson
+import pytest
+
+from app.config import settings
+from app.service import webhook_service
+from app.service.webhook_service import CLAIM_SQL, DELIVERED_SQL, FAILED_SQL, RETRY_SQL, WebhookDispatcher
+
+ENDPOINT = "https://hooks.example.com/orders"
+
+
+@pytest.fixture
+def db(monkeypatch, fake_db, fake_connections):
+    monkeypatch.setattr(webhook_service, "connections", fake_connections)
+    return fake_db
+
+
+@pytest.fixture
+def pending(db) -> list[dict]:
+    """
+    Rows CLAIM_SQL hands out, a batch at a time; other statements succeed.
+    """
+    rows = []
+
+    def claim(sql, params):
+        if sql != CLAIM_SQL:
+            return 1, []
+        batch = rows[:params[0]]
+        del rows[:params[0]]
+        return len(batch), batch
+
+    db.handler = claim
+    return rows
+
+
+def row(id: int, attempts: int = 1) -> dict:
+    return {"id": id, "endpoint": ENDPOINT, "payload": '{"order_id": %d}' % id, "attempts": attempts}
+
+
+def dispatcher(handler, **kwargs) -> WebhookDispatcher:
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return WebhookDispatcher(client=client, **kwargs)
+
+
+def test_delivers_and_marks_each_row(db, pending):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(204)
+
+    pending.extend([row(1), row(2)])
+    sent = dispatcher(handler)
+    assert asyncio.run(sent.dispatch_once()) == 2
+
+    assert sorted(params[0] for params in db.calls(DELIVERED_SQL)) == [1, 2]
+    assert db.calls(RETRY_SQL) == db.calls(FAILED_SQL) == []
+    assert sorted(orjson.loads(r.content)["order_id"] for r in requests) == [1, 2]
+    assert {r.headers["Idempotency-Key"] for r in requests} == {"webhook-1", "webhook-2"}
+    assert sent.delivered == 2
+
+
+def test_retries_with_backoff(db, pending):
+    pending.append(row(1, attempts=3))
+    sent = dispatcher(lambda request: httpx.Response(503))
+    asyncio.run(sent.dispatch_once())
+
+    [(id, delay, error, refund)] = db.calls(RETRY_SQL)
+    assert (id, error, refund) == (1, "HTTP 503", 0)
+    assert 0 <= delay <= settings.WEBHOOK_BACKOFF_BASE * 2 ** 2
+    assert db.calls(DELIVERED_SQL) == db.calls(FAILED_SQL) == []
+    assert sent.retried == 1
+
+
+def test_retry_after_sets_the_minimum_delay(db, pending):
+    pending.append(row(1))
+    sent = dispatcher(lambda request: httpx.Response(429, headers={"Retry-After": "120"}))
+    asyncio.run(sent.dispatch_once())
+
+    [(_, delay, error, _)] = db.calls(RETRY_SQL)
+    assert delay >= 120 and error == "HTTP 429"
+
+
+def test_network_error_is_retried(db, pending):
+    def handler(request):
+        raise httpx.ConnectError("connection refused", request=request)
+
+    pending.append(row(1))
+    asyncio.run(dispatcher(handler).dispatch_once())
+
+    [(_, _, error, refund)] = db.calls(RETRY_SQL)
+    assert error.startswith("ConnectError") and refund == 0
+
+
+def test_gives_up_after_max_attempts(db, pending):
+    pending.append(row(1, attempts=4))
+    sent = dispatcher(lambda request: httpx.Response(500), max_attempts=4)
+    asyncio.run(sent.dispatch_once())
+
+    assert db.calls(FAILED_SQL) == [[1, "HTTP 500"]]
+    assert db.calls(RETRY_SQL) == []
+
+
+def test_permanent_client_error_fails_at_once(db, pending):
+    pending.append(row(1))
+    sent = dispatcher(lambda request: httpx.Response(404))
+    asyncio.run(sent.dispatch_once())
+
+    assert db.calls(FAILED_SQL) == [[1, "HTTP 404"]]
+    assert db.calls(RETRY_SQL) == []
+    # The receiver answered, so the endpoint is not held against it.
+    assert sent.stats()["breakers"] == {"https://hooks.example.com": "closed"}
+
+
+def test_breaker_opens_and_holds_rows_back(db, pending, monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_BREAKER_THRESHOLD", 2)
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(502)
+
+    sent = dispatcher(handler)
+
+    async def run():
+        for id in range(1, 4):
+            pending.append(row(id))
+            await sent.dispatch_once()
+
+    asyncio.run(run())
+
+    assert len(requests) == 2
+    assert sent.stats()["breakers"] == {"https://hooks.example.com": "open"}
+    # Held back without a request, and the claimed attempt is handed back.
+    [id, delay, error, refund] = db.calls(RETRY_SQL)[-1]
+    assert (id, error, refund) == (3, "circuit open", 1)
+    assert delay >= 1
+
+
+def test_rows_past_the_lease_are_handed_back_unsent(db, pending, monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_LEASE_SECONDS", settings.WEBHOOK_TIMEOUT)
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200)
+
+    pending.append(row(1))
+    asyncio.run(dispatcher(handler).dispatch_once())
+
+    assert requests == []
+    assert db.calls(RETRY_SQL) == [[1, 0, "lease ran out before sending", 1]]
+    assert db.calls(DELIVERED_SQL) == []
+
+
+@pytest.mark.parametrize("fields, error", [
+    ({"endpoint": "https://hooks.example.com:port/orders"}, "InvalidURL"),
+    ({"payload": {"order_id": object()}}, "TypeError"),
+])
+def test_unexpected_error_still_counts_the_attempt(db, pending, fields, error):
+    requests = []
+    pending.append({**row(1), **fields})
+    sent = dispatcher(lambda request: requests.append(request) or httpx.Response(204))
+    asyncio.run(sent.dispatch_once())
+
+    [(id, _, message, refund)] = db.calls(RETRY_SQL)
+    assert (id, refund) == (1, 0)
+    assert message.startswith(error)
+    assert requests == [] and sent.retried == 1
+
+
+def test_unexpected_error_on_the_last_attempt_fails_the_row(db, pending):
+    pending.append({**row(1, attempts=4), "endpoint": "https://[::1/orders"})
+    asyncio.run(dispatcher(lambda request: httpx.Response(204), max_attempts=4).dispatch_once())
+
+    [[id, error]] = db.calls(FAILED_SQL)
+    assert id == 1 and error.startswith("InvalidURL")
+    assert db.calls(RETRY_SQL) == []
@@ -0,0 +1,204 @@
+import asyncio
+import re
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from tortoise import Tortoise
+
+from app.auth import Principal, get_admin
+from app.config import settings
+from app.database import TORTOISE_ORM
+from app.logistics import services
+from app.logistics.routes import router
+from app.user.models import Role
+from app.utils import writes
+
+ADMIN = Principal(id=7, username="admin", role=Role.ADMIN)
+
+
+class Tables:
+    """
+    Answers the single-row UPDATE, DELETE and ORDER_UPDATE_SQL statements
+    from in-memory tables; the fake connection records each statement, so
+    each test can count round trips.
+    """
+
+    def __init__(self):
+        self.rows: dict[str, dict[int, dict]] = {"leads": {}, "orders": {}}
+        self.outbox: list[dict] = []
+
+    def __call__(self, sql, params):
+        if match := re.search(r'UPDATE "(\w+)" SET (.*?) WHERE', sql):
+            row = self.rows[match[1]].get(params[0])
+            if row is None:
+                return 0, []
+            if allowed := re.search(r'AND "status" = ANY\(\$(\d+)::varchar\[\]\) RETURNING', sql):
+                if row["status"] not in params[int(allowed[1]) - 1]:
+                    return 0, [{**dict.fromkeys(row), "previous_status": row["status"]}]
+            previous_status = row.get("status")
+            for column, index in re.findall(r'"(\w+)" = \$(\d+)', match[2]):
+                row[column] = params[int(index) - 1]
+            row["updated_at"] = datetime.now(timezone.utc)
+            if "webhook_outbox" in sql:
+                endpoint = params[int(re.search(r"SELECT \$(\d+)::varchar", sql)[1]) - 1]
+                statuses = params[int(re.search(r'FROM updated\s+WHERE "status" = ANY\(\$(\d+)', sql)[1]) - 1]
+                if row["status"] in statuses:
+                    self.outbox.append({"endpoint": endpoint, "order_id": row["id"], "final_price": row["final_price"]})
+                return 1, [{**row, "previous_status": previous_status}]
+            return 1, [dict(row)]
+        if match := re.search(r'DELETE FROM "(\w+)" WHERE "id" = \$1 RETURNING (.*)', sql):
+            row = self.rows[match[1]].pop(params[0], None)
+            if row is None:
+                return 0, []
+            return 1, [{column: row[column] for column in re.findall(r'"(\w+)"', match[2])}]
+        raise AssertionError(f"unexpected statement: {sql}")
+
+
+@pytest.fixture(scope="module", autouse=True)
+def models():
+    # Builds the model metadata; no connection is opened.
+    asyncio.run(Tortoise.init(config=TORTOISE_ORM))
+    yield
+    asyncio.run(Tortoise.close_connections())
+
+
+@pytest.fixture
+def tables() -> Tables:
+    tables = Tables()
+    now = datetime.now(timezone.utc)
+    tables.rows["leads"][1] = {
+        "id": 1, "name": "Ann", "phone": "5550100", "email": "ann@example.com",
+        "origin_zip": "10001", "dest_zip": "94105", "vehicle_type": "sedan", "operable": True,
+        "created_by_id": ADMIN.id, "attachment": None, "created_at": now, "updated_at": now,
+    }
+    tables.rows["orders"][1] = {
+        "id": 1, "lead_id": 1, "status": "draft", "base_price": None, "final_price": None,
+        "notes": None, "created_at": now, "updated_at": now,
+    }
+    return tables
+
+
+@pytest.fixture
+def db(monkeypatch, fake_db, fake_connections, tables):
+    fake_db.handler = tables
+    monkeypatch.setattr(writes, "connections", fake_connections)
+    return fake_db
+
+
+@pytest.fixture
+def invalidated(monkeypatch):
+    tags = []
+
+    async def invalidate_tags(*names):
+        tags.extend(names)
+
+    monkeypatch.setattr(services, "invalidate_tags", invalidate_tags)
+    return tags
+
+
+def call(method: str, url: str, **kwargs) -> httpx.Response:
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_admin] = lambda: ADMIN
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.request(method, url, **kwargs)
+
+    return asyncio.run(run())
+
+
+def test_patch_lead_is_one_statement(db, invalidated):
+    response = call("PATCH", "/logistics/leads/1", json={"name": "Bob"})
+
+    assert response.status_code == 200
+    assert response.json()["name"] == "Bob"
+    [(sql, params)] = db.queries
+    assert sql.startswith('UPDATE "leads" SET "name" = $2, "updated_at" = CURRENT_TIMESTAMP')
+    assert params == [1, "Bob"]
+    assert invalidated == [f"leads:user:{ADMIN.id}"]
+
+
+def test_delete_lead_is_one_statement(db, tables, invalidated):
+    response = call("DELETE", "/logistics/leads/1")
+
+    assert response.status_code == 204
+    assert len(db.queries) == 1
+    assert 1 not in tables.rows["leads"]
+    assert invalidated == [f"leads:user:{ADMIN.id}", "orders:lead:1", "orders:all"]
+
+
+def test_patch_order_is_one_statement(db, invalidated):
+    response = call("PATCH", "/logistics/orders/1", json={"notes": "call first"})
+
+    assert response.status_code == 200
+    assert response.json()["notes"] == "call first"
+    assert len(db.queries) == 1
+    assert invalidated == ["orders:lead:1", "orders:all"]
+
+
+def test_delete_order_is_one_statement(db, tables, invalidated):
+    response = call("DELETE", "/logistics/orders/1")
+
+    assert response.status_code == 204
+    assert len(db.queries) == 1
+    assert 1 not in tables.rows["orders"]
+    assert invalidated == ["orders:lead:1", "orders:all"]
+
+
+@pytest.mark.parametrize("method, url, body, detail", [
+    ("PATCH", "/logistics/leads/99", {"name": "Bob"}, "Lead not found"),
+    ("DELETE", "/logistics/leads/99", None, "Lead not found"),
+    ("PATCH", "/logistics/orders/99", {"notes": "x"}, "Order not found"),
+    ("DELETE", "/logistics/orders/99", None, "Order not found"),
+])
+def test_missing_row_is_404_after_one_statement(db, invalidated, method, url, body, detail):
+    response = call(method, url, json=body)
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == detail
+    assert len(db.queries) == 1
+    assert invalidated == []
+
+
+@pytest.mark.parametrize("current, status, webhook", [
+    ("draft", "draft", False),
+    ("quoted", "draft", False),
+    ("draft", "quoted", True),
+    ("quoted", "booked", True),
+    ("booked", "delivered", False),
+])
+def test_order_patch_writes_outbox_only_for_webhook_statuses(db, tables, invalidated, current, status, webhook):
+    tables.rows["orders"][1]["status"] = current
+
+    response = call("PATCH", "/logistics/orders/1", json={"status": status, "final_price": "120.50"})
+
+    assert response.status_code == 200
+    assert response.json()["status"] == status
+    [(sql, _)] = db.queries
+    assert "webhook_outbox" in sql
+    expected = [{"endpoint": settings.WEBHOOK_URL, "order_id": 1, "final_price": Decimal("120.50")}]
+    assert tables.outbox == (expected if webhook else [])
+
+
+@pytest.mark.parametrize("current, status", [
+    ("delivered", "draft"),
+    ("draft", "booked"),
+    ("booked", "quoted"),
+])
+def test_order_patch_refuses_disallowed_status_transition(db, tables, invalidated, current, status):
+    tables.rows["orders"][1]["status"] = current
+
+    response = call("PATCH", "/logistics/orders/1", json={"status": status, "notes": "x"})
+
+    assert response.status_code == 409
+    assert response.json()["detail"] == f"Order can't move from {current} to {status}"
+    assert len(db.queries) == 1
+    assert tables.rows["orders"][1]["status"] == current
+    assert tables.rows["orders"][1]["notes"] is None
+    assert tables.outbox == []
+    assert invalidated == []